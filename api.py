@@ -7,7 +7,11 @@ from schema.siege import (
     SiegePartialProject,
     SiegePartialUser,
 )
-import bs4, re, os
+import re, os, time, threading, logging
+from html.parser import HTMLParser
+from queue import Queue
+
+import metrics
 
 type UserId = int | str
 type UserAlike = UserId | SiegeProject | SiegePartialUser
@@ -15,6 +19,26 @@ type ProjId = int
 type ProjAlike = SiegePartialProject | ProjId
 
 
+SIEGE_SECONDS = metrics.histogram(
+    "siege_api_request_duration_seconds", "Time until the Siege response headers arrive, per endpoint."
+)
+SIEGE_ERRORS = metrics.counter(
+    "siege_api_errors_total", "Siege requests that failed or returned an error status, per endpoint."
+)
+
+
+def _siege_get(endpoint: str, url: str, **kwargs) -> requests.Response:
+    with SIEGE_SECONDS.time(endpoint=endpoint):
+        try:
+            response = requests.get(url, **kwargs)
+        except Exception:
+            SIEGE_ERRORS.inc(endpoint=endpoint)
+            raise
+    if not response.ok:
+        SIEGE_ERRORS.inc(endpoint=endpoint)
+    return response
+
+
 def _as_user(user: UserAlike) -> UserId:
     if isinstance(user, int):
         return user
@@ -34,7 +58,7 @@ def _as_project(project: ProjAlike) -> ProjId:
 def get_user(user_id: UserAlike) -> SiegeUser:
     user_id = _as_user(user_id)
     url = f"https://siege.hackclub.com/api/public-beta/user/{user_id}"  # https://siege.hackclub.com/api/public-beta/user/138
-    response = requests.get(url)
+    response = _siege_get("user", url)
     data = response.json()
     return SiegeUser.parse(data)
 
@@ -42,14 +66,14 @@ def get_user(user_id: UserAlike) -> SiegeUser:
 def get_project(project_id: ProjAlike) -> SiegeProject:
     project_id = _as_project(project_id)
     url = f"https://siege.hackclub.com/api/public-beta/project/{project_id}"  # https://siege.hackclub.com/api/public-beta/project/1262
-    response = requests.get(url)
+    response = _siege_get("project", url)
     data = response.json()
     return SiegeProject.parse(data)
 
 
 def get_coin_leaderboard() -> list[SiegePartialUser2]:
     url = "https://siege.hackclub.com/api/public-beta/leaderboard"
-    response = requests.get(url)
+    response = _siege_get("leaderboard", url)
     data = response.json()
     return list(map(SiegePartialUser2.parse, data.get("leaderboard", [])))
 
@@ -61,25 +85,142 @@ def get_coin_leaderboard() -> list[SiegePartialUser2]:
 #     data = response.json()
 #     return data.get("hours", 0.0)
 
+class _ProjectWeekTimeParser(HTMLParser):
+    """Collects the text of the first `div.project-week-time` and ignores everything after it."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._depth = 0
+        self._parts: list[str] = []
+        self.done = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.done or tag != "div":
+            return
+        if self._depth:
+            self._depth += 1
+            return
+        for key, value in attrs:
+            if key == "class" and value and "project-week-time" in value.split():
+                self._depth = 1
+                return
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.done or not self._depth or tag != "div":
+            return
+        self._depth -= 1
+        if not self._depth:
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._depth and not self.done:
+            self._parts.append(data)
+
+    @property
+    def text(self) -> str | None:
+        return "".join(self._parts) if self.done else None
+
+
+class _RateLimiter:
+    """Spaces out calls so that at most one happens every `interval` seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+ARMORY_MIN_INTERVAL = float(os.environ.get("ARMORY_MIN_INTERVAL", "0.5"))
+PROJECT_TIME_TTL = float(os.environ.get("PROJECT_TIME_TTL", "60"))
+
+_armory_limiter = _RateLimiter(ARMORY_MIN_INTERVAL)
+_project_time_cache: dict[ProjId, tuple[float, float]] = {}  # proj_id -> (hours, fetched_at)
+_project_time_lock = threading.Lock()
+_refresh_queue: Queue[ProjId] = Queue()
+_refresh_pending: set[ProjId] = set()
+_refresh_worker: threading.Thread | None = None
+
+
 def get_project_time_prec(project: ProjAlike) -> float:
     project_id = _as_project(project)
     url = f"https://siege.hackclub.com/armory/{project_id}"
-    response = requests.get(url, cookies={"_siege_session": os.environ["SIEGE_SESSION"]})
-    if not response.ok:
-        raise ValueError(f"Armory link return error with status {response.status_code}, proj_id={project_id}")
-    soup = bs4.BeautifulSoup(response.text, "html.parser")
-    ele = soup.find("div", {"class": "project-week-time"})
-    if ele is None:
+    _armory_limiter.wait()
+    with _siege_get(
+        "armory", url, cookies={"_siege_session": os.environ["SIEGE_SESSION"]}, stream=True
+    ) as response:
+        if not response.ok:
+            raise ValueError(f"Armory link return error with status {response.status_code}, proj_id={project_id}")
+        response.encoding = response.encoding or "utf-8"
+        parser = _ProjectWeekTimeParser()
+        # Stop reading the page as soon as the element has been closed
+        for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
+            parser.feed(chunk)
+            if parser.done:
+                break
+    raw_text = parser.text
+    if raw_text is None:
         raise ValueError(f"Cannot find project-week-time class, proj_id={project_id}")
-    raw_text = ele.get_text().strip().removeprefix("Time spent: ").strip()
-    result = re.match(r"(?:(\d*)h)? (?:(\d*)m)?", raw_text)
-    if result is None:
+    raw_text = raw_text.strip().removeprefix("Time spent: ").strip()
+    result = re.match(r"(?:(\d+)h)?\s*(?:(\d+)m)?", raw_text)
+    if result is None or not any(result.groups()):
         raise ValueError(f"Cannot find project time infomation, content=\"{raw_text}\"")
-    return int(result.group(1)) + int(result.group(2)) / 60
+    hours = int(result.group(1) or 0) + int(result.group(2) or 0) / 60
+    with _project_time_lock:
+        _project_time_cache[project_id] = (hours, time.monotonic())
+    return hours
+
+
+def _refresh_loop() -> None:
+    while True:
+        project_id = _refresh_queue.get()
+        try:
+            get_project_time_prec(project_id)
+        except Exception:
+            logging.warning(f"Background armory refresh failed, proj_id={project_id}", exc_info=True)
+        finally:
+            with _project_time_lock:
+                _refresh_pending.discard(project_id)
+
+
+def _schedule_refresh(project_id: ProjId) -> None:
+    global _refresh_worker
+    with _project_time_lock:
+        if project_id in _refresh_pending:
+            return
+        _refresh_pending.add(project_id)
+        if _refresh_worker is None:
+            _refresh_worker = threading.Thread(target=_refresh_loop, daemon=True)
+            _refresh_worker.start()
+    _refresh_queue.put(project_id)
+
+
+def get_project_time_cached(project: ProjAlike, max_age: float = PROJECT_TIME_TTL) -> float:
+    """
+    Same as `get_project_time_prec`, but served from a per-project cache.
+    A stale entry is returned immediately and refreshed in the background;
+    only a project that was never fetched blocks on the armory page.
+    """
+    project_id = _as_project(project)
+    with _project_time_lock:
+        cached = _project_time_cache.get(project_id)
+    if cached is None:
+        return get_project_time_prec(project_id)
+    hours, fetched_at = cached
+    if time.monotonic() - fetched_at > max_age:
+        _schedule_refresh(project_id)
+    return hours
 
 
 def get_all_projs() -> list[SiegeProject]:
     url = "https://siege.hackclub.com/api/public-beta/projects"
-    response = requests.get(url)
+    response = _siege_get("projects", url)
     data = response.json().get("projects", [])
     return list(map(SiegeProject.parse, data))
\ No newline at end of file
@@ -0,0 +1,175 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import db
+from verify import verify_chain
+
+# COMPLETED games that ended longer ago than this are moved to the archive
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+
+# Rows that move with a game, the game and game_manager rows stay so thread lookups and permissions keep working,
+# and the turn counters stay so summaries of archived games need no archive
+_MOVED_TABLES = ("game_turn", "game_participant")
+
+
+def season_of(start_time: str) -> str:
+    """The archive a game belongs to, one per calendar quarter of its start, e.g. '2026-Q3'."""
+    started = datetime.fromisoformat(start_time)
+    return f"{started.year}-Q{(started.month - 1) // 3 + 1}"
+
+
+def _archive_path(season: str) -> Path:
+    return db.ARCHIVE_DIR / f"{season}.db"
+
+
+def _ensure_archive(path: Path):
+    """Creates (or upgrades) an archive database with the same schema as the live one."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(db.SCHEMA_FILE, "r") as f:
+        schema_sql = f.read()
+    conn = sqlite3.connect(path)
+    try:
+        db.apply_schema(conn, schema_sql)
+    finally:
+        conn.close()
+
+
+def archivable_games(older_than_days: float = ARCHIVE_AFTER_DAYS) -> list[sqlite3.Row]:
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+    with db.get_db_connection() as conn:
+        return conn.execute(
+            """
+            SELECT g.id, g.start_time FROM game AS g
+            WHERE g.status = 'COMPLETED'
+              AND COALESCE(g.end_time, g.start_time) < ?
+              AND g.id NOT IN (SELECT game_id FROM game_archive)
+            ORDER BY g.id
+            """,
+            (cutoff,),
+        ).fetchall()
+
+
+@db.writes
+def _copy_game(game_id: int, path: Path):
+    """Copies a game into its archive, idempotent so an interrupted run can simply be repeated."""
+    conn = db._writer.conn
+    conn.create_function("pack_details", 1, db.pack_details, deterministic=True)
+    conn.execute("ATTACH DATABASE ? AS archive", (str(path),))
+    try:
+        with db.unit_of_work():
+            conn.execute(
+                "INSERT OR REPLACE INTO archive.huddle SELECT * FROM main.huddle WHERE id = (SELECT huddle_id FROM main.game WHERE id = ?)",
+                (game_id,),
+            )
+            conn.execute("INSERT OR REPLACE INTO archive.game SELECT * FROM main.game WHERE id = ?", (game_id,))
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO archive.user SELECT * FROM main.user WHERE slack_id IN (
+                    SELECT user_id FROM main.game_participant WHERE game_id = :game
+                    UNION SELECT user_id FROM main.game_turn WHERE game_id = :game
+                    UNION SELECT user_id FROM main.game_manager WHERE game_id = :game
+                    UNION SELECT user_id FROM main.event_transaction WHERE game_id = :game
+                )
+                """,
+                {"game": game_id},
+            )
+            for table in (*_MOVED_TABLES, "game_manager"):
+                conn.execute(f"INSERT OR REPLACE INTO archive.{table} SELECT * FROM main.{table} WHERE game_id = ?", (game_id,))
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO archive.event_transaction
+                    (id, transaction_hash, previous_transaction_hash, timestamp, event_type, game_id, user_id, details, client_secret, server_secret)
+                SELECT id, transaction_hash, previous_transaction_hash, timestamp, event_type, game_id, user_id,
+                       pack_details(details), client_secret, server_secret
+                FROM main.event_transaction WHERE game_id = ?
+                """,
+                (game_id,),
+            )
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+
+@db.writes
+def _drop_game(game_id: int, archive_name: str, event_count: int):
+    """Records where the game went and removes its rows from the live database, in one transaction."""
+    with db.unit_of_work() as conn:
+        conn.execute(
+            "INSERT INTO game_archive (game_id, archive, event_count) VALUES (?, ?, ?)",
+            (game_id, archive_name, event_count),
+        )
+        conn.execute("DELETE FROM game_snapshot WHERE game_id = ?", (game_id,))
+        conn.execute("DELETE FROM event_transaction WHERE game_id = ?", (game_id,))
+        for table in _MOVED_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE game_id = ?", (game_id,))
+
+
+def archive_game(game_id: int, start_time: str) -> int:
+    """
+    Moves a finished game into its season's archive and returns its number of transactions.
+    The copy's hash chain is verified against the live one before anything is deleted.
+    """
+    path = _archive_path(season_of(start_time))
+    _ensure_archive(path)
+    _copy_game(game_id, path)
+
+    with db.get_db_connection() as conn:
+        live = conn.execute(
+            "SELECT COUNT(*), MAX(transaction_hash) FROM event_transaction WHERE game_id = ?", (game_id,)
+        ).fetchone()
+        live_turns = conn.execute("SELECT COUNT(*) FROM game_turn WHERE game_id = ?", (game_id,)).fetchone()[0]
+    archive_conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        report = verify_chain(archive_conn, game_id)
+        archived = archive_conn.execute(
+            "SELECT COUNT(*), MAX(transaction_hash) FROM event_transaction WHERE game_id = ?", (game_id,)
+        ).fetchone()
+        archived_turns = archive_conn.execute("SELECT COUNT(*) FROM game_turn WHERE game_id = ?", (game_id,)).fetchone()[0]
+    finally:
+        archive_conn.close()
+    if report.broken:
+        raise RuntimeError(f"Archived chain of game {game_id} is broken: {report.broken.reason}")
+    if tuple(archived) != tuple(live) or archived_turns != live_turns:
+        raise RuntimeError(f"Archive copy of game {game_id} does not match the live database")
+
+    _drop_game(game_id, path.name, report.rows)
+    return report.rows
+
+
+@db.writes
+def _vacuum():
+    # Rebuilding the file is also the only way to turn on incremental vacuum, which the maintenance runs use
+    db._writer.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db._writer.conn.execute("VACUUM")
+    # In WAL mode the rebuilt file only replaces the old one at a checkpoint
+    db._writer.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move finished games out of the live database into per-season archives.")
+    parser.add_argument("--older-than", type=float, default=ARCHIVE_AFTER_DAYS, help="Days since the game ended")
+    parser.add_argument("--vacuum", action="store_true", help="Shrink the live database file afterwards, run with the bot stopped")
+    args = parser.parse_args()
+
+    db.init_db()
+    size_before = os.path.getsize(db.DB_FILE)
+    start = time.perf_counter()
+    games = archivable_games(args.older_than)
+    rows = 0
+    for game in games:
+        rows += archive_game(game["id"], game["start_time"])
+        print(f"📦 Game {game['id']} archived to {season_of(game['start_time'])}")
+    if args.vacuum:
+        _vacuum()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(games)} games ({rows} transactions) archived in {elapsed:.2f}s, "
+        f"live database {size_before / 1e6:.1f}MB -> {os.path.getsize(db.DB_FILE) / 1e6:.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from db import DB_FILE, unpack_details
+from selection import DURATION_RANGE, derive_pick
+
+AUDITED_EVENTS = ("USER_SELECTED", "TURN_COMPLETED", "TURN_FAILED", "TURN_SKIPPED")
+
+
+@dataclass
+class PickAudit:
+    game_id: int
+    transaction_id: int
+    user_id: str
+    status: str  # 'OK', 'MISMATCH' or 'UNVERIFIABLE'
+    reason: str = ""
+
+
+@dataclass
+class _GameState:
+    """Turn state of one game, advanced event by event instead of re-queried for every pick."""
+
+    # Users picked since the last completed/failed turn (inclusive), they cannot be picked again
+    recent_users: set[str] = field(default_factory=set)
+    consecutive_skips: dict[str, int] = field(default_factory=dict)
+
+    def apply(self, event_type: str, user_id: str | None):
+        if user_id is None:
+            return
+        match event_type:
+            case "USER_SELECTED":
+                self.recent_users.add(user_id)
+            case "TURN_COMPLETED":
+                self.recent_users = {user_id}
+                self.consecutive_skips[user_id] = 0
+            case "TURN_FAILED":
+                self.recent_users = {user_id}
+            case "TURN_SKIPPED":
+                self.consecutive_skips[user_id] = self.consecutive_skips.get(user_id, 0) + 1
+
+
+def audit_pick(
+    state: _GameState,
+    game_id: int,
+    tx_id: int,
+    user_id: str,
+    details: dict,
+    client_secret: str,
+    server_secret: str,
+) -> PickAudit:
+    eligible = details.get("eligible")
+    if eligible is None:
+        return PickAudit(game_id, tx_id, user_id, "UNVERIFIABLE", "eligible list was not recorded")
+
+    excluded = state.recent_users.intersection(eligible)
+    if excluded:
+        return PickAudit(game_id, tx_id, user_id, "MISMATCH", f"recently picked users were eligible: {sorted(excluded)}")
+    skipped_out = [uid for uid in eligible if state.consecutive_skips.get(uid, 0) >= 2]
+    if skipped_out:
+        return PickAudit(game_id, tx_id, user_id, "MISMATCH", f"users with 2 consecutive skips were eligible: {skipped_out}")
+
+    seed = f"{details.get('client_secret', client_secret)}{details.get('server_secret', server_secret)}"
+    selected_index, duration_seconds = derive_pick(
+        seed,
+        eligible,
+        details.get("tickets"),
+        tuple(details.get("duration_range", DURATION_RANGE)),
+        details.get("rnd_version", 1),
+    )
+    if eligible[selected_index] != user_id:
+        return PickAudit(game_id, tx_id, user_id, "MISMATCH", f"secrets select {eligible[selected_index]}")
+    if duration_seconds != details.get("duration_seconds"):
+        return PickAudit(
+            game_id, tx_id, user_id, "MISMATCH",
+            f"secrets give {duration_seconds}s, recorded {details.get('duration_seconds')}s",
+        )
+    return PickAudit(game_id, tx_id, user_id, "OK")
+
+
+def audit_games(db_path: Path | str = DB_FILE, game_ids: list[int] | None = None) -> list[PickAudit]:
+    """Replays every USER_SELECTED transaction of the given games (default: all) in one pass over the log."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        query = f"""
+            SELECT id, game_id, event_type, user_id, details, client_secret, server_secret
+            FROM event_transaction
+            WHERE event_type IN ({','.join('?' for _ in AUDITED_EVENTS)})
+        """
+        params: list = list(AUDITED_EVENTS)
+        if game_ids:
+            query += f" AND game_id IN ({','.join('?' for _ in game_ids)})"
+            params.extend(game_ids)
+        query += " ORDER BY game_id, id"
+
+        states: dict[int, _GameState] = {}
+        results: list[PickAudit] = []
+        for tx_id, game_id, event_type, user_id, details, client_secret, server_secret in conn.execute(query, params):
+            state = states.setdefault(game_id, _GameState())
+            if event_type == "USER_SELECTED":
+                results.append(
+                    audit_pick(
+                        state, game_id, tx_id, user_id,
+                        json.loads(unpack_details(details)) if details else {},
+                        client_secret, server_secret,
+                    )
+                )
+            state.apply(event_type, user_id)
+        return results
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-derive every recorded pick from its stored secrets.")
+    parser.add_argument("game_ids", nargs="*", type=int, help="Games to audit, all games by default")
+    parser.add_argument("--db", default=str(DB_FILE), help="Database file to audit")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = audit_games(args.db, args.game_ids or None)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        if result.status != "OK":
+            print(f"{'❌' if result.status == 'MISMATCH' else '❔'} Game {result.game_id} transaction {result.transaction_id} (<@{result.user_id}>): {result.status} {result.reason}")
+    counts = {status: sum(r.status == status for r in results) for status in ("OK", "MISMATCH", "UNVERIFIABLE")}
+    print(
+        f"{len(results)} picks in {elapsed:.2f}s: {counts['OK']} ok, "
+        f"{counts['MISMATCH']} mismatched, {counts['UNVERIFIABLE']} unverifiable"
+    )
+    raise SystemExit(1 if counts["MISMATCH"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Thread
+
+import db
+import metrics
+from verify import verify_games
+
+BACKUP_DIR = Path(os.environ.get("BACKUP_DIR", str(db.DB_FILE.parent / "backups")))
+# Seconds between scheduled backups, 0 disables the schedule
+BACKUP_INTERVAL = float(os.environ.get("BACKUP_INTERVAL", "86400"))
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+# Pages copied per step and the pause between steps, the source is only read-locked during a step
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.05
+# Retry delay when a step finds the source locked
+BUSY_SLEEP = 0.25
+# A write from another connection restarts a paged backup, after this many the rest is copied in one step
+MAX_RESTARTS = 3
+
+BACKUP_SECONDS = metrics.histogram(
+    "db_backup_duration_seconds",
+    "Time to copy and verify a database backup.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0),
+)
+BACKUPS = metrics.counter("db_backups_total", "Database backups, per outcome.")
+
+_lock = threading.Lock()  # One backup at a time
+_scheduler: Thread | None = None
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(dest: Path) -> int:
+    """Copies the live database page by page, returns the number of restarts caused by concurrent writes."""
+    restarts = 0
+    last_remaining: int | None = None
+
+    def progress(status: int, remaining: int, total: int):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _Restarted
+        last_remaining = remaining
+        # Called between steps (the `sleep` argument only applies to busy retries)
+        if remaining:
+            time.sleep(BACKUP_SLEEP)
+
+    source = sqlite3.connect(f"file:{db.DB_FILE}?mode=ro", uri=True)
+    try:
+        target = sqlite3.connect(dest)
+        try:
+            try:
+                source.backup(target, pages=BACKUP_PAGES, progress=progress, sleep=BUSY_SLEEP)
+            except _Restarted:
+                # Under a steady write load a paged copy never catches up. In WAL mode one step only
+                # holds a read snapshot, so writers still aren't blocked.
+                source.backup(target, pages=-1)
+            # The copy inherits WAL mode, a backup should be one self-contained file
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return restarts
+
+
+def _verify(path: Path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise RuntimeError(f"Backup failed the integrity check: {result}")
+    broken = [r.broken for r in verify_games(path, workers=1) if r.broken]
+    if broken:
+        raise RuntimeError(
+            f"Backup has {len(broken)} broken hash chains, e.g. game {broken[0].game_id}: {broken[0].reason}"
+        )
+
+
+def _rotate(keep: int = BACKUP_KEEP) -> list[Path]:
+    backups = list_backups()
+    for old in backups[keep:]:
+        old.unlink(missing_ok=True)
+    return backups[keep:]
+
+
+def list_backups() -> list[Path]:
+    """Verified backups, newest first."""
+    return sorted(BACKUP_DIR.glob(f"{db.DB_FILE.stem}-*.db"), reverse=True)
+
+
+def backup() -> Path:
+    """
+    Takes an online backup of the live database, verifies it and rotates old ones.
+    Only a verified copy gets its final name, a failed one is removed.
+    """
+    with _lock:
+        BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        final = BACKUP_DIR / f"{db.DB_FILE.stem}-{stamp}.db"
+        partial = final.with_suffix(".db.partial")
+        start = time.perf_counter()
+        try:
+            restarts = _copy(partial)
+            _verify(partial)
+            partial.replace(final)
+        except Exception:
+            partial.unlink(missing_ok=True)
+            BACKUPS.inc(outcome="failed")
+            raise
+        elapsed = time.perf_counter() - start
+        BACKUP_SECONDS.observe(elapsed)
+        BACKUPS.inc(outcome="completed")
+        removed = _rotate()
+    logging.info(
+        f"Backup {final.name} ({final.stat().st_size / 1e6:.1f}MB) verified in {elapsed:.2f}s, "
+        f"{restarts} restarts, {len(removed)} old backups removed"
+    )
+    return final
+
+
+def _schedule_loop():
+    while True:
+        time.sleep(BACKUP_INTERVAL)
+        try:
+            backup()
+        except Exception:
+            logging.error("Scheduled backup failed:", exc_info=True)
+
+
+def start():
+    """Starts the backup schedule once per process, unless BACKUP_INTERVAL is 0."""
+    global _scheduler
+    if _scheduler is not None or BACKUP_INTERVAL <= 0:
+        return
+    _scheduler = Thread(target=_schedule_loop, daemon=True)
+    _scheduler.start()
+    print(f"💾 Backups scheduled (every {BACKUP_INTERVAL:.0f}s, keeping {BACKUP_KEEP}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Take a verified online backup of the live database.")
+    parser.parse_args()
+    path = backup()
+    print(f"✅ {path}")
+
+
+if __name__ == "__main__":
+    main()
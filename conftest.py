@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import db
+import game_state
+import projector
+
+
+@pytest.fixture
+def live_db(tmp_path, monkeypatch):
+    """A fresh database (and archive directory) per test, with the process-wide caches emptied."""
+    monkeypatch.setattr(db, "DB_FILE", tmp_path / "live_coding.db")
+    monkeypatch.setattr(db, "ARCHIVE_DIR", tmp_path / "archive")
+    # The writer keeps its connection open, a new one opens the test's database
+    monkeypatch.setattr(db, "_writer", db._Writer())
+    monkeypatch.setattr(db, "_user_names", {})
+    monkeypatch.setattr(db, "_user_names_loaded", False)
+    monkeypatch.setattr(projector, "_pending_events", {})
+    monkeypatch.setattr(game_state, "_GAMES", {})
+    db.invalidate_thread_cache()
+    db.init_db()
+    return db.DB_FILE
+
+
+def play_game(
+    turns: list[tuple[str, str]],
+    messages: list[tuple[str, str]] = (),
+    thread_ts: str = "1700000000.000100",
+    start_time: datetime = datetime(2025, 2, 3, 12, 0, tzinfo=timezone.utc),
+    manager: str = "M1",
+) -> int:
+    """
+    Plays a game through the db functions the bot uses: each (user_id, status) turn is picked,
+    started unless it is skipped, then ended with that status. `messages` are (user_id, text) chat lines.
+    """
+    users = {manager, *(user_id for user_id, _ in turns), *(user_id for user_id, _ in messages)}
+    for user_id in sorted(users):
+        db.upsert_user(user_id, f"User {user_id}")
+    db.upsert_huddle("H1", "C1", start_time)
+    game_id = db.start_game("H1", "C1", thread_ts, start_time, "client-secret", "server-secret")
+    db.add_game_manager(game_id, manager)
+    for user_id in sorted(users - {manager}):
+        db.add_game_participant(game_id, user_id, None, None)
+    for index, (user_id, text) in enumerate(messages):
+        db.add_message_transaction(game_id, user_id, text, f"msg-{index}")
+    for user_id, status in turns:
+        db.add_user_selection_transaction(game_id, user_id, 120)
+        if status != "SKIPPED":
+            db.start_turn(game_id, user_id)
+        db.update_turn_status(game_id, user_id, status)
+    return game_id
@@ -0,0 +1,34 @@
+# Throughput of the range reduction, run with `python -m crypto.bench`. The properties are checked by test_crypto_core.py
+import random
+import time
+
+from .core import legacy_randint, randint
+
+RANGES = [1, 2, 3, 7, 10, 100, 901, 1000, 2**16 + 1, 10**6, 2**31 + 11, 2**32]
+
+
+def bench(draws: int = 50_000) -> None:
+    rng = random.Random(1)
+    print(f"{'range':>12} {'bits':>5} {'bounded/s':>12} {'legacy/s':>12} {'legacy worst loop':>18}")
+    for span in RANGES:
+        bit_count, fn = randint(0, span - 1)
+        values = [rng.getrandbits(bit_count) for _ in range(draws)]
+        start = time.perf_counter()
+        for v in values:
+            fn(v)
+        bounded = draws / (time.perf_counter() - start)
+
+        legacy_bits, legacy_fn = legacy_randint(0, span - 1)
+        legacy_values = [rng.getrandbits(legacy_bits) for _ in range(draws // 10)]
+        worst = 0
+        start = time.perf_counter()
+        for v in legacy_values:
+            t = time.perf_counter()
+            legacy_fn(v)
+            worst = max(worst, time.perf_counter() - t)
+        legacy = len(legacy_values) / (time.perf_counter() - start)
+        print(f"{span:>12} {bit_count:>5} {bounded:>12,.0f} {legacy:>12,.0f} {worst * 1e6:>16.1f}us")
+
+
+if __name__ == "__main__":
+    bench()
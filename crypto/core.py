@@ -1,6 +1,9 @@
+from bisect import bisect_right
+from collections.abc import Callable, Iterator, Sequence
+from itertools import accumulate
 from typing import Self
 from .type import Handler, RndFnOut
-from cryptography.hazmat.primitives.hashes import Hash, SHA3_512
+from cryptography.hazmat.primitives.hashes import Hash, SHA3_512, SHAKE256
 
 
 def _sha3(text: str) -> str:
@@ -9,10 +12,28 @@ def _sha3(text: str) -> str:
     return hash_obj.finalize().hex()
 
 
+LEGACY_VERSION = 1
+XOF_VERSION = 2
+BOUNDED_RANDINT_VERSION = 3  # same stream as XOF_VERSION, picks use the bounded `randint`
+LATEST_VERSION = BOUNDED_RANDINT_VERSION
+
+
 class DeterRnd[*T]:
-    def __init__(self, *handlers: Handler[*T]) -> None:  # type: ignore
+    """
+    Derives values for the given handlers deterministically from a seed.
+
+    version 1 (legacy): bits come from hex-encoded SHA3-512 digests, kept to verify historical games.
+    version 2: bits come straight from SHAKE256 output, domain-separated by a draw counter,
+    so `stream` can produce any number of independent draws from one seed.
+    version 3: same stream as version 2, only marks picks that use the bounded `randint`.
+    """
+
+    def __init__(self, *handlers: Handler[*T], version: int = LEGACY_VERSION) -> None:  # type: ignore
+        if version not in (LEGACY_VERSION, XOF_VERSION, BOUNDED_RANDINT_VERSION):
+            raise ValueError(f"Unknown DeterRnd version: {version}")
         self.seed: str | None = None
         self.handlers = handlers
+        self.version = version
 
     def with_seed(self, seed: str) -> Self:
         if not isinstance(seed, str):
@@ -30,25 +51,55 @@ class DeterRnd[*T]:
             curr += _sha3(f"{self.seed}_{idx}")
         return curr[:size]
 
-    def retrieve(self) -> tuple[*T]:
+    def _collect_bits(self, bit_count: int, counter: int) -> int:
+        if self.seed is None:
+            raise ValueError("Seed is not set")
+        if bit_count == 0:
+            return 0
+        byte_count = (bit_count + 7) // 8
+        hash_obj = Hash(SHAKE256(byte_count))
+        hash_obj.update(b"DeterRnd/v2\x00" + counter.to_bytes(8, "big") + self.seed.encode())
+        return int.from_bytes(hash_obj.finalize(), "big") >> (byte_count * 8 - bit_count)
+
+    def retrieve(self, counter: int = 0) -> tuple[*T]:
         total_bit = sum(map(lambda x: x[0], self.handlers))
-        rnd_seed = self._collect(total_bit)
-        if rnd_seed:
-            rnd_int = int(rnd_seed, 16)
-        else:
-            rnd_int = 0
+        if self.version == LEGACY_VERSION:
+            if counter:
+                raise ValueError("Legacy DeterRnd only supports a single draw")
+            rnd_seed = self._collect(total_bit)
+            if rnd_seed:
+                rnd_int = int(rnd_seed, 16)
+            else:
+                rnd_int = 0
+            result = []
+            for bit_count, fn in self.handlers:
+                rnd_int, curr = divmod(rnd_int, 2**bit_count)
+                result.append(fn(curr))
+            return tuple(result)
+
+        rnd_int = self._collect_bits(total_bit, counter)
         result = []
         for bit_count, fn in self.handlers:
-            rnd_int, curr = divmod(rnd_int, 2**bit_count)
-            result.append(fn(curr))
+            result.append(fn(rnd_int & ((1 << bit_count) - 1)))
+            rnd_int >>= bit_count
         return tuple(result)
 
+    def stream(self) -> Iterator[tuple[*T]]:
+        """Yields successive independent draws from the same seed (version 2 only)."""
+        if self.version == LEGACY_VERSION:
+            raise ValueError("Legacy DeterRnd only supports a single draw")
+        counter = 0
+        while True:
+            yield self.retrieve(counter)
+            counter += 1
+
 
 def rnd_bool() -> Handler[bool]:
     return (1, lambda x: x == 0)
 
 
-def randint(low: int, high: int) -> Handler[int]:
+def legacy_randint(low: int, high: int) -> Handler[int]:
+    """Range reduction used by picks made before DeterRnd version 3, kept for verification only."""
     if low == high:
         return (0, lambda x: low)
     if low > high:
@@ -67,3 +118,56 @@ def randint(low: int, high: int) -> Handler[int]:
         return ((base + k * other) % (2**bit_size)) + low
 
     return (bit_size * 2 - 1, inner)
+
+
+RANDINT_ROUNDS = 4
+RANDINT_EXTRA_BITS = 32
+
+
+def randint(low: int, high: int) -> Handler[int]:
+    """
+    Uniform integer in [low, high] using Lemire's multiply-shift reduction with bounded rejection.
+    Each of the RANDINT_ROUNDS attempts uses 32 more bits than the range needs, so an attempt is
+    rejected with probability below 2**-32 and the last attempt is accepted unconditionally
+    (total bias below 2**-128). The work per call is at most RANDINT_ROUNDS multiplications.
+    """
+    if low == high:
+        return (0, lambda x: low)
+    if low > high:
+        raise ValueError("Low must be less than high")
+    span = high - low + 1
+    word = span.bit_length() + RANDINT_EXTRA_BITS
+    mask = (1 << word) - 1
+    threshold = (1 << word) % span
+
+    def inner(v: int) -> int:
+        for _ in range(RANDINT_ROUNDS - 1):
+            m = (v & mask) * span
+            if m & mask >= threshold:
+                return (m >> word) + low
+            v >>= word
+        return (((v & mask) * span) >> word) + low
+
+    return (word * RANDINT_ROUNDS, inner)
+
+
+def randint_for(version: int) -> Callable[[int, int], Handler[int]]:
+    """The `randint` a pick made with the given DeterRnd version has to be re-derived with."""
+    return legacy_randint if version < BOUNDED_RANDINT_VERSION else randint
+
+
+def weighted_choice(weights: Sequence[int]) -> Handler[int]:
+    """
+    Picks an index with probability proportional to its (integer) weight, e.g. ticket count.
+    A ticket number is drawn from 64 bits more than the total needs, so reducing it modulo the total
+    has a bias below 2**-64, then it is located in the prefix sums with a binary search.
+    """
+    if not weights:
+        raise ValueError("Weights must not be empty")
+    if any(w < 0 for w in weights):
+        raise ValueError("Weights must not be negative")
+    prefix = list(accumulate(weights))
+    if prefix[-1] == 0:
+        raise ValueError("Total weight must be positive")
+    total = prefix[-1]
+    return (total.bit_length() + 64, lambda x: bisect_right(prefix, x % total))
@@ -1,48 +1,357 @@
+import functools
+import re
 import sqlite3
 import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
 from contextlib import contextmanager
 import json
-from datetime import datetime, timezone
-from cryptography.hazmat.primitives.hashes import Hash, SHA3_512
+from datetime import datetime, timedelta, timezone
+from cryptography.hazmat.primitives.hashes import Hash, SHA3_256, SHA3_512
 from pathlib import Path
+from queue import Queue
+
+import metrics
+import projector
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_FILE = Path(BASE_DIR) / "data" / "live_coding.db"
 SCHEMA_FILE = os.path.join(BASE_DIR, "schema.sql")
+# Per-season databases of archived games, see archive.py
+ARCHIVE_DIR = Path(BASE_DIR) / "data" / "archive"
 
+THREAD_CACHE_SIZE = 4096
 
-@contextmanager
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+
+QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds", "Time to execute a SQL statement, per statement kind and table."
+)
+
+
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def _statement_label(sql: str) -> str:
+    """A bounded label for a statement, e.g. 'SELECT game_turn'."""
+    words = sql.split(None, 1)
+    if not words:
+        return "EMPTY"
+    verb = words[0].upper()
+    table = _TABLE_RE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class _TimedCursor(sqlite3.Cursor):
+    # Timed inline rather than with QUERY_SECONDS.time(), this runs for every statement
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - start, statement=_statement_label(sql))
+
+    def executemany(self, sql, seq_of_parameters, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - start, statement=_statement_label(sql))
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Connection whose cursors record every statement in QUERY_SECONDS."""
+
+    def cursor(self, factory=_TimedCursor):  # type: ignore[override]
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+WRITE_QUEUE_SIZE = 1000
+
+WRITE_QUEUE_SECONDS = metrics.histogram(
+    "db_write_queue_wait_seconds", "Time a write waited in the queue before the writer thread ran it."
+)
+WRITE_COMMIT_SECONDS = metrics.histogram(
+    "db_write_commit_seconds", "Time spent in COMMIT on the writer connection."
+)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE, factory=_TimedConnection)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+@contextmanager
+def get_db_connection():
+    """A short-lived connection for reads, these run in parallel with the writer thanks to WAL."""
+    conn = _connect()
     try:
         yield conn
     finally:
         conn.close()
 
 
+class _Writer:
+    """
+    The single thread that performs every mutation, on one long-lived connection.
+    Handler threads queue their writes instead of racing for the SQLite write lock; the bounded queue
+    makes a burst block its producers rather than pile up `database is locked` timeouts.
+    """
+
+    def __init__(self) -> None:
+        self._queue: Queue[tuple[Future, float, Callable, tuple, dict]] = Queue(WRITE_QUEUE_SIZE)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.conn: sqlite3.Connection | None = None
+
+    def on_writer(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        if self.on_writer():
+            # Nested write, e.g. a @writes function calling another one
+            return fn(*args, **kwargs)
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        future: Future = Future()
+        self._queue.put((future, time.perf_counter(), fn, args, kwargs))
+        return future.result()
+
+    def _run(self) -> None:
+        self.conn = _connect()
+        self.conn.isolation_level = None  # Transactions are managed by unit_of_work
+        while True:
+            future, queued_at, fn, args, kwargs = self._queue.get()
+            WRITE_QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+_writer = _Writer()
+
+WRITE_QUEUE_DEPTH = metrics.gauge(
+    "db_write_queue_depth", "Writes waiting for the writer thread.", lambda: _writer._queue.qsize()
+)
+
+
+def writes[**P, R](func: Callable[P, R]) -> Callable[P, R]:
+    """Runs the decorated mutation on the writer thread, where it can use `unit_of_work`."""
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        return _writer.submit(func, *args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Runs a composite operation on the writer connection inside one BEGIN IMMEDIATE transaction.
+    Reads made inside (e.g. the latest secrets) see exactly what the write builds on. A nested unit
+    joins the outermost one, which commits on success and rolls back on any error.
+    Only usable from a @writes function.
+    """
+    if not _writer.on_writer() or _writer.conn is None:
+        raise RuntimeError("unit_of_work() must run on the writer thread, decorate the caller with @writes.")
+    conn = _writer.conn
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        projector.end_transaction(committed=False)
+        raise
+    start = time.perf_counter()
+    try:
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        projector.end_transaction(committed=False)
+        raise
+    projector.end_transaction(committed=True)
+    WRITE_COMMIT_SECONDS.observe(time.perf_counter() - start)
+
+
 def init_db():
     if not os.path.exists(SCHEMA_FILE):
         raise FileNotFoundError(f"Schema file not found at {SCHEMA_FILE}")
 
-    with get_db_connection() as conn:
-        with open(SCHEMA_FILE, "r") as f:
-            schema_sql = f.read()
+    with open(SCHEMA_FILE, "r") as f:
+        schema_sql = f.read()
+    # PRAGMA user_version remembers which schema.sql was last applied, the script only runs when it changed
+    schema_version = zlib.crc32(schema_sql.encode("utf-8")) & 0x7FFFFFFF
 
-        cursor = conn.cursor()
-        cursor.executescript(schema_sql)
-        conn.commit()
+    with get_db_connection() as conn:
+        # Persistent, lets readers run alongside the writer thread
+        conn.execute("PRAGMA journal_mode = WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] == schema_version:
+            return
+        apply_schema(conn, schema_sql)
+        _backfill_turn_counters(conn)
+        conn.execute(f"PRAGMA user_version = {schema_version}")
     print("Database initialized successfully.")
 
 
+# === Timestamps ===
+# Event and turn times are stored as integer microseconds since the Unix epoch (UTC). The hash chain
+# still covers the ISO 8601 text, which `iso_from_epoch_us` reproduces exactly.
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(dt: datetime) -> int:
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_us(epoch_us: int) -> datetime:
+    return _EPOCH + epoch_us * _MICROSECOND
+
+
+def epoch_seconds(epoch_us: int) -> float:
+    """Unix time of a stored time, cheaper than building a datetime on hot paths."""
+    return epoch_us / 1_000_000
+
+
+def iso_from_epoch_us(epoch_us: int) -> str:
+    """The `datetime.isoformat()` of a stored UTC time, as it was hashed."""
+    return from_epoch_us(epoch_us).isoformat()
+
+
+def _epoch_us_from_iso(value: str | None) -> int | None:
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        # Naive times have always been written in UTC
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return to_epoch_us(parsed)
+
+
+def _hex_hash(value: bytes | str | None) -> str | None:
+    """A transaction hash as the hex text the chain is computed over."""
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _unhex_hash(value: str | None) -> bytes | None:
+    return bytes.fromhex(value) if value is not None else None
+
+
+def _migrate_binary_columns(conn: sqlite3.Connection) -> tuple[str, str]:
+    """
+    SQL to run before and after the schema script to move a database from hex TEXT hashes and ISO 8601
+    TEXT times to the BLOB/INTEGER layout, empty when it already uses it. The old tables are renamed away,
+    the schema script recreates them and the rows are copied back converted. Fails before changing
+    anything if an event timestamp would not reproduce its hashed text.
+    """
+    columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info("event_transaction")')}
+    if columns.get("transaction_hash") != "TEXT":
+        return "", ""
+    for tx_id, timestamp in conn.execute("SELECT id, timestamp FROM event_transaction"):
+        if iso_from_epoch_us(_epoch_us_from_iso(timestamp)) != timestamp:
+            raise RuntimeError(
+                f"Transaction {tx_id} has a timestamp ({timestamp}) that can't be stored as epoch microseconds without breaking its hash."
+            )
+    conn.create_function("unhex_hash", 1, _unhex_hash, deterministic=True)
+    conn.create_function("epoch_us", 1, _epoch_us_from_iso, deterministic=True)
+    return (
+        """
+        DROP INDEX IF EXISTS "idx_event_transaction_game";
+        ALTER TABLE "event_transaction" RENAME TO "_legacy_event_transaction";
+        ALTER TABLE "game_turn" RENAME TO "_legacy_game_turn";
+        """,
+        """
+        INSERT INTO event_transaction
+            (id, transaction_hash, previous_transaction_hash, timestamp, event_type, game_id, user_id, details, client_secret, server_secret)
+        SELECT id, unhex_hash(transaction_hash), unhex_hash(previous_transaction_hash), epoch_us(timestamp),
+               event_type, game_id, user_id, details, client_secret, server_secret
+        FROM "_legacy_event_transaction" ORDER BY id;
+        INSERT INTO game_turn
+            (id, game_id, user_id, selection_time, start_time, assigned_duration_seconds, status, timeout_notified)
+        SELECT id, game_id, user_id, epoch_us(selection_time), epoch_us(start_time), assigned_duration_seconds, status, timeout_notified
+        FROM "_legacy_game_turn";
+        DROP TABLE "_legacy_event_transaction";
+        DROP TABLE "_legacy_game_turn";
+        """,
+    )
+
+
+def apply_schema(conn: sqlite3.Connection, schema_sql: str):
+    """Runs schema.sql on a live or archive database, migrating older layouts first, in one transaction."""
+    before, after = _migrate_binary_columns(conn)
+    # Rebuilding tables needs foreign keys off, and renames must not rewrite other tables' references
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.executescript(f"BEGIN;\n{before}\n{schema_sql}\n{after}")
+        for table in ("event_transaction", "game_turn") if after else ():
+            broken = conn.execute(f'PRAGMA foreign_key_check("{table}")').fetchall()
+            if broken:
+                raise RuntimeError(f"Migrating {table} would break {len(broken)} foreign keys, e.g. {tuple(broken[0])}")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+        conn.execute("PRAGMA foreign_keys = ON")
+
+
+# Archived `details` are stored as a codec byte followed by raw deflate with a preset dictionary of
+# the common JSON keys, most details are too short for plain zlib to gain anything.
+# Never edit the dictionary of an existing codec, add a new codec instead.
+_DETAILS_CODECS = {
+    1: b'"eligible": "tickets": "duration_range": "rnd_version": "client_secret": "server_secret": '
+    b'"new_server_secret": "start_time": "new_status": "IN_PROGRESS"}"COMPLETED"}"SKIPPED"}'
+    b'{"duration_seconds": {"text": "',
+}
+_DETAILS_CODEC = 1
+
+
+def pack_details(details_json: str | None) -> bytes | None:
+    if details_json is None:
+        return None
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_DETAILS_CODECS[_DETAILS_CODEC])
+    return bytes([_DETAILS_CODEC]) + compressor.compress(details_json.encode("utf-8")) + compressor.flush()
+
+
+def unpack_details(details: str | bytes | None) -> str | None:
+    """The details JSON of a transaction row, whether it is from the live database or an archive."""
+    if details is None or isinstance(details, str):
+        return details
+    decompressor = zlib.decompressobj(-15, zdict=_DETAILS_CODECS[details[0]])
+    return (decompressor.decompress(details[1:]) + decompressor.flush()).decode("utf-8")
+
+
 def _sha3(text: str) -> str:
     hash_obj = Hash(SHA3_512())
     hash_obj.update(text.encode("utf-8"))
     return hash_obj.finalize().hex()
 
 
-def get_latest_transaction_hash(conn: sqlite3.Connection, game_id: int) -> str | None:
+def get_latest_transaction_hash(conn: sqlite3.Connection, game_id: int) -> bytes | None:
     """Retrieves the hash of the most recent transaction for a given game."""
     cursor = conn.cursor()
     row = cursor.execute(
@@ -71,14 +380,14 @@ def _add_transaction(
     Handles cryptographic chaining. It's the caller's responsibility to commit.
     """
     details_json = json.dumps(details) if details else None
-    timestamp = datetime.now(timezone.utc).isoformat()
+    epoch_us = to_epoch_us(datetime.now(timezone.utc))
 
     prev_hash = get_latest_transaction_hash(conn, game_id)
 
     # Create a consistent string representation for hashing
     hash_content = (
-        f"{prev_hash or ''}{event_type}{game_id}{user_id or ''}"
-        f"{details_json or ''}{client_secret}{server_secret}{timestamp}"
+        f"{_hex_hash(prev_hash) or ''}{event_type}{game_id}{user_id or ''}"
+        f"{details_json or ''}{client_secret}{server_secret}{iso_from_epoch_us(epoch_us)}"
     )
     new_hash = _sha3(hash_content)
 
@@ -89,9 +398,9 @@ def _add_transaction(
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
-            new_hash,
+            bytes.fromhex(new_hash),
             prev_hash,
-            timestamp,
+            epoch_us,
             event_type,
             game_id,
             user_id,
@@ -100,9 +409,11 @@ def _add_transaction(
             server_secret,
         ),
     )
+    projector.record_event(conn, game_id)
     return new_hash
 
 
+@writes
 def start_game(
     huddle_id: str,
     channel_id: str,
@@ -112,7 +423,7 @@ def start_game(
     server_secret: str,
 ) -> int:
     """Creates a new game and its initial 'GAME_START' transaction."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         row = cursor.execute(
             "INSERT INTO game (huddle_id, channel_id, thread_ts, start_time, status) VALUES (?, ?, ?, ?, 'ACTIVE') RETURNING id",
@@ -123,24 +434,31 @@ def start_game(
             raise RuntimeError("Failed to create a new game record.")
         game_id = row["id"]
         _add_transaction(conn, game_id, "GAME_START", client_secret, server_secret)
-        conn.commit()
-        return game_id
+    invalidate_thread_cache(thread_ts)
+    return game_id
 
 
+def next_client_secret(client_secret: str, message_text: str, message_id: str) -> str:
+    """The client secret after a chat message is logged."""
+    return _sha3(f"{client_secret}:{message_text}:{message_id}")
+
+
+@writes
 def add_message_transaction(
     game_id: int, user_id: str, message_text: str, message_id: str
 ) -> str:
     """
     Adds a 'MSG_SENT' transaction.
     """
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot add message to game {game_id} with no existing transactions."
             )
         old_client_secret, server_secret = secrets
-        new_client_secret = _sha3(f"{old_client_secret}:{message_text}:{message_id}")
+        new_client_secret = next_client_secret(old_client_secret, message_text, message_id)
+        body_hash = message_body_hash(message_text)
         new_hash = _add_transaction(
             conn,
             game_id=game_id,
@@ -148,20 +466,157 @@ def add_message_transaction(
             client_secret=new_client_secret,
             server_secret=server_secret,
             user_id=user_id,
-            details={"text": message_text},
+            details={"body": body_hash.hex()},
+        )
+        tx_id, timestamp = conn.execute(
+            "SELECT id, timestamp FROM event_transaction WHERE transaction_hash = ?", (bytes.fromhex(new_hash),)
+        ).fetchone()
+        conn.execute(
+            """
+            INSERT INTO message_body (hash, text, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT (hash) DO UPDATE SET text = excluded.text, last_seen = excluded.last_seen
+            """,
+            (body_hash, message_text, timestamp),
+        )
+        conn.execute(
+            "INSERT INTO message_search (rowid, text, game_id, user_id, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (tx_id, message_text, game_id, user_id, timestamp),
         )
-        conn.commit()
         return new_hash
 
 
+def message_body_hash(message_text: str) -> bytes:
+    """The content address of a chat line, what its MSG_SENT details reference."""
+    hash_obj = Hash(SHA3_256())
+    hash_obj.update(message_text.encode("utf-8"))
+    return hash_obj.finalize()
+
+
+def get_message_text(details_json: str | None) -> str | None:
+    """
+    The text of a MSG_SENT transaction from its details, inline for older lines or from message_body.
+    None once the body has been purged.
+    """
+    details = json.loads(details_json) if details_json else {}
+    if "text" in details:
+        return details["text"]
+    if "body" not in details:
+        return None
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT text FROM message_body WHERE hash = ?", (bytes.fromhex(details["body"]),)).fetchone()
+    return row["text"] if row else None
+
+
+@writes
+def purge_message_bodies(before: datetime) -> int:
+    """
+    Retention: forgets the text of chat lines last sent before `before` and drops every older line from
+    the search index. The hashes stay, so every transaction still verifies. Lines from before bodies
+    were content-addressed keep their inline text, it is part of their transaction hash.
+    """
+    cutoff = to_epoch_us(before)
+    with unit_of_work() as conn:
+        purged = conn.execute(
+            "UPDATE message_body SET text = NULL WHERE text IS NOT NULL AND last_seen < ?", (cutoff,)
+        ).rowcount
+        conn.execute("DELETE FROM message_search WHERE timestamp < ?", (cutoff,))
+    return purged
+
+
+# === Turn counters ===
+# game_stats and game_user_stats count each game's turns by status. Every function that writes
+# game_turn moves its turn between the counters in the same transaction.
+
+_STATUS_COLUMNS = {
+    "PENDING": "pending",
+    "IN_PROGRESS": "in_progress",
+    "ACCEPTED": "accepted",
+    "REJECTED": "rejected",
+    "SKIPPED": "skipped",
+    "COMPLETED": "completed",
+    "FAILED": "failed",
+}
+_COUNTER_COLUMNS = ", ".join(_STATUS_COLUMNS.values())
+# Derived columns of a counters row, the completion rate is over the turns that are over (NULL before the first)
+_COUNTER_TOTALS = f"""
+    {" + ".join(_STATUS_COLUMNS.values())} AS turns,
+    completed * 1.0 / NULLIF(rejected + skipped + completed + failed, 0) AS completion_rate
+"""
+_STATUS_COUNTS = ", ".join(
+    f"COUNT(CASE WHEN t.status = '{status}' THEN 1 END) AS {column}" for status, column in _STATUS_COLUMNS.items()
+)
+# The counters computed from game_turn, for the backfill and for games archived before the counters existed
+_GAME_COUNTS = f"""
+    SELECT t.game_id, {_STATUS_COUNTS}, SUM(t.assigned_duration_seconds) AS assigned_seconds
+    FROM game_turn AS t WHERE {{where}} GROUP BY t.game_id
+"""
+_USER_COUNTS = f"""
+    SELECT p.game_id, p.user_id, {_STATUS_COUNTS},
+           COALESCE(SUM(t.assigned_duration_seconds), 0) AS assigned_seconds, p.consecutive_skips
+    FROM game_participant AS p
+    LEFT JOIN game_turn AS t ON t.game_id = p.game_id AND t.user_id = p.user_id
+    WHERE {{where}} GROUP BY p.game_id, p.user_id
+"""
+
+
+def _backfill_turn_counters(conn: sqlite3.Connection):
+    """Fills empty counter tables from game_turn, once after they were added."""
+    conn.executescript(
+        f"""
+        BEGIN;
+        INSERT INTO game_stats (game_id, {_COUNTER_COLUMNS}, assigned_seconds)
+        {_GAME_COUNTS.format(where="NOT EXISTS (SELECT 1 FROM game_stats)")};
+        INSERT INTO game_user_stats (game_id, user_id, {_COUNTER_COLUMNS}, assigned_seconds, consecutive_skips)
+        {_USER_COUNTS.format(where="NOT EXISTS (SELECT 1 FROM game_user_stats)")};
+        COMMIT;
+        """
+    )
+
+
+def _count_turn(
+    conn: sqlite3.Connection,
+    game_id: int,
+    user_id: str,
+    old_status: str | None,
+    new_status: str,
+    assigned_seconds: int = 0,
+):
+    """Moves one turn from `old_status` (None for a new turn) to `new_status` in the game's and the player's counters."""
+    new = _STATUS_COLUMNS[new_status]
+    changes = [f"{new} = {new} + 1", "assigned_seconds = assigned_seconds + excluded.assigned_seconds"]
+    if old_status is not None:
+        old = _STATUS_COLUMNS[old_status]
+        changes.append(f"{old} = {old} - 1")
+    # A missing row means every counter was 0, so inserting the new status alone is already correct
+    conn.execute(
+        f"""
+        INSERT INTO game_stats (game_id, {new}, assigned_seconds) VALUES (?, 1, ?)
+        ON CONFLICT(game_id) DO UPDATE SET {", ".join(changes)}
+        """,
+        (game_id, assigned_seconds),
+    )
+    conn.execute(
+        f"""
+        INSERT INTO game_user_stats (game_id, user_id, {new}, assigned_seconds) VALUES (?, ?, 1, ?)
+        ON CONFLICT(game_id, user_id) DO UPDATE SET {", ".join(changes)}
+        """,
+        (game_id, user_id, assigned_seconds),
+    )
+
+
+@writes
 def add_user_selection_transaction(
     game_id: int,
     user_id: str,
     duration_seconds: int,
+    pick_details: dict | None = None,
 ) -> str:
-    """Adds a 'USER_SELECTED' transaction and creates the game_turn record."""
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    """
+    Adds a 'USER_SELECTED' transaction and creates the game_turn record.
+    `pick_details` (secrets, eligible list, tickets...) is stored with the transaction so the pick can be audited.
+    """
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot select user for game {game_id} with no existing transactions."
@@ -179,10 +634,11 @@ def add_user_selection_transaction(
             (
                 game_id,
                 user_id,
-                datetime.now(timezone.utc).isoformat(),
+                to_epoch_us(datetime.now(timezone.utc)),
                 duration_seconds,
             ),
         )
+        _count_turn(conn, game_id, user_id, None, "PENDING", duration_seconds)
         new_hash = _add_transaction(
             conn,
             game_id=game_id,
@@ -190,19 +646,19 @@ def add_user_selection_transaction(
             client_secret=client_secret,
             server_secret=server_secret,
             user_id=user_id,
-            details={"duration_seconds": duration_seconds},
+            details={"duration_seconds": duration_seconds, **(pick_details or {})},
         )
-        conn.commit()
         return new_hash
 
 
+@writes
 def update_game_status(
     game_id: int,
     status: str,  # Should be 'COMPLETED' or 'CANCELLED'
 ) -> str:
     """Updates a game's status and logs the event as a transaction."""
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot update status for game {game_id} with no existing transactions."
@@ -210,10 +666,10 @@ def update_game_status(
         client_secret, server_secret = secrets
 
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE game SET status = ?, end_time = ? WHERE id = ?",
+        game_row = cursor.execute(
+            "UPDATE game SET status = ?, end_time = ? WHERE id = ? RETURNING thread_ts",
             (status, datetime.now(timezone.utc).isoformat(), game_id),
-        )
+        ).fetchone()
         event_type = f"GAME_{status.upper()}"  # e.g., GAME_COMPLETED
         new_hash = _add_transaction(
             conn,
@@ -223,14 +679,60 @@ def update_game_status(
             server_secret=server_secret,
             details={"new_status": status},
         )
-        conn.commit()
-        return new_hash
+    if game_row:
+        invalidate_thread_cache(game_row["thread_ts"])
+    return new_hash
+
+
+@writes
+def restart_game(
+    game_id: int,
+    manager_id: str,
+    take_over: bool,
+    client_secret: str,
+    server_secret: str,
+) -> str:
+    """
+    Reactivates an ended game with fresh secrets and logs a 'GAME_RESTART' transaction.
+    With `take_over`, `manager_id` joins the managers and previous managers busy with another show are dropped.
+    """
+    with unit_of_work() as conn:
+        if take_over:
+            conn.execute(
+                """
+                DELETE FROM game_manager WHERE game_id = ? AND user_id IN (
+                    SELECT gm.user_id FROM game_manager gm
+                    LEFT JOIN game ON gm.game_id = game.id
+                    WHERE gm.game_id != ? AND (game.status IS NULL OR game.status = 'ACTIVE' OR game.status = 'PENDING')
+                )
+                """,
+                (game_id, game_id),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO game_manager (game_id, user_id) VALUES (?, ?)",
+                (game_id, manager_id),
+            )
+        game_row = conn.execute(
+            "UPDATE game SET status = 'ACTIVE', end_time = NULL WHERE id = ? RETURNING thread_ts",
+            (game_id,),
+        ).fetchone()
+        if not game_row:
+            raise ValueError(f"Cannot restart game {game_id}, it does not exist.")
+        new_hash = _add_transaction(
+            conn, game_id, "GAME_RESTART", client_secret, server_secret
+        )
+    invalidate_thread_cache(game_row["thread_ts"])
+    return new_hash
 
 
-def start_turn(game_id: int, user_id: str) -> sqlite3.Row:
+@writes
+def start_turn(
+    game_id: int, user_id: str, start_time: datetime | None = None
+) -> sqlite3.Row:
     """Updates a pending turn to 'IN_PROGRESS' and sets its start time, logging the transaction."""
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    start_time = start_time or datetime.now(timezone.utc)
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot start turn for game {game_id} with no existing transactions."
@@ -255,13 +757,14 @@ def start_turn(game_id: int, user_id: str) -> sqlite3.Row:
             SET status = 'IN_PROGRESS', start_time = ? 
             WHERE id = ?
             """,
-            (datetime.now(timezone.utc).isoformat(), turn_details["id"]),
+            (to_epoch_us(start_time), turn_details["id"]),
         )
 
         if cursor.rowcount == 0:
             raise ValueError(
                 f"No pending turn found for user {user_id} in game {game_id} to start."
             )
+        _count_turn(conn, game_id, user_id, "PENDING", "IN_PROGRESS")
 
         new_hash = _add_transaction(
             conn,
@@ -270,20 +773,20 @@ def start_turn(game_id: int, user_id: str) -> sqlite3.Row:
             client_secret=client_secret,
             server_secret=server_secret,
             user_id=user_id,
-            details={"new_status": "IN_PROGRESS"},
+            details={"new_status": "IN_PROGRESS", "start_time": start_time.isoformat()},
         )
-        conn.commit()
         return turn_details
 
 
+@writes
 def update_turn_status(
     game_id: int,
     user_id: str,
     new_status: str,  # 'COMPLETED', 'SKIPPED', or 'FAILED'
 ) -> str:
     """Updates a turn's status and participant stats, logging the transaction."""
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot update turn for game {game_id} with no existing transactions."
@@ -292,21 +795,32 @@ def update_turn_status(
 
         cursor = conn.cursor()
 
-        cursor.execute(
-            "UPDATE game_turn SET status = ? WHERE game_id = ? AND user_id = ? AND status IN ('PENDING', 'IN_PROGRESS', 'ACCEPTED')",
-            (new_status, game_id, user_id),
-        )
+        open_turns = cursor.execute(
+            "SELECT id, status FROM game_turn WHERE game_id = ? AND user_id = ? AND status IN ('PENDING', 'IN_PROGRESS', 'ACCEPTED')",
+            (game_id, user_id),
+        ).fetchall()
+        for turn in open_turns:
+            cursor.execute("UPDATE game_turn SET status = ? WHERE id = ?", (new_status, turn["id"]))
+            _count_turn(conn, game_id, user_id, turn["status"], new_status)
 
         if new_status == "COMPLETED":
             cursor.execute(
                 "UPDATE game_participant SET successful_rounds = successful_rounds + 1, consecutive_skips = 0 WHERE game_id = ? AND user_id = ?",
                 (game_id, user_id),
             )
+            cursor.execute(
+                "UPDATE game_user_stats SET consecutive_skips = 0 WHERE game_id = ? AND user_id = ?",
+                (game_id, user_id),
+            )
         elif new_status == "SKIPPED":
             cursor.execute(
                 "UPDATE game_participant SET consecutive_skips = consecutive_skips + 1 WHERE game_id = ? AND user_id = ?",
                 (game_id, user_id),
             )
+            cursor.execute(
+                "UPDATE game_user_stats SET consecutive_skips = consecutive_skips + 1 WHERE game_id = ? AND user_id = ?",
+                (game_id, user_id),
+            )
 
         event_type = f"TURN_{new_status.upper()}"
         new_hash = _add_transaction(
@@ -318,49 +832,55 @@ def update_turn_status(
             user_id=user_id,
             details={"new_status": new_status},
         )
-        conn.commit()
         return new_hash
 
 
+@writes
 def set_turn_timeout_notified(game_id: int, user_id: str):
     """
     Sets the timeout_notified flag to TRUE for the most recent turn for a user in a game.
     This prevents duplicate timeout notifications on restart.
     """
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE game_turn SET timeout_notified = TRUE WHERE id = (SELECT id FROM game_turn WHERE game_id = ? AND user_id = ? ORDER BY selection_time DESC, id DESC LIMIT 1)",
             (game_id, user_id),
         )
-        conn.commit()
 
 
-def get_latest_secrets(game_id: int) -> tuple[str, str] | None:
-    """Retrieves the latest client and server secrets for a given game."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        row = cursor.execute(
-            """
-            SELECT client_secret, server_secret FROM event_transaction
-            WHERE game_id = ?
-            ORDER BY timestamp DESC, id DESC
-            LIMIT 1
-            """,
-            (game_id,),
-        ).fetchone()
-        if not row:
-            return None
-        return (row["client_secret"], row["server_secret"])
+def get_latest_secrets(
+    game_id: int, conn: sqlite3.Connection | None = None
+) -> tuple[str, str] | None:
+    """
+    Retrieves the latest client and server secrets for a given game.
+    Pass the connection of a unit of work to read inside its transaction.
+    """
+    if conn is None:
+        with get_db_connection() as conn:
+            return get_latest_secrets(game_id, conn)
+    row = conn.execute(
+        """
+        SELECT client_secret, server_secret FROM event_transaction
+        WHERE game_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+        """,
+        (game_id,),
+    ).fetchone()
+    if not row:
+        return None
+    return (row["client_secret"], row["server_secret"])
 
 
+@writes
 def update_server_secret(
     game_id: int,
     new_server_secret: str,
 ) -> str:
     """Updates the server secret and logs a 'SERVER_SECRET_UPDATE' transaction."""
-    with get_db_connection() as conn:
-        secrets = get_latest_secrets(game_id)
+    with unit_of_work() as conn:
+        secrets = get_latest_secrets(game_id, conn)
         if not secrets:
             raise ValueError(
                 f"Cannot update server secret for game {game_id} with no existing transactions."
@@ -375,31 +895,64 @@ def update_server_secret(
             server_secret=new_server_secret,
             details={"new_server_secret": new_server_secret},
         )
-        conn.commit()
         return new_hash
 
 
+# === User directory ===
+# Process-wide slack_id -> name map. `upsert_user` is the only writer of the user table and keeps it
+# current, so once `load_user_directory` has run a miss means the user does not exist.
+
+_user_names: dict[str, str] = {}
+_user_names_lock = threading.Lock()
+_user_names_loaded = False
+
+
+def load_user_directory():
+    """Bulk-loads every known user name, called once on startup."""
+    global _user_names_loaded
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT slack_id, name FROM user").fetchall()
+    with _user_names_lock:
+        _user_names.update((row["slack_id"], row["name"]) for row in rows)
+        _user_names_loaded = True
+
+
 def upsert_user(user_id: str, name: str, avatar_url: str | None = None):
     """Adds a new user or updates their name. It avoids overwriting a real name with 'UNKNOWN'."""
-    with get_db_connection() as conn:
+    with _user_names_lock:
+        if name == "UNKNOWN" and user_id in _user_names:
+            # Nothing to update, this is the common case for every message in a game thread
+            return
+    _write_user(user_id, name, avatar_url)
+
+
+@writes
+def _write_user(user_id: str, name: str, avatar_url: str | None):
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
             INSERT INTO user (slack_id, name, avatar_url) VALUES (?, ?, ?)
             ON CONFLICT(slack_id) DO UPDATE SET 
-                name = excluded.name 
+                name = excluded.name,
                 avatar_url = excluded.avatar_url
             WHERE excluded.name != 'UNKNOWN' OR user.name = 'UNKNOWN'
             """,
             (user_id, name, avatar_url),
         )
-        conn.commit()
+    with _user_names_lock:
+        if name != "UNKNOWN":
+            _user_names[user_id] = name
+        elif _user_names_loaded:
+            # A directory miss means the row above was just inserted
+            _user_names.setdefault(user_id, name)
 
 
+@writes
 def add_game_participant(game_id: int, user_id: str, h_now: float | None, proj_id: int | None):
     """Adds a user to a game's participant list. Update proper field when e.g. the user don't start with having a project."""
     # TODO: the h_penalty thing, I hope I remember and also don't have to make 2 function for it
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -408,44 +961,113 @@ def add_game_participant(game_id: int, user_id: str, h_now: float | None, proj_i
                 h_curr = CASE WHEN game_participant.h_curr IS NULL OR excluded.h_curr > game_participant.h_curr THEN excluded.h_curr ELSE game_participant.h_curr END,
                 h_start = CASE WHEN excluded.h_start IS NOT NULL AND game_participant.h_start IS NULL THEN excluded.h_start ELSE game_participant.h_start END,
                 proj_id = CASE WHEN excluded.proj_id IS NOT NULL AND game_participant.proj_id IS NULL THEN excluded.proj_id ELSE game_participant.proj_id END,
-                h_lastcheck = CURRENT_TIMESTAMP
+                -- The hours poller measures h_curr's gain against the time since h_lastcheck, so a rejoin
+                -- only moves it along with a newer h_curr
+                h_lastcheck = CASE WHEN excluded.h_curr IS NOT NULL AND (game_participant.h_curr IS NULL OR excluded.h_curr > game_participant.h_curr) THEN CURRENT_TIMESTAMP ELSE game_participant.h_lastcheck END
             """,
             (game_id, user_id, h_now, h_now, proj_id),
         )
-        conn.commit()
+        # Listed in the summary from the start, even before their first turn
+        cursor.execute(
+            "INSERT OR IGNORE INTO game_user_stats (game_id, user_id) VALUES (?, ?)",
+            (game_id, user_id),
+        )
 
 
+def get_participants_to_track() -> list[sqlite3.Row]:
+    """Gets every opted-in participant with a Siege project in an active game, least recently checked first."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        rows = cursor.execute(
+            """
+            SELECT gp.game_id, gp.user_id, gp.proj_id, gp.h_curr, gp.h_penalty, gp.h_lastcheck
+            FROM game_participant AS gp
+            JOIN game AS g ON gp.game_id = g.id
+            WHERE g.status = 'ACTIVE' AND gp.proj_id IS NOT NULL AND gp.is_opted_out = FALSE
+            ORDER BY gp.h_lastcheck ASC
+            """
+        ).fetchall()
+        return rows
+
+
+def get_participant_hours(game_id: int, user_ids: list[str]) -> dict[str, float]:
+    """
+    Gets the hours coded during the game for the given users, excluding penalties.
+    Users without a Siege project are left out of the result.
+    """
+    if not user_ids:
+        return {}
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" for _ in user_ids)
+        rows = cursor.execute(
+            f"""
+            SELECT user_id, MAX(0, COALESCE(h_curr - h_start, 0) - h_penalty) AS hours
+            FROM game_participant
+            WHERE game_id = ? AND proj_id IS NOT NULL AND user_id IN ({placeholders})
+            """,
+            (game_id, *user_ids),
+        ).fetchall()
+        return {row["user_id"]: row["hours"] for row in rows}
+
+
+@writes
+def update_participant_hours(updates: list[tuple[int, str, float, float]]):
+    """
+    Writes a batch of (game_id, user_id, h_curr, extra_penalty) hour updates in one transaction.
+    h_curr never decreases, extra_penalty is added on top of the existing h_penalty.
+    """
+    if not updates:
+        return
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            UPDATE game_participant SET
+                h_curr = CASE WHEN h_curr IS NULL OR :h_curr > h_curr THEN :h_curr ELSE h_curr END,
+                h_start = COALESCE(h_start, :h_curr),
+                h_penalty = h_penalty + :penalty,
+                h_lastcheck = CURRENT_TIMESTAMP
+            WHERE game_id = :game_id AND user_id = :user_id
+            """,
+            [
+                {"game_id": game_id, "user_id": user_id, "h_curr": h_curr, "penalty": penalty}
+                for game_id, user_id, h_curr, penalty in updates
+            ],
+        )
+
+
+@writes
 def update_participant_opt_out(game_id: int, user_id: str, is_opted_out: bool):
     """Updates a participant's opt-out status for a specific game."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE game_participant SET is_opted_out = ? WHERE game_id = ? AND user_id = ?",
             (is_opted_out, game_id, user_id),
         )
-        conn.commit()
 
 
+@writes
 def add_game_manager(game_id: int, user_id: str):
     """Assigns a user as a manager for a game."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT OR IGNORE INTO game_manager (game_id, user_id) VALUES (?, ?)",
             (game_id, user_id),
         )
-        conn.commit()
 
 
+@writes
 def remove_game_manager(game_id: int, user_id: str):
     """Removes a user as a manager for a game."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "DELETE FROM game_manager WHERE game_id = ? AND user_id = ?",
             (game_id, user_id),
         )
-        conn.commit()
 
 
 def list_game_manager(game_id: int):
@@ -482,26 +1104,26 @@ def game_exists_in_thread(channel_id: str, thread_ts: str) -> bool:
         return row is not None
 
 
+@writes
 def add_huddle_participant(huddle_id: str, user_id: str):
     """Adds a user to the list of current participants in a huddle."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT OR IGNORE INTO huddle_participant (huddle_id, user_id) VALUES (?, ?)",
             (huddle_id, user_id),
         )
-        conn.commit()
 
 
+@writes
 def remove_huddle_participant(huddle_id: str, user_id: str):
     """Removes a user from the list of current participants in a huddle."""
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "DELETE FROM huddle_participant WHERE huddle_id = ? AND user_id = ?",
             (huddle_id, user_id),
         )
-        conn.commit()
 
 
 def get_user_huddles(user_id: str) -> list[str]:
@@ -514,13 +1136,46 @@ def get_user_huddles(user_id: str) -> list[str]:
         return [row["huddle_id"] for row in rows]
 
 
+def get_all_huddle_participants() -> list[tuple[str, str]]:
+    """Gets every (huddle_id, user_id) membership currently recorded."""
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT huddle_id, user_id FROM huddle_participant").fetchall()
+        return [(row["huddle_id"], row["user_id"]) for row in rows]
+
+
+@writes
+def apply_huddle_presence(joins: list[tuple[str, str]], leaves: list[tuple[str, str]]):
+    """
+    Writes a batch of (huddle_id, user_id) joins and leaves in one transaction.
+    Huddles seen only through joins get an 'UNKNOWN' placeholder row, like `upsert_huddle` does.
+    """
+    if not joins and not leaves:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO huddle (id, channel_id, start_time) VALUES (?, 'UNKNOWN', ?)",
+            [(huddle_id, now) for huddle_id in {huddle_id for huddle_id, _ in joins}],
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO huddle_participant (huddle_id, user_id) VALUES (?, ?)",
+            joins,
+        )
+        cursor.executemany(
+            "DELETE FROM huddle_participant WHERE huddle_id = ? AND user_id = ?",
+            leaves,
+        )
+
+
+@writes
 def upsert_huddle(huddle_id: str, channel_id: str, start_time: datetime):
     """
     Inserts a new huddle record or updates an existing one if its channel_id is 'UNKNOWN'.
     This handles the race condition where a user join event creates a placeholder huddle
     before the huddle creation event provides the full details.
     """
-    with get_db_connection() as conn:
+    with unit_of_work() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -531,7 +1186,6 @@ def upsert_huddle(huddle_id: str, channel_id: str, start_time: datetime):
             """,
             (huddle_id, channel_id, start_time.isoformat(), channel_id),
         )
-        conn.commit()
 
 
 # === State Querying Functions ===
@@ -571,36 +1225,85 @@ def get_active_game_in_huddle(huddle_id: str) -> int | None:
         return row["id"] if row else None
 
 
+# === Thread -> game index ===
+# Every threaded message goes through these lookups, most of them in threads without a game.
+# Results, including misses, are cached until a game in the thread starts, ends or restarts.
+
+_thread_cache: OrderedDict[tuple, object] = OrderedDict()
+_thread_cache_lock = threading.Lock()
+_thread_cache_generation = 0
+
+
+def _cached_thread_lookup(key: tuple, load: Callable[[], object]):
+    with _thread_cache_lock:
+        if key in _thread_cache:
+            _thread_cache.move_to_end(key)
+            return _thread_cache[key]
+        generation = _thread_cache_generation
+    value = load()
+    with _thread_cache_lock:
+        # Don't store a result that an invalidation raced with
+        if generation == _thread_cache_generation:
+            _thread_cache[key] = value
+            if len(_thread_cache) > THREAD_CACHE_SIZE:
+                _thread_cache.popitem(last=False)
+    return value
+
+
+def invalidate_thread_cache(thread_ts: str | None = None):
+    """Drops cached lookups of a thread, or of every thread when `thread_ts` is None."""
+    global _thread_cache_generation
+    with _thread_cache_lock:
+        _thread_cache_generation += 1
+        if thread_ts is None:
+            _thread_cache.clear()
+            return
+        for key in [key for key in _thread_cache if key[-1] == thread_ts]:
+            del _thread_cache[key]
+
+
 def get_active_game_by_thread(channel_id: str, thread_ts: str) -> int | None:
     """Finds the ID of the currently active game in a given thread."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        row = cursor.execute(
-            "SELECT id FROM game WHERE channel_id = ? AND thread_ts = ? AND status = 'ACTIVE' LIMIT 1",
-            (channel_id, thread_ts),
-        ).fetchone()
-        return row["id"] if row else None
+
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            row = cursor.execute(
+                "SELECT id FROM game WHERE channel_id = ? AND thread_ts = ? AND status = 'ACTIVE' LIMIT 1",
+                (channel_id, thread_ts),
+            ).fetchone()
+            return row["id"] if row else None
+
+    return _cached_thread_lookup(("active", channel_id, thread_ts), load)
 
 
 def get_active_game_by_only_thread(thread_ts: str) -> int | None:
     """Finds the ID of the currently active game in a given thread."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        row = cursor.execute(
-            "SELECT id FROM game WHERE thread_ts = ? AND status = 'ACTIVE' LIMIT 1",
-            (thread_ts),
-        ).fetchone()
-        return row["id"] if row else None
+
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            row = cursor.execute(
+                "SELECT id FROM game WHERE thread_ts = ? AND status = 'ACTIVE' LIMIT 1",
+                (thread_ts,),
+            ).fetchone()
+            return row["id"] if row else None
+
+    return _cached_thread_lookup(("active", thread_ts), load)
 
 
 def get_channel_id_by_thread(thread_ts: str) -> str | None:
     """Finds the channel ID for a given thread."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        row = cursor.execute(
-            "SELECT channel_id FROM game WHERE thread_ts = ? LIMIT 1", (thread_ts)
-        ).fetchone()
-        return row["channel_id"] if row else None
+
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            row = cursor.execute(
+                "SELECT channel_id FROM game WHERE thread_ts = ? LIMIT 1", (thread_ts,)
+            ).fetchone()
+            return row["channel_id"] if row else None
+
+    return _cached_thread_lookup(("channel", thread_ts), load)
 
 
 def get_any_game_by_thread(channel_id: str, thread_ts: str) -> int | None:
@@ -614,6 +1317,13 @@ def get_any_game_by_thread(channel_id: str, thread_ts: str) -> int | None:
         return row["id"] if row else None
 
 
+def get_game_status(game_id: int) -> str | None:
+    """The status of a game, None if it does not exist."""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT status FROM game WHERE id = ?", (game_id,)).fetchone()
+        return row["status"] if row else None
+
+
 def get_huddle_id_by_game_id(game_id: int) -> str | None:
     """Finds the huddle ID for a given game ID."""
     with get_db_connection() as conn:
@@ -793,46 +1503,79 @@ def get_all_turns_by_status(statuses: list[str]) -> list[sqlite3.Row]:
         return rows
 
 
-def get_game_summary_stats(game_id: int) -> list[sqlite3.Row]:
+@contextmanager
+def get_game_connection(game_id: int):
     """
-    Gets summary statistics for all participants in a completed game.
+    A read connection for a game's turns, participants and transactions. Once the game has been
+    archived this is its read-only archive database, which also holds the users it references.
     """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        rows = cursor.execute(
-            """
-            SELECT
-                p.user_id,
-                p.successful_rounds,
-                p.consecutive_skips,
-                u.name
-            FROM game_participant AS p
-            JOIN user AS u ON p.user_id = u.slack_id
-            WHERE p.game_id = ?
-            ORDER BY p.successful_rounds DESC, p.consecutive_skips ASC
+        row = conn.execute("SELECT archive FROM game_archive WHERE game_id = ?", (game_id,)).fetchone()
+        if row is None:
+            yield conn
+            return
+    conn = sqlite3.connect(f"file:{ARCHIVE_DIR / row['archive']}?mode=ro", uri=True, factory=_TimedConnection)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _archived_before_counters(conn: sqlite3.Connection, game_id: int) -> bool:
+    return conn.execute("SELECT 1 FROM game_archive WHERE game_id = ?", (game_id,)).fetchone() is not None
+
+
+def get_game_summary_stats(game_id: int) -> list[dict]:
+    """
+    Per-participant turn counters of a game, most completed turns first, with their `name`.
+    """
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT *, {_COUNTER_TOTALS} FROM game_user_stats
+            WHERE game_id = ?
+            ORDER BY completed DESC, consecutive_skips ASC
             """,
             (game_id,),
         ).fetchall()
-        return rows
+        archived = not rows and _archived_before_counters(conn, game_id)
+    if archived:
+        with get_game_connection(game_id) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT *, {_COUNTER_TOTALS} FROM ({_USER_COUNTS.format(where="p.game_id = ?")})
+                ORDER BY completed DESC, consecutive_skips ASC
+                """,
+                (game_id,),
+            ).fetchall()
+    names = get_user_names([row["user_id"] for row in rows])
+    return [{**row, "name": names.get(row["user_id"], row["user_id"])} for row in rows]
+
+
+def get_game_totals(game_id: int) -> sqlite3.Row | None:
+    """The turn counters of a whole game, None before its first turn."""
+    with get_db_connection() as conn:
+        row = conn.execute(f"SELECT *, {_COUNTER_TOTALS} FROM game_stats WHERE game_id = ?", (game_id,)).fetchone()
+        archived = row is None and _archived_before_counters(conn, game_id)
+    if archived:
+        with get_game_connection(game_id) as conn:
+            row = conn.execute(
+                f"SELECT *, {_COUNTER_TOTALS} FROM ({_GAME_COUNTS.format(where='t.game_id = ?')})", (game_id,)
+            ).fetchone()
+    return row
 
 
 def get_all_turns_for_game(game_id: int) -> list[sqlite3.Row]:
     """Gets all turns for a specific game, ordered by selection time."""
-    with get_db_connection() as conn:
+    with get_game_connection(game_id) as conn:
         cursor = conn.cursor()
         rows = cursor.execute(
             """
-            SELECT
-                t.user_id,
-                t.status,
-                t.selection_time,
-                t.start_time,
-                t.assigned_duration_seconds,
-                u.name
-            FROM game_turn AS t
-            JOIN user AS u ON t.user_id = u.slack_id
-            WHERE t.game_id = ?
-            ORDER BY t.selection_time ASC, t.id ASC
+            SELECT user_id, status, selection_time, start_time, assigned_duration_seconds
+            FROM game_turn
+            WHERE game_id = ?
+            ORDER BY selection_time ASC, id ASC
             """,
             (game_id,),
         ).fetchall()
@@ -861,15 +1604,25 @@ def get_game_participants_by_status(game_id: int) -> dict[str, list[str]]:
 
 
 def get_user_names(user_ids: list[str]) -> dict[str, str]:
-    """Gets a mapping of user IDs to names for a given list of IDs."""
-    if not user_ids:
-        return {}
+    """Gets a mapping of user IDs to names for a given list of IDs, served from the user directory."""
+    with _user_names_lock:
+        names = {uid: _user_names[uid] for uid in user_ids if uid in _user_names}
+        if _user_names_loaded:
+            return names
+    misses = list({uid for uid in user_ids if uid not in names})
+    if not misses:
+        return names
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        placeholders = ",".join("?" for _ in user_ids)
+        placeholders = ",".join("?" for _ in misses)
         query = f"SELECT slack_id, name FROM user WHERE slack_id IN ({placeholders})"
-        rows = cursor.execute(query, user_ids).fetchall()
-        return {row["slack_id"]: row["name"] for row in rows}
+        rows = cursor.execute(query, misses).fetchall()
+    loaded = {row["slack_id"]: row["name"] for row in rows}
+    with _user_names_lock:
+        for uid, name in loaded.items():
+            _user_names.setdefault(uid, name)
+    names.update(loaded)
+    return names
 
 
 def has_user(user_id: str) -> bool:
@@ -882,5 +1635,67 @@ def has_user(user_id: str) -> bool:
         return row is not None
 
 
+
+SEARCH_LIMIT = 50
+
+
+def _fts_query(text: str) -> str:
+    """Turns free text into an FTS5 query matching every word, a trailing * keeps prefix matching."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_messages(
+    text: str,
+    game_id: int | None = None,
+    user_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 20,
+    highlight: tuple[str, str] = ("*", "*"),
+) -> list[sqlite3.Row]:
+    """
+    Chat lines matching every word of `text`, best match first (bm25), optionally limited to a game,
+    a user and a time range. Each row has id, game_id, user_id, timestamp (epoch microseconds),
+    snippet (matches wrapped in `highlight`) and score.
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    filters = ["message_search MATCH ?"]
+    params: list = [query]
+    if game_id is not None:
+        filters.append("game_id = ?")
+        params.append(game_id)
+    if user_id is not None:
+        filters.append("user_id = ?")
+        params.append(user_id)
+    if since is not None:
+        filters.append("timestamp >= ?")
+        params.append(to_epoch_us(since))
+    if until is not None:
+        filters.append("timestamp < ?")
+        params.append(to_epoch_us(until))
+    # SQLite reads a negative LIMIT as no limit at all
+    params.append(max(1, min(limit, SEARCH_LIMIT)))
+    with get_db_connection() as conn:
+        return conn.execute(
+            f"""
+            SELECT rowid AS id, game_id, user_id, timestamp,
+                   snippet(message_search, 0, ?, ?, '…', 16) AS snippet,
+                   bm25(message_search) AS score
+            FROM message_search
+            WHERE {' AND '.join(filters)}
+            ORDER BY rank
+            LIMIT ?
+            """,
+            [*highlight, *params],
+        ).fetchall()
+
 if __name__ == "__main__":
     init_db()
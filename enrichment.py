@@ -0,0 +1,112 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from queue import PriorityQueue
+from threading import Thread, Timer
+
+import db
+from api import get_project, get_user
+from utils import guess_week
+
+WORKERS = int(os.environ.get("ENRICH_WORKERS", "4"))
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 10.0
+# The week's project of a user rarely changes during a show, `guess_week` lists every project
+PROJECT_TTL = 600.0
+WEEK_TTL = 600.0
+
+# Lower runs first
+ACTIVE_GAME = 0
+PREFETCH = 1
+
+_queue: PriorityQueue[tuple[int, int, str, int | None, int]] = PriorityQueue()
+_seq = itertools.count()
+_lock = threading.Lock()
+_pending: set[tuple[str, int | None]] = set()
+_week: tuple[int, float] | None = None  # (week, fetched_at)
+_projects: dict[str, tuple[int | None, float]] = {}  # user_id -> (proj_id, fetched_at)
+_workers: list[Thread] = []
+
+
+def _current_week() -> int:
+    global _week
+    with _lock:
+        cached = _week
+    if cached and time.monotonic() - cached[1] < WEEK_TTL:
+        return cached[0]
+    week = guess_week()
+    with _lock:
+        _week = (week, time.monotonic())
+    return week
+
+
+def _week_project(user_id: str) -> int | None:
+    """The ID of the user's project for the current week, if any."""
+    with _lock:
+        cached = _projects.get(user_id)
+    if cached and time.monotonic() - cached[1] < PROJECT_TTL:
+        return cached[0]
+    week_num = _current_week()
+    projs = [proj for proj in get_user(user_id).projects if proj.week == week_num]
+    proj_id = projs[0].id if projs else None
+    with _lock:
+        _projects[user_id] = (proj_id, time.monotonic())
+    return proj_id
+
+
+def _enrich(user_id: str, game_id: int | None):
+    proj_id = _week_project(user_id)
+    if game_id is None:
+        return
+    if proj_id is None:
+        db.add_game_participant(game_id, user_id, None, None)
+    else:
+        full = get_project(proj_id)
+        db.add_game_participant(game_id, user_id, full.hours, full.id)
+
+
+def _worker_loop():
+    while True:
+        priority, _, user_id, game_id, attempt = _queue.get()
+        with _lock:
+            _pending.discard((user_id, game_id))
+        try:
+            _enrich(user_id, game_id)
+        except Exception:
+            if attempt + 1 >= MAX_ATTEMPTS:
+                logging.error(
+                    f"Giving up on Siege data for {user_id} (game {game_id}) after {MAX_ATTEMPTS} attempts:",
+                    exc_info=True,
+                )
+                continue
+            logging.warning(f"Siege lookup for {user_id} failed, retrying in {RETRY_DELAY:.0f}s", exc_info=True)
+            Timer(RETRY_DELAY, _put, args=(priority, user_id, game_id, attempt + 1)).start()
+
+
+def _put(priority: int, user_id: str, game_id: int | None, attempt: int = 0):
+    with _lock:
+        if (user_id, game_id) in _pending:
+            return
+        _pending.add((user_id, game_id))
+    _queue.put((priority, next(_seq), user_id, game_id, attempt))
+
+
+def enqueue(user_id: str, game_id: int | None = None):
+    """
+    Schedules a Siege lookup for a user. With a game, the result is written to its game_participant row
+    ahead of everything else; without one, the user's project is only prefetched for a later game.
+    """
+    _put(ACTIVE_GAME if game_id is not None else PREFETCH, user_id, game_id)
+
+
+def start():
+    """Starts the enrichment worker pool once per process."""
+    if _workers:
+        return
+    for _ in range(WORKERS):
+        worker = Thread(target=_worker_loop, daemon=True)
+        worker.start()
+        _workers.append(worker)
+    print(f"🛰️ Siege enrichment started ({WORKERS} workers).")
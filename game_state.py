@@ -0,0 +1,181 @@
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import db
+
+OPEN_TURN_STATUSES = ("PENDING", "IN_PROGRESS", "ACCEPTED")
+
+
+@dataclass
+class TurnState:
+    user_id: str
+    status: str
+    start_time: int | None  # Epoch microseconds
+    assigned_duration_seconds: int
+    timeout_notified: bool = False
+
+
+@dataclass
+class GameState:
+    """
+    Write-through, in-memory view of an active game.
+    Every transition persists to SQLite first, then updates memory, under the game's lock,
+    so handlers can validate and act without read queries.
+    """
+
+    game_id: int
+    managers: set[str]
+    opted_out: set[str]
+    client_secret: str
+    server_secret: str
+    turn: TurnState | None = None
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    @classmethod
+    def load(cls, game_id: int) -> "GameState":
+        secrets = db.get_latest_secrets(game_id)
+        if not secrets:
+            raise ValueError(f"Game {game_id} has no transactions.")
+        participants = db.get_game_participants_by_status(game_id)
+        state = cls(
+            game_id=game_id,
+            managers=set(db.list_game_manager(game_id)),
+            opted_out=set(participants["opted_out"]),
+            client_secret=secrets[0],
+            server_secret=secrets[1],
+        )
+        row = db.get_turn_by_status(game_id, list(OPEN_TURN_STATUSES))
+        if row:
+            state.turn = TurnState(
+                user_id=row["user_id"],
+                status=row["status"],
+                start_time=row["start_time"],
+                assigned_duration_seconds=row["assigned_duration_seconds"],
+                timeout_notified=bool(row["timeout_notified"]),
+            )
+        return state
+
+    # === Queries, no database access ===
+
+    def is_manager(self, user_id: str) -> bool:
+        return user_id in self.managers
+
+    def turn_with_status(self, *statuses: str) -> TurnState | None:
+        if self.turn and self.turn.status in statuses:
+            return self.turn
+        return None
+
+    def pending_user(self) -> str | None:
+        turn = self.turn_with_status("PENDING")
+        return turn.user_id if turn else None
+
+    def in_progress_user(self) -> str | None:
+        turn = self.turn_with_status("IN_PROGRESS")
+        return turn.user_id if turn else None
+
+    def active_turn(self) -> TurnState | None:
+        """The current PENDING or IN_PROGRESS turn."""
+        return self.turn_with_status("PENDING", "IN_PROGRESS")
+
+    def user_name(self, user_id: str) -> str:
+        return db.get_user_names([user_id]).get(user_id, user_id)
+
+    # === Transitions, persisted before memory is updated ===
+
+    def select_user(self, user_id: str, duration_seconds: int, pick_details: dict):
+        with self.lock:
+            db.add_user_selection_transaction(
+                self.game_id, user_id, duration_seconds, pick_details=pick_details
+            )
+            self.turn = TurnState(user_id, "PENDING", None, duration_seconds)
+
+    def start_turn(self, user_id: str) -> TurnState:
+        with self.lock:
+            if self.pending_user() != user_id:
+                raise ValueError(
+                    f"No pending turn found for user {user_id} in game {self.game_id} to start."
+                )
+            start_time = datetime.now(timezone.utc)
+            db.start_turn(self.game_id, user_id, start_time)
+            assert self.turn is not None
+            self.turn.status = "IN_PROGRESS"
+            self.turn.start_time = db.to_epoch_us(start_time)
+            return self.turn
+
+    def update_turn_status(self, user_id: str, new_status: str):
+        with self.lock:
+            db.update_turn_status(self.game_id, user_id, new_status)
+            if self.turn and self.turn.user_id == user_id:
+                if new_status in OPEN_TURN_STATUSES:
+                    self.turn.status = new_status
+                else:
+                    self.turn = None
+
+    def set_timeout_notified(self, user_id: str):
+        with self.lock:
+            db.set_turn_timeout_notified(self.game_id, user_id)
+            if self.turn and self.turn.user_id == user_id:
+                self.turn.timeout_notified = True
+
+    def update_server_secret(self, new_server_secret: str):
+        with self.lock:
+            db.update_server_secret(self.game_id, new_server_secret)
+            self.server_secret = new_server_secret
+
+    def add_message(self, user_id: str, message_text: str, message_id: str) -> str:
+        """Logs a chat message and returns the new client secret."""
+        with self.lock:
+            db.add_message_transaction(self.game_id, user_id, message_text, message_id)
+            self.client_secret = db.next_client_secret(
+                self.client_secret, message_text, message_id
+            )
+            return self.client_secret
+
+    def add_manager(self, user_id: str):
+        with self.lock:
+            db.add_game_manager(self.game_id, user_id)
+            self.managers.add(user_id)
+
+    def remove_manager(self, user_id: str):
+        with self.lock:
+            db.remove_game_manager(self.game_id, user_id)
+            self.managers.discard(user_id)
+
+    def set_opt_out(self, user_id: str, is_opted_out: bool):
+        with self.lock:
+            db.update_participant_opt_out(self.game_id, user_id, is_opted_out)
+            if is_opted_out:
+                self.opted_out.add(user_id)
+            else:
+                self.opted_out.discard(user_id)
+
+    def end(self, status: str):
+        with self.lock:
+            db.update_game_status(self.game_id, status)
+            drop_game_state(self.game_id)
+
+
+_GAMES: dict[int, GameState] = {}
+_GAMES_LOCK = threading.Lock()
+
+
+def get_game_state(game_id: int) -> GameState:
+    """
+    Returns the cached state of an active game, loading it from the database on first use.
+    A game that is not ACTIVE is loaded but not cached, it is dropped when it ends.
+    For read-only checks on any game (e.g. permissions) use the db queries instead.
+    """
+    with _GAMES_LOCK:
+        state = _GAMES.get(game_id)
+        if state is None:
+            state = GameState.load(game_id)
+            if db.get_game_status(game_id) == "ACTIVE":
+                _GAMES[game_id] = state
+        return state
+
+
+def drop_game_state(game_id: int):
+    """Forgets a game, e.g. when it ends or is restarted outside of GameState."""
+    with _GAMES_LOCK:
+        _GAMES.pop(game_id, None)
@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from threading import Thread
+
+import db
+from api import get_project, get_project_time_cached
+
+POLL_INTERVAL = float(os.environ.get("HOURS_POLL_INTERVAL", "300"))
+BATCH_SIZE = int(os.environ.get("HOURS_POLL_BATCH", "10"))
+REQUEST_INTERVAL = float(os.environ.get("HOURS_REQUEST_INTERVAL", "0.5"))
+# Hours gained above the wall-clock time since the last check (plus this slack) cannot have been
+# coded on the project during the event, e.g. another hackatime project got merged into it.
+SPIKE_TOLERANCE = 0.1
+
+_poller: Thread | None = None
+
+
+def _fetch_hours(proj_id: int) -> float:
+    if os.environ.get("SIEGE_SESSION"):
+        # Only a project's first fetch reads the armory page here, after that the poll gets the value
+        # from the previous cycle and the page is re-read by api's rate-limited background refresh
+        return get_project_time_cached(proj_id, max_age=POLL_INTERVAL / 2)
+    return get_project(proj_id).hours
+
+
+def _hours_since(lastcheck: str | None, now: datetime) -> float | None:
+    if not lastcheck:
+        return None
+    checked = datetime.fromisoformat(lastcheck)
+    if checked.tzinfo is None:
+        checked = checked.replace(tzinfo=timezone.utc)  # CURRENT_TIMESTAMP is UTC without offset
+    return max(0.0, (now - checked).total_seconds() / 3600)
+
+
+def check_participant(participant) -> tuple[int, str, float, float] | None:
+    """Fetches the current hours of a participant and returns the (game_id, user_id, h_curr, extra_penalty) update."""
+    try:
+        h_new = _fetch_hours(participant["proj_id"])
+    except Exception:
+        logging.warning(
+            f"Failed to fetch hours for project {participant['proj_id']} (user {participant['user_id']})",
+            exc_info=True,
+        )
+        return None
+
+    penalty = 0.0
+    h_prev = participant["h_curr"]
+    elapsed = _hours_since(participant["h_lastcheck"], datetime.now(timezone.utc))
+    if h_prev is not None and elapsed is not None:
+        gained = h_new - h_prev
+        if gained > elapsed + SPIKE_TOLERANCE:
+            penalty = gained - elapsed
+            logging.info(
+                f"Hour spike for {participant['user_id']} in game {participant['game_id']}: "
+                f"+{gained:.2f}h in {elapsed:.2f}h, {penalty:.2f}h moved to penalty"
+            )
+    return (participant["game_id"], participant["user_id"], h_new, penalty)
+
+
+def poll_once(interval: float = POLL_INTERVAL):
+    """
+    Refreshes h_curr for every tracked participant, spread over `interval` seconds in batches.
+    Each batch is written in one transaction.
+    """
+    participants = db.get_participants_to_track()
+    if not participants:
+        return
+    batches = [
+        participants[i : i + BATCH_SIZE] for i in range(0, len(participants), BATCH_SIZE)
+    ]
+    gap = interval / len(batches)
+    for batch in batches:
+        batch_start = time.monotonic()
+        updates = []
+        for participant in batch:
+            if (update := check_participant(participant)) is not None:
+                updates.append(update)
+            time.sleep(REQUEST_INTERVAL)
+        db.update_participant_hours(updates)
+        time.sleep(max(0.0, gap - (time.monotonic() - batch_start)))
+
+
+def _poll_loop():
+    while True:
+        cycle_start = time.monotonic()
+        try:
+            poll_once()
+        except Exception:
+            logging.error("Hours poller cycle failed:", exc_info=True)
+        time.sleep(max(0.0, POLL_INTERVAL - (time.monotonic() - cycle_start)))
+
+
+def start_poller():
+    """Starts the background hours poller once per process."""
+    global _poller
+    if _poller is not None:
+        return
+    _poller = Thread(target=_poll_loop, daemon=True)
+    _poller.start()
+    print(f"⏱️ Hours poller started (every {POLL_INTERVAL:.0f}s, batches of {BATCH_SIZE}).")
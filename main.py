@@ -1,11 +1,21 @@
+import sys
+import startup_profile
+
+if "--profile-startup" in sys.argv:
+    startup_profile.install()
+
 import asyncio
 from collections.abc import Awaitable
 import os, logging, secrets, time
-from threading import Event as tEvent, Timer, Thread
+from threading import Event as tEvent, Timer, Thread, enumerate as enumerate_threads
 from datetime import datetime, timezone
 from typing import Any
 
 from dotenv import load_dotenv
+
+# Before the handler modules, they read their configuration on import
+load_dotenv()
+
 from slack_sdk.socket_mode import SocketModeClient
 from slack_sdk.socket_mode.client import BaseSocketModeClient
 from slack_sdk.web import WebClient
@@ -28,16 +38,24 @@ from reg import (
     smart_msg_listen,
     MessageContext,
 )
-from crypto.core import DeterRnd, Handler, _sha3, randint
+from crypto.core import Handler, _sha3, LATEST_VERSION
 import db
 import blockkit
 from blockkit import Message, Section, Button
-from server import start_server
-from ws_mgr import controller, signals
-import jwt
 import api
-from api import get_user, get_project
-from utils import guess_week
+import hours
+import maintenance
+import backup
+import metrics
+import presence
+import enrichment
+from game_state import get_game_state, drop_game_state
+from selection import (
+    DURATION_RANGE,
+    RIG_DURATION_RANGE,
+    derive_pick,
+    ticket_count,
+)
 
 import siege_cmd  # cmd import
 
@@ -152,6 +170,8 @@ def init_game(event: MessageEvent, client: WebClient):
         )
         return
 
+    # Writes joins still inside the debounce window, a manager may start the show right after joining
+    presence.flush()
     user_huddles = db.get_user_huddles(user_id)
     if not user_huddles:
         client.chat_postEphemeral(
@@ -184,15 +204,10 @@ def init_game(event: MessageEvent, client: WebClient):
         server_secret,
     )
     db.add_game_manager(game_id, user_id)
-    week_num = guess_week()
+    presence.flush()
     for user_id in db.get_huddle_participants(game_id):
-        user = get_user(user_id)
-        projs = [proj for proj in user.projects if proj.week == week_num]
-        if len(projs) == 0:
-            db.add_game_participant(game_id, user_id, None, None)
-        else:
-            full = get_project(projs[0].id)
-            db.add_game_participant(game_id, user_id, full.hours, full.id)
+        db.add_game_participant(game_id, user_id, None, None)
+        enrichment.enqueue(user_id, game_id)
 
     client.chat_postMessage(
         channel=channel_id,
@@ -249,32 +264,16 @@ def handle_restart_game(event: BlockActionEvent, client: WebClient):
             )
             return
 
-    with db.get_db_connection() as conn:
-        if is_authorized:
-            previous_managers = db.list_game_manager(game_id_to_restart)
-            for mgr_id in previous_managers:
-                if db.get_game_mgr_active_game(mgr_id):
-                    conn.execute(
-                        "DELETE FROM game_manager WHERE game_id = ? AND user_id = ?",
-                        (game_id_to_restart, mgr_id),
-                    )
-
-            conn.execute(
-                "INSERT OR IGNORE INTO game_manager (game_id, user_id) VALUES (?, ?)",
-                (game_id_to_restart, user_id),
-            )
-
-        conn.execute(
-            "UPDATE game SET status = 'ACTIVE', end_time = NULL WHERE id = ?",
-            (game_id_to_restart,),
-        )
-
-        client_secret = secrets.token_hex(16)
-        server_secret = secrets.token_hex(16)
-        db._add_transaction(
-            conn, game_id_to_restart, "GAME_RESTART", client_secret, server_secret
-        )
-        conn.commit()
+    client_secret = secrets.token_hex(16)
+    server_secret = secrets.token_hex(16)
+    db.restart_game(
+        game_id_to_restart,
+        user_id,
+        take_over=is_authorized,
+        client_secret=client_secret,
+        server_secret=server_secret,
+    )
+    drop_game_state(game_id_to_restart)
 
     client.chat_postMessage(
         channel=channel_id,
@@ -290,8 +289,8 @@ def handle_restart_game(event: BlockActionEvent, client: WebClient):
 def _handle_manager_action_timeout(
     game_id: int, user_id: str, channel_id: str, thread_ts: str, client: WebClient
 ):
-    pending_user = db.get_pending_turn_user(game_id)
-    if pending_user == user_id:
+    state = get_game_state(game_id)
+    if state.pending_user() == user_id:
         print(f"Manager action timeout for user {user_id} in game {game_id}.")
         message_payload = (
             Message(
@@ -307,7 +306,7 @@ def _handle_manager_action_timeout(
                 )
             )
         ).build()
-        db.set_turn_timeout_notified(game_id, user_id)
+        state.set_timeout_notified(user_id)
         client.chat_postMessage(
             channel=channel_id, thread_ts=thread_ts, **message_payload
         )
@@ -315,15 +314,27 @@ def _handle_manager_action_timeout(
 
 ACTIVE_TURN_TIMERS: dict[tuple[int, str], Timer] = {}
 
+metrics.gauge(
+    "turn_timers_active",
+    "Running performance timers of IN_PROGRESS turns.",
+    lambda: len(ACTIVE_TURN_TIMERS),
+)
+metrics.gauge(
+    "timers_active",
+    "Pending threading.Timer callbacks (turn timeouts, manager timeouts, retries).",
+    lambda: sum(isinstance(t, Timer) and t.is_alive() for t in enumerate_threads()),
+)
+
 
 def _handle_user_turn_timeout(
     game_id: int, user_id: str, channel_id: str, thread_ts: str, client: WebClient
 ):
-    turn_details = db.get_turn_by_status(game_id, ["IN_PROGRESS", "ACCEPTED"])
+    state = get_game_state(game_id)
+    turn_details = state.turn_with_status("IN_PROGRESS", "ACCEPTED")
     if (
         not turn_details
-        or turn_details["user_id"] != user_id
-        or turn_details["timeout_notified"]
+        or turn_details.user_id != user_id
+        or turn_details.timeout_notified
     ):
         return
 
@@ -332,7 +343,7 @@ def _handle_user_turn_timeout(
     except KeyError:
         pass
 
-    db.set_turn_timeout_notified(game_id, user_id)
+    state.set_timeout_notified(user_id)
     print(
         f"⌛️ User turn for {user_id} in game {game_id} has expired. Sending manager notification."
     )
@@ -417,17 +428,17 @@ def debug(ctx: MessageContext):
 
 
 def _build_active_turn_message(game_id: int, is_public: bool = False) -> Message | None:
-    active_turn = db.get_active_turn_details(game_id)
+    state = get_game_state(game_id)
+    active_turn = state.active_turn()
     if not active_turn:
         return None
 
-    user_id = active_turn["user_id"]
-    status = active_turn["status"]
+    user_id = active_turn.user_id
+    status = active_turn.status
 
     user_display_name = f"<@{user_id}>"
     if is_public:
-        user_names_map = db.get_user_names([user_id])
-        user_display_name = user_names_map.get(user_id, user_id)
+        user_display_name = state.user_name(user_id)
 
     status_text = f"Status: `{status}`"
     time_text = ""
@@ -435,13 +446,10 @@ def _build_active_turn_message(game_id: int, is_public: bool = False) -> Message
     finish_button = False
     in_progress_button = False
 
-    if status in ("IN_PROGRESS", "ACCEPTED") and active_turn["start_time"]:
-        start_time = datetime.fromisoformat(active_turn["start_time"])
-        duration = active_turn["assigned_duration_seconds"]
-        end_time = start_time.timestamp() + duration
-        remaining_seconds = max(
-            0, int(end_time - datetime.now(timezone.utc).timestamp())
-        )
+    if status in ("IN_PROGRESS", "ACCEPTED") and active_turn.start_time:
+        duration = active_turn.assigned_duration_seconds
+        end_time = db.epoch_seconds(active_turn.start_time) + duration
+        remaining_seconds = max(0, int(end_time - time.time()))
 
         if remaining_seconds > 0:
             time_text = (
@@ -590,7 +598,7 @@ def confirm_optout(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    db.update_participant_opt_out(game_id, user_id, is_opted_out=True)
+    get_game_state(game_id).set_opt_out(user_id, is_opted_out=True)
 
     client.chat_postEphemeral(
         user=user_id,
@@ -619,14 +627,16 @@ def reject_turn(ctx: MessageContext):
         ctx.private_send(text="There are no performance here, go somewhere else!")
         return
 
-    if not db.is_game_manager(game_id, user_id):
+    state = get_game_state(game_id)
+    if not state.is_manager(user_id):
         ctx.private_send(text="You cannot overrule the magician.")
+        return
 
-    turn_row = db.get_active_turn_details(game_id)
+    turn_row = state.active_turn()
 
     if turn_row:
-        db.update_turn_status(game_id, turn_row["user_id"], "FAILED")
-        ctx.public_send(text=f"Rejected <@{turn_row['user_id']}>'s performance")
+        state.update_turn_status(turn_row.user_id, "FAILED")
+        ctx.public_send(text=f"Rejected <@{turn_row.user_id}>'s performance")
     else:
         ctx.public_send(text="There are no active turn rn!")
 
@@ -647,13 +657,14 @@ def add_manager(event: MessageEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, user_id):
+    if not get_game_state(game_id).is_manager(user_id):
         client.chat_postEphemeral(
             user=user_id,
             channel=channel_id,
             text="You cannot overrule the magician.",
             thread_ts=thread_ts,
         )
+        return
 
     user_id = event.message.text.removeprefix("live.add_mgr").strip()
 
@@ -677,7 +688,7 @@ def add_manager(event: MessageEvent, client: WebClient):
         return
 
     if not db.has_game_manager(user_id):
-        db.add_game_manager(game_id, user_id)
+        get_game_state(game_id).add_manager(user_id)
         client.chat_postMessage(
             channel=channel_id,
             text="<@" + user_id + "> is now the new show manager!",
@@ -704,12 +715,13 @@ def force_leave(ctx: MessageContext):
             text="You are not a game manager in any active show instance."
         )
 
-    db.remove_game_manager(managing_game_id, user_id)
+    state = get_game_state(managing_game_id)
+    state.remove_manager(user_id)
 
     ctx.public_send(text="You are removed from the game manager in the active game")
 
-    if not db.list_game_manager(managing_game_id):
-        db.update_turn_status(managing_game_id, user_id, "COMPLETED")
+    if not state.managers:
+        state.end("COMPLETED")
         ctx.private_send(
             channel=channel_id,
             text="Additional from removing from game manager, the event is also ended",
@@ -727,12 +739,13 @@ def leave(ctx: MessageContext):
             text="You are not a game manager in any active show instance."
         )
 
-    if db.list_game_manager(managing_game_id) == [user_id]:
+    state = get_game_state(managing_game_id)
+    if state.managers == {user_id}:
         return ctx.private_send(
             text="You are the only manager left, therefore you cannot leave without ending the event. If you still want to do so, use `live.force_leave`"
         )
 
-    db.remove_game_manager(managing_game_id, user_id)
+    state.remove_manager(user_id)
 
     ctx.public_send(
         channel=channel_id,
@@ -756,7 +769,7 @@ def takeover(ctx: MessageContext):
     if not (game_id := db.get_active_game_by_thread(channel_id, thread_ts)):
         return ctx.private_send(text="No active game found in this thread.")
 
-    db.add_game_manager(game_id, user_id)
+    get_game_state(game_id).add_manager(user_id)
 
     return ctx.public_send(
         text=f"You have been added as a game manager in game {game_id}"
@@ -798,7 +811,7 @@ def remove_manager(ctx: MessageContext):
     if not db.has_game_manager(user_id):
         ctx.public_send(text="<@" + user_id + "> is not a manager anyway :)")
     else:
-        db.remove_game_manager(game_id, user_id)
+        get_game_state(game_id).remove_manager(user_id)
         ctx.public_send(text="<@" + user_id + "> is now no longer a show manager!")
 
     return
@@ -818,6 +831,7 @@ def show_members(ctx: MessageContext):
     if game_id is None:
         return ctx.private_send(text="No active show found in this thread.")
 
+    presence.flush()
     user_ids = db.get_huddle_participants(game_id)
     user_names_map = db.get_user_names(user_ids)
     user_name_list = [user_names_map.get(uid, uid) for uid in user_ids]
@@ -846,6 +860,7 @@ def show_eligiable(ctx: MessageContext):
     if game_id is None:
         return ctx.private_send(text="No active show found in this thread.")
 
+    presence.flush()
     user_ids = db.get_eligible_participants(game_id)
     user_names_map = db.get_user_names(user_ids)
     user_name_list = [user_names_map.get(uid, uid) for uid in user_ids]
@@ -914,7 +929,8 @@ def pick_user(event: MessageEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    state = get_game_state(game_id)
+    if not state.is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -923,85 +939,99 @@ def pick_user(event: MessageEvent, client: WebClient):
         )
         return
 
-    active_turn_message = _build_active_turn_message(game_id, is_public=False)
-    if active_turn_message:
-        client.chat_postMessage(
-            channel=channel_id, thread_ts=thread_ts, **active_turn_message.build()
-        )
-        return
-
-    eligible_users = db.get_eligible_participants(game_id)
-    if not eligible_users:
-        client.chat_postMessage(
-            channel=channel_id,
-            text="Magician don't like any of you so he don't want to start a performance.",
-            thread_ts=thread_ts,
-        )
-        return
+    # Serializes concurrent `live.pick`s so a game never has two pending picks
+    with state.lock:
+        active_turn_message = _build_active_turn_message(game_id, is_public=False)
+        if active_turn_message:
+            client.chat_postMessage(
+                channel=channel_id, thread_ts=thread_ts, **active_turn_message.build()
+            )
+            return
 
-    eligible_users = list(sorted(eligible_users))
+        presence.flush()
+        eligible_users = db.get_eligible_participants(game_id)
+        if not eligible_users:
+            client.chat_postMessage(
+                channel=channel_id,
+                text="Magician don't like any of you so he don't want to start a performance.",
+                thread_ts=thread_ts,
+            )
+            return
 
-    game_secrets = db.get_latest_secrets(game_id)
-    if not game_secrets:
-        client.chat_postMessage(
-            channel=channel_id,
-            text="Cannot pick user: Game secrets could not be retrieved.",
-            thread_ts=thread_ts,
-        )
-        return
-    client_secret, server_secret = game_secrets
+        eligible_users = list(sorted(eligible_users))
 
-    seed = f"{client_secret}{server_secret}"
+        tickets: list[int] | None = None
+        if os.getenv("SIEGE_MODE"):
+            coded_hours = db.get_participant_hours(game_id, eligible_users)
+            eligible_users = [uid for uid in eligible_users if uid in coded_hours]
+            if not eligible_users:
+                client.chat_postMessage(
+                    channel=channel_id,
+                    text="Magician can't find anyone with a Siege project to start a performance.",
+                    thread_ts=thread_ts,
+                )
+                return
+            tickets = [ticket_count(coded_hours[uid]) for uid in eligible_users]
 
-    t = randint(300, 1200)
-    if os.getenv("RIG"):
-        t = randint(180, 180)
+        client_secret, server_secret = state.client_secret, state.server_secret
 
-    selected_index, duration_seconds = (
-        DeterRnd(randint(0, len(eligible_users) - 1), t).with_seed(seed).retrieve()
-    )
-    target_user_id = eligible_users[selected_index]
+        seed = f"{client_secret}{server_secret}"
 
-    duration_minutes = duration_seconds // 60
-    remaining_seconds = duration_seconds % 60
+        duration_range = RIG_DURATION_RANGE if os.getenv("RIG") else DURATION_RANGE
 
-    duration_text_parts = []
-    if duration_minutes > 0:
-        duration_text_parts.append(
-            f"{duration_minutes} minute{'s' if duration_minutes > 1 else ''}"
-        )
-    if remaining_seconds > 0:
-        duration_text_parts.append(
-            f"{remaining_seconds} second{'s' if remaining_seconds > 1 else ''}"
+        selected_index, duration_seconds = derive_pick(
+            seed, eligible_users, tickets, duration_range, LATEST_VERSION
         )
-    duration_text = " and ".join(duration_text_parts)
+        target_user_id = eligible_users[selected_index]
 
-    db.add_user_selection_transaction(game_id, target_user_id, duration_seconds)
+        duration_minutes = duration_seconds // 60
+        remaining_seconds = duration_seconds % 60
 
-    user_names_map = db.get_user_names([target_user_id])
-    user_name = user_names_map.get(target_user_id, target_user_id)
+        duration_text_parts = []
+        if duration_minutes > 0:
+            duration_text_parts.append(
+                f"{duration_minutes} minute{'s' if duration_minutes > 1 else ''}"
+            )
+        if remaining_seconds > 0:
+            duration_text_parts.append(
+                f"{remaining_seconds} second{'s' if remaining_seconds > 1 else ''}"
+            )
+        duration_text = " and ".join(duration_text_parts)
 
-    coro = controller.connection_manager.send(
-        f"turn/{game_id}",
-        json.dumps(
+        # Everything needed to replay this pick, see audit.py
+        state.select_user(
+            target_user_id,
+            duration_seconds,
+            pick_details={
+                "rnd_version": LATEST_VERSION,
+                "client_secret": client_secret,
+                "server_secret": server_secret,
+                "eligible": eligible_users,
+                "tickets": tickets,
+                "duration_range": list(duration_range),
+            },
+        )
+
+        user_name = state.user_name(target_user_id)
+
+        _ws_send(
+            f"turn/{game_id}",
             {
                 "type": "turn_update",
                 "status": "PENDING",
                 "user_id": target_user_id,
                 "user_name": user_name,
-            }
-        ).encode(),
-    )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
+            },
+        )
 
-    timeout_seconds = 120
-    Timer(
-        timeout_seconds,
-        _handle_manager_action_timeout,
-        args=(game_id, target_user_id, channel_id, thread_ts, client),
-    ).start()
-    new_server_secret = secrets.token_hex(16)
-    db.update_server_secret(game_id, new_server_secret)
+        timeout_seconds = 120
+        Timer(
+            timeout_seconds,
+            _handle_manager_action_timeout,
+            args=(game_id, target_user_id, channel_id, thread_ts, client),
+        ).start()
+        new_server_secret = secrets.token_hex(16)
+        state.update_server_secret(new_server_secret)
 
     message_payload = (
         Message(
@@ -1038,9 +1068,11 @@ def pick_user(event: MessageEvent, client: WebClient):
             blockkit.Section(
                 "Technical Data: \n"
                 f"Client secret: `{client_secret}`\n"
-                f"Previous Server secret: `{_sha3(new_server_secret)}` \n"
-                f"New Server secret hash: `{_sha3(server_secret)}` \n"
+                f"Previous Server secret: `{server_secret}` \n"
+                f"New Server secret hash: `{_sha3(new_server_secret)}` \n"
+                f"RNG version: `{LATEST_VERSION}`\n"
                 f"Eligiable list: {', '.join(f'`{user_id}`' for user_id in eligible_users)}"
+                + (f"\nTickets: {', '.join(f'`{count}`' for count in tickets)}" if tickets else "")
             )
         )
     ).build()
@@ -1048,6 +1080,22 @@ def pick_user(event: MessageEvent, client: WebClient):
     client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, **message_payload)
 
 
+def format_completion_rate(stats) -> str:
+    """' (75% completed)' once a turn is over, empty before."""
+    if stats["completion_rate"] is None:
+        return ""
+    return f" ({stats['completion_rate']:.0%} completed)"
+
+
+def format_game_totals(game_id: int) -> str | None:
+    totals = db.get_game_totals(game_id)
+    if totals is None:
+        return None
+    minutes = round(totals["assigned_seconds"] / 60)
+    rate = f" ({totals['completion_rate']:.0%})" if totals["completion_rate"] is not None else ""
+    return f"_{totals['turns']} turn(s), {totals['completed']} completed{rate}, {minutes} min of stage time assigned._"
+
+
 @smart_msg_listen("live.summary")
 def show_game_summary(ctx: MessageContext):
     if ctx.event.message.thread_ts is None:
@@ -1068,13 +1116,16 @@ def show_game_summary(ctx: MessageContext):
     else:
         summary_text = ""
         for stat in summary_stats:
-            summary_text += f"• *{stat['name']}*: {stat['successful_rounds']} successful performance(s), {stat['consecutive_skips']} consecutive skip(s).\n"
+            summary_text += f"• *{stat['name']}*: {stat['completed']} successful performance(s), {stat['consecutive_skips']} consecutive skip(s){format_completion_rate(stat)}.\n"
 
         summary_message.add_block(Section(summary_text))
+        if totals := format_game_totals(game_id):
+            summary_message.add_block(Section(totals))
 
     summary_message.add_block(blockkit.Divider())
     summary_message.add_block(Section("The show is still ongoing! 🎉"))
 
+    # Not get_game_state, the game may have ended and even been archived
     if db.is_game_manager(game_id, ctx.event.message.user):
         ctx.public_send(**summary_message.build())
     else:
@@ -1097,6 +1148,8 @@ def export_game_history(ctx: MessageContext):
         return ctx.public_send(text="No turns have been recorded for this game yet.")
 
     history_text = f"*Turn History for Game {game_id}*\n"
+    if totals := format_game_totals(game_id):
+        history_text += f"{totals}\n"
     for i, turn in enumerate(turns):
         user_id = turn["user_id"]
         status = turn["status"] == "COMPLETED"
@@ -1113,6 +1166,65 @@ def export_game_history(ctx: MessageContext):
     ctx.public_send(text=history_text)
 
 
+SEARCH_FILTER_RE = re.compile(r"\b(game|from|since|until):(\S+)")
+
+
+@smart_msg_listen("live.search")
+def search_messages(ctx: MessageContext):
+    user_id = ctx.event.message.user
+    if user_id not in AUTHORIZED_USERS and not db.has_game_manager(user_id):
+        return ctx.private_send(text="Only game managers can search the show chats.")
+
+    text = ctx.event.message.text.removeprefix("live.search")
+    filters = dict(SEARCH_FILTER_RE.findall(text))
+    words = SEARCH_FILTER_RE.sub("", text).strip()
+    if not words:
+        return ctx.private_send(
+            text="Usage: `live.search <words> [game:<id>|game:here] [from:@user] [since:YYYY-MM-DD] [until:YYYY-MM-DD]`"
+        )
+
+    game_id = None
+    try:
+        if filters.get("game") == "here":
+            thread_ts = ctx.event.message.thread_ts
+            game_id = db.get_any_game_by_thread(ctx.event.channel, thread_ts) if thread_ts else None
+            if game_id is None:
+                return ctx.private_send(text="No show found in this thread.")
+        elif "game" in filters:
+            game_id = int(filters["game"])
+        since = datetime.fromisoformat(filters["since"]).replace(tzinfo=timezone.utc) if "since" in filters else None
+        until = datetime.fromisoformat(filters["until"]).replace(tzinfo=timezone.utc) if "until" in filters else None
+    except ValueError:
+        return ctx.private_send(text="Invalid filter, games are numbers and dates look like `2025-06-30`.")
+    from_user = filters.get("from", "").removeprefix("<@").removesuffix(">") or None
+
+    results = db.search_messages(words, game_id=game_id, user_id=from_user, since=since, until=until)
+    if not results:
+        return ctx.private_send(text=f"No messages match `{words}`.")
+    lines = [
+        f"• {db.from_epoch_us(row['timestamp']):%Y-%m-%d %H:%M} UTC, game {row['game_id']}, <@{row['user_id']}>: {row['snippet']}"
+        for row in results
+    ]
+    ctx.private_send(text=f"*{len(results)} best matches for `{words}`:*\n" + "\n".join(lines))
+
+
+@smart_msg_listen("live.backup")
+def take_backup(ctx: MessageContext):
+    if ctx.event.message.user not in AUTHORIZED_USERS:
+        return ctx.private_send(text="You cannot pretend to be authorised magician.")
+
+    ctx.private_send(text="💾 Backing up the database, this runs alongside the show...")
+    try:
+        path = backup.backup()
+    except Exception as e:
+        logging.error("Backup failed:", exc_info=True)
+        return ctx.private_send(text=f"❌ Backup failed: {e}")
+    ctx.private_send(
+        text=f"✅ Backup `{path.name}` written and verified ({path.stat().st_size / 1e6:.1f}MB), "
+        f"{len(backup.list_backups())} backups kept."
+    )
+
+
 @msg_listen("live.rnd")
 def refresh_server_secret(event: MessageEvent, client: WebClient):
     manager_id = event.message.user
@@ -1138,7 +1250,7 @@ def refresh_server_secret(event: MessageEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1149,10 +1261,11 @@ def refresh_server_secret(event: MessageEvent, client: WebClient):
 
     new_server_secret = secrets.token_hex(16)
     new_server_secret_hash = _sha3(new_server_secret)
-    db.update_server_secret(game_id, new_server_secret)
-
-    (client_secret, _) = db.get_latest_secrets(game_id) or ("N/A", "N/A")
+    state = get_game_state(game_id)
+    state.update_server_secret(new_server_secret)
+    client_secret = state.client_secret
 
+    presence.flush()
     eligible_users = db.get_eligible_participants(game_id)
     if eligible_users:
         user_names_map = db.get_user_names(eligible_users)
@@ -1212,7 +1325,7 @@ def end_game(event: MessageEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1221,7 +1334,7 @@ def end_game(event: MessageEvent, client: WebClient):
         )
         return
 
-    db.update_game_status(game_id, "COMPLETED")
+    get_game_state(game_id).end("COMPLETED")
 
     summary_stats = db.get_game_summary_stats(game_id)
 
@@ -1233,9 +1346,11 @@ def end_game(event: MessageEvent, client: WebClient):
     else:
         summary_text = ""
         for stat in summary_stats:
-            summary_text += f"• *{stat['name']}*: {stat['successful_rounds']} successful performance(s) :), {stat['consecutive_skips']} skip(s) :(.\n"
+            summary_text += f"• *{stat['name']}*: {stat['completed']} successful performance(s) :), {stat['skipped']} skip(s) :({format_completion_rate(stat)}.\n"
 
         summary_message.add_block(Section(summary_text))
+        if totals := format_game_totals(game_id):
+            summary_message.add_block(Section(totals))
 
     summary_message.add_block(blockkit.Divider())
     summary_message.add_block(Section("Thanks for playing! 🎉"))
@@ -1266,7 +1381,7 @@ def handle_manager_force_mark_completed(event: BlockActionEvent, client: WebClie
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1275,22 +1390,18 @@ def handle_manager_force_mark_completed(event: BlockActionEvent, client: WebClie
         )
         return
 
-    user_names_map = db.get_user_names([user_id])
-    user_name = user_names_map.get(user_id, user_id)
-    coro = controller.connection_manager.send(
+    user_name = get_game_state(game_id).user_name(user_id)
+    _ws_send(
         f"turn/{game_id}",
-        json.dumps(
-            {
-                "type": "turn_update",
-                "status": "COMPLETED",
-                "user_id": user_id,
-                "user_name": user_name,
-            }
-        ).encode(),
+        {
+            "type": "turn_update",
+            "status": "COMPLETED",
+            "user_id": user_id,
+            "user_name": user_name,
+        },
     )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
-    db.update_turn_status(game_id, user_id, "COMPLETED")
+    get_game_state(game_id).update_turn_status(user_id, "COMPLETED")
 
     client.chat_postMessage(
         channel=channel_id,
@@ -1327,7 +1438,7 @@ def handle_manager_mark_completed(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1336,22 +1447,18 @@ def handle_manager_mark_completed(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    user_names_map = db.get_user_names([user_id])
-    user_name = user_names_map.get(user_id, user_id)
-    coro = controller.connection_manager.send(
+    user_name = get_game_state(game_id).user_name(user_id)
+    _ws_send(
         f"turn/{game_id}",
-        json.dumps(
-            {
-                "type": "turn_update",
-                "status": "COMPLETED",
-                "user_id": user_id,
-                "user_name": user_name,
-            }
-        ).encode(),
+        {
+            "type": "turn_update",
+            "status": "COMPLETED",
+            "user_id": user_id,
+            "user_name": user_name,
+        },
     )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
-    db.update_turn_status(game_id, user_id, "COMPLETED")
+    get_game_state(game_id).update_turn_status(user_id, "COMPLETED")
 
     client.chat_update(
         channel=channel_id,
@@ -1381,7 +1488,7 @@ def show_client_secret(ctx: MessageContext):
         ctx.private_send(text="No active show found in this thread.")
         return
 
-    (client_secret, _) = db.get_latest_secrets(game_id) or ("N/A", "N/A")
+    client_secret = get_game_state(game_id).client_secret
     ctx.public_send(text=f"Current client secret: `{client_secret}`.")
 
 
@@ -1406,7 +1513,7 @@ def handle_manager_mark_failed(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1415,22 +1522,18 @@ def handle_manager_mark_failed(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    user_names_map = db.get_user_names([user_id])
-    user_name = user_names_map.get(user_id, user_id)
-    coro = controller.connection_manager.send(
+    user_name = get_game_state(game_id).user_name(user_id)
+    _ws_send(
         f"turn/{game_id}",
-        json.dumps(
-            {
-                "type": "turn_update",
-                "status": "FAILED",
-                "user_id": user_id,
-                "user_name": user_name,
-            }
-        ).encode(),
+        {
+            "type": "turn_update",
+            "status": "FAILED",
+            "user_id": user_id,
+            "user_name": user_name,
+        },
     )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
-    db.update_turn_status(game_id, user_id, "FAILED")
+    get_game_state(game_id).update_turn_status(user_id, "FAILED")
 
     client.chat_update(
         channel=channel_id,
@@ -1473,7 +1576,7 @@ def handle_start_turn(event: BlockActionEvent, client: WebClient):
             )
             return
 
-        if not db.is_game_manager(game_id, manager_id):
+        if not get_game_state(game_id).is_manager(manager_id):
             client.chat_postEphemeral(
                 user=manager_id,
                 channel=channel_id,
@@ -1482,7 +1585,8 @@ def handle_start_turn(event: BlockActionEvent, client: WebClient):
             )
             return
 
-        pending_user_id = db.get_pending_turn_user(game_id)
+        state = get_game_state(game_id)
+        pending_user_id = state.pending_user()
         if not pending_user_id:
             client.chat_postMessage(
                 channel=channel_id,
@@ -1490,7 +1594,7 @@ def handle_start_turn(event: BlockActionEvent, client: WebClient):
                 thread_ts=thread_ts,
             )
             return
-        turn_details = db.start_turn(game_id, pending_user_id)
+        turn = state.start_turn(pending_user_id)
         message_payload = (
             Message(
                 text=f"<@{pending_user_id}>'s performance has officially started! Good luck!"
@@ -1501,28 +1605,24 @@ def handle_start_turn(event: BlockActionEvent, client: WebClient):
             channel=channel_id, thread_ts=thread_ts, **message_payload
         )
 
-        duration_seconds = turn_details["assigned_duration_seconds"]
+        duration_seconds = turn.assigned_duration_seconds
         user_turn_timer = Timer(
             duration_seconds,
             _handle_user_turn_timeout,
             args=(game_id, pending_user_id, channel_id, thread_ts, client),
         )
-        user_names_map = db.get_user_names([pending_user_id])
-        user_name = user_names_map.get(pending_user_id, pending_user_id)
-        end_time = datetime.now(timezone.utc).timestamp() + duration_seconds
-        coro = controller.connection_manager.send(
+        user_name = state.user_name(pending_user_id)
+        end_time = db.epoch_seconds(turn.start_time) + duration_seconds
+        _ws_send(
             f"turn/{game_id}",
-            json.dumps(
-                {
-                    "type": "turn_update",
-                    "status": "IN_PROGRESS",
-                    "user_id": pending_user_id,
-                    "user_name": user_name,
-                    "endTime": end_time,
-                }
-            ).encode(),
-        )
-        asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
+            {
+                "type": "turn_update",
+                "status": "IN_PROGRESS",
+                "user_id": pending_user_id,
+                "user_name": user_name,
+                "endTime": end_time,
+            },
+        )
         ACTIVE_TURN_TIMERS[(game_id, pending_user_id)] = user_turn_timer
         user_turn_timer.start()
     except ValueError as e:
@@ -1552,7 +1652,7 @@ def handle_accept_turn(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    in_progress_user_id = db.get_in_progress_turn_user(game_id)
+    in_progress_user_id = get_game_state(game_id).in_progress_user()
     if not in_progress_user_id:
         client.chat_postEphemeral(
             user=clicker_id,
@@ -1571,7 +1671,7 @@ def handle_accept_turn(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    db.update_turn_status(game_id, clicker_id, "ACCEPTED")
+    get_game_state(game_id).update_turn_status(clicker_id, "ACCEPTED")
 
     client.chat_update(
         channel=channel_id,
@@ -1608,7 +1708,7 @@ def handle_confirm_skip(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    if not db.is_game_manager(game_id, manager_id):
+    if not get_game_state(game_id).is_manager(manager_id):
         client.chat_postEphemeral(
             user=manager_id,
             channel=channel_id,
@@ -1617,22 +1717,18 @@ def handle_confirm_skip(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    user_names_map = db.get_user_names([str(user_to_skip)])
-    user_name = user_names_map.get(str(user_to_skip), str(user_to_skip))
-    coro = controller.connection_manager.send(
+    user_name = get_game_state(game_id).user_name(str(user_to_skip))
+    _ws_send(
         f"turn/{game_id}",
-        json.dumps(
-            {
-                "type": "turn_update",
-                "status": "SKIPPED",
-                "user_id": str(user_to_skip),
-                "user_name": user_name,
-            }
-        ).encode(),
+        {
+            "type": "turn_update",
+            "status": "SKIPPED",
+            "user_id": str(user_to_skip),
+            "user_name": user_name,
+        },
     )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
-    db.update_turn_status(game_id, str(user_to_skip), "SKIPPED")
+    get_game_state(game_id).update_turn_status(str(user_to_skip), "SKIPPED")
 
     client.chat_update(
         channel=channel_id,
@@ -1666,7 +1762,7 @@ def handle_skip_turn(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    pending_user_id = db.get_pending_turn_user(game_id)
+    pending_user_id = get_game_state(game_id).pending_user()
     if not pending_user_id:
         client.chat_postEphemeral(
             user=clicker_id,
@@ -1676,7 +1772,7 @@ def handle_skip_turn(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    is_manager = db.is_game_manager(game_id, clicker_id)
+    is_manager = get_game_state(game_id).is_manager(clicker_id)
     is_selected_user = clicker_id == pending_user_id
 
     if not is_manager and not is_selected_user:
@@ -1688,22 +1784,18 @@ def handle_skip_turn(event: BlockActionEvent, client: WebClient):
         )
         return
 
-    user_names_map = db.get_user_names([pending_user_id])
-    user_name = user_names_map.get(pending_user_id, pending_user_id)
-    coro = controller.connection_manager.send(
+    user_name = get_game_state(game_id).user_name(pending_user_id)
+    _ws_send(
         f"turn/{game_id}",
-        json.dumps(
-            {
-                "type": "turn_update",
-                "status": "SKIPPED",
-                "user_id": pending_user_id,
-                "user_name": user_name,
-            }
-        ).encode(),
+        {
+            "type": "turn_update",
+            "status": "SKIPPED",
+            "user_id": pending_user_id,
+            "user_name": user_name,
+        },
     )
-    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
-    db.update_turn_status(game_id, pending_user_id, "SKIPPED")
+    get_game_state(game_id).update_turn_status(pending_user_id, "SKIPPED")
 
     client.chat_postMessage(
         channel=channel_id,
@@ -1719,6 +1811,14 @@ async def _dispatch_async(coro: Awaitable[Any]):
         logging.error("Exception in a dispatched task:", exc_info=True)
 
 
+def _ws_send(meta: str, payload: dict[str, Any]):
+    """Pushes a JSON message to the dashboard websockets subscribed to `meta`."""
+    from ws_mgr import controller, signals  # Already loaded by _start_server on the main thread
+
+    coro = controller.connection_manager.send(meta, json.dumps(payload).encode())
+    asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
+
+
 @smart_msg_listen("live.mgr_secret")
 def show_mgr_secret(ctx: MessageContext):
     user_id = ctx.event.message.user
@@ -1728,6 +1828,8 @@ def show_mgr_secret(ctx: MessageContext):
             text="You are not a game manager of any active game instance"
         )
 
+    import jwt
+
     jwt_token = jwt.encode(
         {
             "user_id": user_id,
@@ -1788,18 +1890,15 @@ def listen_all(ctx: MessageContext):
 
     if game_id := db.get_active_game_by_thread(ctx.event.channel, thread_ts):
         db.upsert_user(ctx.event.message.user, "UNKNOWN")
-        db.add_message_transaction(
-            game_id,
+        client_secret = get_game_state(game_id).add_message(
             ctx.event.message.user,
             ctx.event.message.text,
             ctx.event.message.ts,
         )
-        client_secret, _ = db.get_latest_secrets(game_id) or ("N/A", "N/A")
-        coro = controller.connection_manager.send(
+        _ws_send(
             f"client/{game_id}",
-            json.dumps({"type": "secret", "value": client_secret}).encode(),
+            {"type": "secret", "value": client_secret},
         )
-        asyncio.run_coroutine_threadsafe(_dispatch_async(coro), signals.ROOT.loop)
 
 
 @msg_listen("huddle_thread", is_subtype=True)
@@ -1824,20 +1923,15 @@ def handle_huddle_join(event: HuddleChange, client: WebClient):
     user_id = event.user.id
     user_name = event.user.name
     huddle_id = event.call_id
-    db.upsert_huddle(huddle_id, "UNKNOWN", datetime.now(timezone.utc))
-    db.upsert_user(user_id, user_name, event.user.profile.avatars.image_512)
-    db.add_huddle_participant(huddle_id, user_id)
+    if db.get_user_names([user_id]).get(user_id) != user_name:
+        db.upsert_user(user_id, user_name, event.user.profile.avatars.image_512)
+    presence.join(huddle_id, user_id)
     print(f"ℹ️ User {user_name} ({user_id}) joined huddle {huddle_id}.")
     game_id = db.get_active_game_in_huddle(huddle_id)
     if game_id is not None:
-        user = get_user(user_id)
-        week_num = guess_week()
-        projs = [proj for proj in user.projects if proj.week == week_num]
-        if len(projs) == 0:
-            db.add_game_participant(game_id, user_id, None, None)
-        else:
-            full = get_project(projs[0].id)
-            db.add_game_participant(game_id, user_id, full.hours, full.id)
+        # Recorded right away, Siege data is filled in by the enrichment workers
+        db.add_game_participant(game_id, user_id, None, None)
+    enrichment.enqueue(user_id, game_id)
 
 
 @huddle_listen(HuddleState.NOT_IN_HUDDLE)
@@ -1845,16 +1939,12 @@ def handle_huddle_leave(event: HuddleChange, client: WebClient):
     user_id = event.user.id
     user_name = event.user.real_name or event.user.name
     # When a user leaves, the event doesn't specify which huddle.
-    # We find all huddles the user was in and remove them.
+    # We remove them from every huddle they were in.
     # In this app's logic, a user is likely in only one huddle at a time.
-    huddle_ids = db.get_user_huddles(user_id)
-    for huddle_id in huddle_ids:
-        db.remove_huddle_participant(huddle_id, user_id)
+    for huddle_id in presence.leave(user_id):
         print(f"🚪 User {user_name} ({user_id}) left huddle {huddle_id}.")
 
 
-load_dotenv()
-
 
 def load_active_timers(client: WebClient):
     print("⏳ Loading active timers from the database...")
@@ -1862,9 +1952,7 @@ def load_active_timers(client: WebClient):
     manager_timeout_duration = 120  # 2 minutes
 
     for turn in pending_turns:
-        selection_time = datetime.fromisoformat(turn["selection_time"]).replace(
-            tzinfo=timezone.utc
-        )
+        selection_time = db.from_epoch_us(turn["selection_time"])
         elapsed_time = (datetime.now(timezone.utc) - selection_time).total_seconds()
         remaining_time = manager_timeout_duration - elapsed_time
 
@@ -1901,7 +1989,7 @@ def load_active_timers(client: WebClient):
     in_progress_turns = db.get_all_turns_by_status(["IN_PROGRESS", "ACCEPTED"])
     for turn in in_progress_turns:
         start_time = (
-            datetime.fromisoformat(turn["start_time"]).replace(tzinfo=timezone.utc)
+            db.from_epoch_us(turn["start_time"])
             if turn["start_time"]
             else None
         )
@@ -1966,19 +2054,61 @@ def process_message(client: BaseSocketModeClient, req: SocketModeRequest):
         action_dispatch(event, client.web_client)
 
 
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    db.init_db()
+# Seconds to wait for the dashboard server's event loop before connecting to Slack
+SERVER_START_TIMEOUT = 10.0
+
+
+def _start_server() -> Thread:
+    """
+    Starts the dashboard server and waits until its event loop runs, so websocket pushes from the
+    first Slack events are delivered.
+    ws_mgr binds an event loop on import, which only works on the main thread, so this has to be
+    called from the main thread too.
+    """
+    from server import start_server  # FastAPI + uvicorn, only needed once the bot runs
+    from ws_mgr import signals
+
     thread = Thread(target=start_server)
     thread.start()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while not signals.ROOT.loop.is_running() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if not signals.ROOT.loop.is_running():
+        logging.warning(f"Dashboard server did not start within {SERVER_START_TIMEOUT:.0f}s, connecting anyway")
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    startup_profile.mark("import main")
+    with startup_profile.phase("init_db"):
+        db.init_db()
+    with startup_profile.phase("load_user_directory"):
+        db.load_user_directory()
+    with startup_profile.phase("presence.start"):
+        presence.start()
+    enrichment.start()
     client = SocketModeClient(
         app_token=os.environ["SLACK_APP_LEVEL_TOKEN"],
         web_client=WebClient(token=os.environ["SLACK_BOT_OAUTH_TOKEN"]),
     )
-    load_active_timers(client.web_client)
+    with startup_profile.phase("load_active_timers"):
+        load_active_timers(client.web_client)
+    if os.getenv("SIEGE_MODE"):
+        hours.start_poller()
+    maintenance.start()
+    backup.start()
     client.socket_mode_request_listeners.append(process_message)
+    if "--profile-startup" not in sys.argv:
+        with startup_profile.phase("start_server"):
+            _start_server()
     print("Bot is listening for messages...")
-    client.connect()
+    with startup_profile.phase("client.connect"):
+        client.connect()
+    if "--profile-startup" in sys.argv:
+        startup_profile.report()
+        client.close()
+        sys.exit(0)
     while True:
         try:
             tEvent().wait()
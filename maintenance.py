@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Thread
+
+import db
+import metrics
+from game_state import OPEN_TURN_STATUSES
+
+MAINTENANCE_INTERVAL = float(os.environ.get("DB_MAINTENANCE_INTERVAL", "3600"))
+# While a turn is open the run is postponed, checking again this often
+IDLE_RETRY = 60.0
+# Upper bound on the pages freed per run, so a run never holds the write lock for long
+VACUUM_PAGES = int(os.environ.get("DB_VACUUM_PAGES", "2000"))
+# Rows sampled per index by PRAGMA optimize, keeps ANALYZE cheap on a large event log
+ANALYSIS_LIMIT = 1000
+# The WAL is truncated back to this size when it restarts after a burst, instead of keeping its peak size
+WAL_SIZE_LIMIT = 16 * 1024 * 1024
+
+# Chat text older than this is purged (hashes are kept), 0 keeps it forever
+MESSAGE_RETENTION_DAYS = float(os.environ.get("MESSAGE_RETENTION_DAYS", "0"))
+
+# auto_vacuum values from PRAGMA auto_vacuum
+_INCREMENTAL = 2
+
+TASK_SECONDS = metrics.histogram(
+    "db_maintenance_duration_seconds",
+    "Time spent in each database maintenance task.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0),
+)
+RUNS = metrics.counter("db_maintenance_runs_total", "Database maintenance runs, per outcome.")
+
+_last_run = 0.0  # Unix time
+_vacuum_warned = False
+_runner: Thread | None = None
+
+
+def _file_size(suffix: str = "") -> int:
+    try:
+        return os.path.getsize(f"{db.DB_FILE}{suffix}")
+    except OSError:
+        return 0
+
+
+def _pragma(name: str) -> int:
+    with db.get_db_connection() as conn:
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+metrics.gauge("db_file_bytes", "Size of the SQLite database file.", _file_size)
+metrics.gauge("db_wal_bytes", "Size of the SQLite write-ahead log.", lambda: _file_size("-wal"))
+metrics.gauge("db_freelist_pages", "Unused pages in the database file.", lambda: _pragma("freelist_count"))
+metrics.gauge("db_maintenance_last_run_timestamp_seconds", "Unix time of the last completed maintenance run.", lambda: _last_run)
+
+
+def is_idle() -> bool:
+    """No turn is pending or running, so nobody is waiting on a timer or a button."""
+    return not db.get_all_turns_by_status(list(OPEN_TURN_STATUSES))
+
+
+@db.writes
+def run_once() -> dict[str, float]:
+    """
+    Runs every task on the writer connection, between two writes. Returns what it did, the same
+    numbers are exported at /metrics.
+    """
+    conn = db._writer.conn
+    done: dict[str, float] = {}
+
+    if MESSAGE_RETENTION_DAYS > 0:
+        with TASK_SECONDS.time(task="message_retention"):
+            done["purged_bodies"] = db.purge_message_bodies(
+                datetime.now(timezone.utc) - timedelta(days=MESSAGE_RETENTION_DAYS)
+            )
+
+    with TASK_SECONDS.time(task="optimize"):
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+
+    conn.execute(f"PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}")
+    with TASK_SECONDS.time(task="checkpoint"):
+        # PASSIVE never waits for readers, frames still in use are simply left for the next run
+        _busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    done["wal_frames"] = wal_frames
+    done["checkpointed_frames"] = checkpointed
+
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != _INCREMENTAL:
+        # Switching needs a full VACUUM, which would stall every write for as long as it takes. It is
+        # done offline by `archive.py --vacuum`, until then the file is simply not shrunk here
+        global _vacuum_warned
+        if not _vacuum_warned:
+            logging.warning("Incremental vacuum is off, stop the bot and run `archive.py --vacuum` once to enable it")
+            _vacuum_warned = True
+        done["vacuumed_pages"] = 0
+    else:
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        with TASK_SECONDS.time(task="incremental_vacuum"):
+            # Frees one page per step, so the result has to be drained
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        done["vacuumed_pages"] = free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return done
+
+
+def _maintenance_loop():
+    global _last_run
+    next_run = time.monotonic() + MAINTENANCE_INTERVAL
+    while True:
+        time.sleep(max(0.0, next_run - time.monotonic()))
+        try:
+            if not is_idle():
+                RUNS.inc(outcome="postponed")
+                next_run = time.monotonic() + IDLE_RETRY
+                continue
+            size_before = _file_size() + _file_size("-wal")
+            start = time.perf_counter()
+            done = run_once()
+            elapsed = time.perf_counter() - start
+            _last_run = time.time()
+            RUNS.inc(outcome="completed")
+            logging.info(
+                f"DB maintenance in {elapsed:.2f}s: {done['checkpointed_frames']}/{done['wal_frames']} WAL frames "
+                f"checkpointed, {done['vacuumed_pages']} pages vacuumed, "
+                f"{size_before / 1e6:.1f}MB -> {(_file_size() + _file_size('-wal')) / 1e6:.1f}MB"
+            )
+        except Exception:
+            RUNS.inc(outcome="failed")
+            logging.error("DB maintenance failed:", exc_info=True)
+        next_run = time.monotonic() + MAINTENANCE_INTERVAL
+
+
+def start():
+    """Starts the background maintenance scheduler once per process."""
+    global _runner
+    if _runner is not None:
+        return
+    _runner = Thread(target=_maintenance_loop, daemon=True)
+    _runner.start()
+    print(f"🧹 DB maintenance scheduled (every {MAINTENANCE_INTERVAL:.0f}s while no turn is open).")
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from threading import Thread
+
+import db
+
+# A membership change is only written once it has been stable this long, so a user flapping
+# between joined and left while reconnecting costs no writes at all.
+DEBOUNCE_SECONDS = float(os.environ.get("PRESENCE_DEBOUNCE", "5"))
+FLUSH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_user_huddles: dict[str, set[str]] = {}
+_huddle_members: dict[str, set[str]] = {}
+# Memberships as they are in the database
+_persisted: set[tuple[str, str]] = set()
+# (huddle_id, user_id) -> monotonic time of its last change, not yet written
+_dirty: dict[tuple[str, str], float] = {}
+
+_flusher: Thread | None = None
+
+
+def load():
+    """Seeds the in-memory maps from the database, called once on startup."""
+    memberships = db.get_all_huddle_participants()
+    with _lock:
+        _user_huddles.clear()
+        _huddle_members.clear()
+        _dirty.clear()
+        _persisted.clear()
+        _persisted.update(memberships)
+        for huddle_id, user_id in memberships:
+            _user_huddles.setdefault(user_id, set()).add(huddle_id)
+            _huddle_members.setdefault(huddle_id, set()).add(user_id)
+
+
+def join(huddle_id: str, user_id: str):
+    with _lock:
+        _user_huddles.setdefault(user_id, set()).add(huddle_id)
+        _huddle_members.setdefault(huddle_id, set()).add(user_id)
+        _dirty[(huddle_id, user_id)] = time.monotonic()
+
+
+def leave(user_id: str) -> list[str]:
+    """Removes a user from every huddle they are in and returns those huddles (Slack doesn't say which one was left)."""
+    with _lock:
+        huddle_ids = _user_huddles.pop(user_id, set())
+        now = time.monotonic()
+        for huddle_id in huddle_ids:
+            members = _huddle_members.get(huddle_id)
+            if members is not None:
+                members.discard(user_id)
+                if not members:
+                    del _huddle_members[huddle_id]
+            _dirty[(huddle_id, user_id)] = now
+        return sorted(huddle_ids)
+
+
+def huddle_members(huddle_id: str) -> set[str]:
+    with _lock:
+        return set(_huddle_members.get(huddle_id, ()))
+
+
+def user_huddles(user_id: str) -> set[str]:
+    with _lock:
+        return set(_user_huddles.get(user_id, ()))
+
+
+def flush(force: bool = True):
+    """
+    Writes pending membership changes in one transaction.
+    `force` also writes changes still inside the debounce window, call it before reading
+    huddle membership from the database (e.g. eligibility) so the read sees current presence.
+    """
+    # Flushes are serialized so two of them can't reorder a join and a leave, but the state lock is
+    # only held to pick the changes, join/leave handlers never wait for the writer queue
+    with _flush_lock:
+        with _lock:
+            cutoff = time.monotonic() - (0 if force else DEBOUNCE_SECONDS)
+            settled = [key for key, changed in _dirty.items() if changed <= cutoff]
+            joins: list[tuple[str, str]] = []
+            leaves: list[tuple[str, str]] = []
+            for key in settled:
+                del _dirty[key]
+                huddle_id, user_id = key
+                present = huddle_id in _user_huddles.get(user_id, ())
+                # Flapping that ended where it started needs no write
+                if present and key not in _persisted:
+                    joins.append(key)
+                elif not present and key in _persisted:
+                    leaves.append(key)
+        if not joins and not leaves:
+            return
+        try:
+            db.apply_huddle_presence(joins, leaves)
+        except Exception:
+            with _lock:
+                now = time.monotonic()
+                # A change made meanwhile is already pending with its own time
+                for key in joins + leaves:
+                    _dirty.setdefault(key, now)
+            raise
+        with _lock:
+            _persisted.update(joins)
+            _persisted.difference_update(leaves)
+    logging.debug(f"Presence flushed: {len(joins)} joins, {len(leaves)} leaves")
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush(force=False)
+        except Exception:
+            logging.error("Presence flush failed:", exc_info=True)
+
+
+def start():
+    """Loads presence and starts the background flusher once per process."""
+    global _flusher
+    if _flusher is not None:
+        return
+    load()
+    _flusher = Thread(target=_flush_loop, daemon=True)
+    _flusher.start()
+    atexit.register(flush)
+    print(f"👥 Presence engine started ({DEBOUNCE_SECONDS:.0f}s debounce).")
@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# A game's projection is snapshotted every this many events, a rebuild replays at most this many
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", "500"))
+# Bump when `GameProjection.apply` changes, older snapshots are then ignored and rebuilt
+PROJECTION_VERSION = 2
+SNAPSHOTS_KEPT = 2
+
+OPEN_TURN_STATUSES = ("PENDING", "IN_PROGRESS", "ACCEPTED")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_us(iso: str) -> int:
+    return (datetime.fromisoformat(iso) - _EPOCH) // timedelta(microseconds=1)
+
+
+@dataclass
+class TurnRecord:
+    user_id: str
+    status: str
+    selection_transaction_id: int
+    selected_at: int  # Epoch microseconds, like the event timestamps
+    duration_seconds: int | None
+    start_time: int | None = None
+
+
+@dataclass
+class ParticipantRecord:
+    successful_rounds: int = 0
+    consecutive_skips: int = 0
+    messages: int = 0
+
+
+@dataclass
+class GameProjection:
+    """A game's state as derived purely from its event_transaction log."""
+
+    game_id: int
+    status: str = "ACTIVE"
+    client_secret: str = ""
+    server_secret: str = ""
+    last_transaction_id: int = 0
+    last_hash: str | None = None  # Hex
+    event_count: int = 0
+    turns: list[TurnRecord] = field(default_factory=list)
+    participants: dict[str, ParticipantRecord] = field(default_factory=dict)
+
+    def apply(self, tx_id, tx_hash, timestamp, event_type, user_id, details_json, client_secret, server_secret):
+        details = json.loads(details_json) if details_json else {}
+        match event_type:
+            case "GAME_START" | "GAME_RESTART":
+                self.status = "ACTIVE"
+            case "USER_SELECTED":
+                self.turns.append(
+                    TurnRecord(user_id, "PENDING", tx_id, timestamp, details.get("duration_seconds"))
+                )
+            case "TURN_START":
+                for turn in self._open_turns(user_id):
+                    if turn.status == "PENDING":
+                        turn.status = "IN_PROGRESS"
+                        turn.start_time = _epoch_us(details["start_time"]) if "start_time" in details else timestamp
+            case "MSG_SENT":
+                self._participant(user_id).messages += 1
+            case _ if event_type.startswith("TURN_"):
+                # Same rules as db.update_turn_status
+                new_status = details.get("new_status", event_type.removeprefix("TURN_"))
+                for turn in self._open_turns(user_id):
+                    turn.status = new_status
+                participant = self._participant(user_id)
+                if new_status == "COMPLETED":
+                    participant.successful_rounds += 1
+                    participant.consecutive_skips = 0
+                elif new_status == "SKIPPED":
+                    participant.consecutive_skips += 1
+            case _ if event_type.startswith("GAME_"):
+                self.status = details.get("new_status", event_type.removeprefix("GAME_"))
+        self.client_secret = client_secret
+        self.server_secret = server_secret
+        self.last_transaction_id = tx_id
+        self.last_hash = tx_hash.hex()
+        self.event_count += 1
+
+    def _open_turns(self, user_id: str | None) -> list[TurnRecord]:
+        return [t for t in self.turns if t.user_id == user_id and t.status in OPEN_TURN_STATUSES]
+
+    def _participant(self, user_id: str | None) -> ParticipantRecord:
+        return self.participants.setdefault(user_id or "", ParticipantRecord())
+
+    def open_turn(self) -> TurnRecord | None:
+        """The current PENDING, IN_PROGRESS or ACCEPTED turn, if any."""
+        for turn in reversed(self.turns):
+            if turn.status in OPEN_TURN_STATUSES:
+                return turn
+        return None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "GameProjection":
+        raw = json.loads(data)
+        raw["turns"] = [TurnRecord(**t) for t in raw["turns"]]
+        raw["participants"] = {uid: ParticipantRecord(**p) for uid, p in raw["participants"].items()}
+        return cls(**raw)
+
+
+def load_snapshot(conn: sqlite3.Connection, game_id: int) -> GameProjection | None:
+    row = conn.execute(
+        """
+        SELECT state FROM game_snapshot
+        WHERE game_id = ? AND version = ?
+        ORDER BY transaction_id DESC
+        LIMIT 1
+        """,
+        (game_id, PROJECTION_VERSION),
+    ).fetchone()
+    return GameProjection.from_json(row[0]) if row else None
+
+
+def project(conn: sqlite3.Connection, game_id: int, use_snapshot: bool = True) -> GameProjection:
+    """Rebuilds a game's state from its latest snapshot (if any) plus the events after it."""
+    projection = (load_snapshot(conn, game_id) if use_snapshot else None) or GameProjection(game_id)
+    cursor = conn.execute(
+        """
+        SELECT id, transaction_hash, timestamp, event_type, user_id, details, client_secret, server_secret
+        FROM event_transaction
+        WHERE game_id = ? AND id > ?
+        ORDER BY id
+        """,
+        (game_id, projection.last_transaction_id),
+    )
+    for tx_id, tx_hash, timestamp, event_type, user_id, details, client_secret, server_secret in cursor:
+        if isinstance(details, bytes):
+            # Compressed by archive.py, imported here as db itself imports this module
+            from db import unpack_details
+
+            details = unpack_details(details)
+        projection.apply(tx_id, tx_hash, timestamp, event_type, user_id, details, client_secret, server_secret)
+    return projection
+
+
+def write_snapshot(conn: sqlite3.Connection, projection: GameProjection):
+    """Stores a snapshot and prunes all but the latest SNAPSHOTS_KEPT of the game. The caller commits."""
+    conn.execute(
+        "INSERT OR REPLACE INTO game_snapshot (game_id, transaction_id, version, event_count, state) VALUES (?, ?, ?, ?, ?)",
+        (
+            projection.game_id,
+            projection.last_transaction_id,
+            PROJECTION_VERSION,
+            projection.event_count,
+            projection.to_json(),
+        ),
+    )
+    conn.execute(
+        """
+        DELETE FROM game_snapshot WHERE game_id = ? AND transaction_id NOT IN (
+            SELECT transaction_id FROM game_snapshot WHERE game_id = ? ORDER BY transaction_id DESC LIMIT ?
+        )
+        """,
+        (projection.game_id, projection.game_id, SNAPSHOTS_KEPT),
+    )
+
+
+# Only touched by the writer thread (db.unit_of_work), which runs one transaction at a time
+_pending_events: dict[int, int] = {}  # game_id -> events since its latest snapshot, as committed
+_touched_games: set[int] = set()  # Games whose counter the open transaction changed
+
+
+def _events_since_snapshot(conn: sqlite3.Connection, game_id: int) -> int:
+    """
+    Counts the game's events after its latest snapshot, at most SNAPSHOT_INTERVAL. Bounded by the
+    snapshot's timestamp so it reads only the tail of the game's index, not every event.
+    """
+    row = conn.execute(
+        """
+        SELECT s.transaction_id, e.timestamp FROM game_snapshot AS s
+        JOIN event_transaction AS e ON e.id = s.transaction_id
+        WHERE s.game_id = ? AND s.version = ?
+        ORDER BY s.transaction_id DESC LIMIT 1
+        """,
+        (game_id, PROJECTION_VERSION),
+    ).fetchone()
+    last_id, since = row if row else (0, 0)
+    return conn.execute(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM event_transaction WHERE game_id = ? AND timestamp >= ? AND id > ? LIMIT ?
+        )
+        """,
+        (game_id, since, last_id, SNAPSHOT_INTERVAL),
+    ).fetchone()[0]
+
+
+def record_event(conn: sqlite3.Connection, game_id: int):
+    """
+    Called for every appended event inside its write transaction, on the writer thread only.
+    Snapshots the game every SNAPSHOT_INTERVAL events. The counter is seeded from the database
+    once per game and process, and forgotten again if the transaction rolls back.
+    """
+    pending = _pending_events.get(game_id)
+    pending = _events_since_snapshot(conn, game_id) if pending is None else pending + 1
+    if pending >= SNAPSHOT_INTERVAL:
+        write_snapshot(conn, project(conn, game_id))
+        pending = 0
+    _pending_events[game_id] = pending
+    _touched_games.add(game_id)
+
+
+def end_transaction(committed: bool):
+    """Called by db.unit_of_work when its transaction ends. After a rollback the counters are re-seeded."""
+    if not committed:
+        for game_id in _touched_games:
+            _pending_events.pop(game_id, None)
+    _touched_games.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild game state from the event log.")
+    parser.add_argument("game_ids", nargs="+", type=int, help="Games to rebuild")
+    parser.add_argument("--db", default=None, help="Database file (default: the bot's database)")
+    parser.add_argument("--check", action="store_true", help="Also replay from the first event and compare")
+    args = parser.parse_args()
+
+    mismatched = False
+    for game_id in args.game_ids:
+        with _read_connection(args.db, game_id) as conn:
+            mismatched |= not _report(conn, game_id, args.check)
+    raise SystemExit(1 if mismatched else 0)
+
+
+@contextmanager
+def _read_connection(path: str | None, game_id: int):
+    """The given database, or else the bot's database the game is in (live or its archive)."""
+    if path is None:
+        from db import get_game_connection
+
+        with get_game_connection(game_id) as conn:
+            yield conn
+        return
+    conn = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _report(conn: sqlite3.Connection, game_id: int, check: bool) -> bool:
+    """Prints a game's rebuilt state, returns False if the full replay differs from it."""
+    start = time.perf_counter()
+    projection = project(conn, game_id)
+    elapsed = time.perf_counter() - start
+    turn = projection.open_turn()
+    print(
+        f"Game {game_id}: {projection.status}, {projection.event_count} events, "
+        f"{len(projection.turns)} turns, open turn: {f'<@{turn.user_id}> {turn.status}' if turn else 'none'} "
+        f"(rebuilt in {elapsed * 1000:.1f}ms)"
+    )
+    if not check:
+        return True
+    start = time.perf_counter()
+    full = project(conn, game_id, use_snapshot=False)
+    elapsed = time.perf_counter() - start
+    same = full == projection
+    print(f"  full replay in {elapsed * 1000:.1f}ms: {'matches' if same else 'DIFFERS from the snapshot rebuild'}")
+    return same
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,13 @@ from schema.message import MessageEvent
 from schema.interactive import BlockActionEvent
 from schema.huddle import HuddleChange, HuddleState
 from slack_sdk.web import WebClient
+import functools
 import threading
 from typing import Any, Sequence, overload
 from dataclasses import dataclass
 
+import metrics
+
 from slack_sdk.models.blocks import Block
 from slack_sdk.models.attachments import Attachment
 
@@ -17,6 +20,28 @@ ACTION_PREFIX_HANDLERS: dict[
 ] = {}
 HUDDLE_HANDLERS: dict[HuddleState, list[Callable[[HuddleChange, WebClient], Any]]] = {}
 
+HANDLER_SECONDS = metrics.histogram(
+    "handler_duration_seconds", "Time spent in each event handler, per handler."
+)
+HANDLER_ERRORS = metrics.counter(
+    "handler_errors_total", "Event handlers that raised, per handler."
+)
+
+
+def _run_handler(handler: Callable, *args: Any) -> None:
+    name = getattr(handler, "__qualname__", repr(handler))
+    with HANDLER_SECONDS.time(handler=name):
+        try:
+            handler(*args)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+
+
+def _start_handler(handler: Callable, *args: Any) -> None:
+    """Runs a handler in its own thread, timed per handler."""
+    threading.Thread(target=_run_handler, args=(handler, *args)).start()
+
 
 def msg_listen[A: Callable](
     message_key: str, is_subtype: bool = False
@@ -125,6 +150,7 @@ def smart_msg_listen[A: Callable](
         """The actual decorator that performs the registration."""
         handlers = MESSAGE_HANDLERS.setdefault(message_key, [])
 
+        @functools.wraps(func)
         def inner(event: MessageEvent, client: WebClient):
             no_prefix = None
             if event.message.text.startswith(message_key):
@@ -214,8 +240,7 @@ def message_dispatch(event: MessageEvent, client: WebClient) -> None:
 
             # Dispatch to subtype handlers
             if is_subtype_handler and event.subtype == key:
-                thread = threading.Thread(target=handler, args=(event, client))
-                thread.start()
+                _start_handler(handler, event, client)
                 continue
 
             # Dispatch to text-based command handlers
@@ -225,8 +250,7 @@ def message_dispatch(event: MessageEvent, client: WebClient) -> None:
                 and event.message.text
                 and event.message.text.startswith(key)
             ):
-                thread = threading.Thread(target=handler, args=(event, client))
-                thread.start()
+                _start_handler(handler, event, client)
             
             # TODO: Handle <http://siege.lb|siege.lb>
 
@@ -242,14 +266,12 @@ def action_dispatch(event: BlockActionEvent, client: WebClient) -> None:
             handlers = ACTION_HANDLERS[action_id]
             for handler in handlers:
                 # Pass the entire event to the handler
-                thread = threading.Thread(target=handler, args=(event, client))
-                thread.start()
+                _start_handler(handler, event, client)
 
         for prefix, handlers in ACTION_PREFIX_HANDLERS.items():
             if action_id.startswith(prefix):
                 for handler in handlers:
-                    thread = threading.Thread(target=handler, args=(event, client))
-                    thread.start()
+                    _start_handler(handler, event, client)
 
 
 def huddle_dispatch(event: HuddleChange, client: WebClient) -> None:
@@ -261,5 +283,4 @@ def huddle_dispatch(event: HuddleChange, client: WebClient) -> None:
     if state in HUDDLE_HANDLERS:
         handlers = HUDDLE_HANDLERS[state]
         for handler in handlers:
-            thread = threading.Thread(target=handler, args=(event, client))
-            thread.start()
+            _start_handler(handler, event, client)
@@ -0,0 +1,54 @@
+import re
+from functools import lru_cache
+
+# shorthand prefix -> (host, url template)
+FORGES: dict[str, tuple[str, str]] = {
+    "github": ("github.com", "https://github.com/{user}/{repo}"),
+    "gitlab": ("gitlab.com", "https://gitlab.com/{user}/{repo}"),
+    "codeberg": ("codeberg.org", "https://codeberg.org/{user}/{repo}"),
+    "bitbucket": ("bitbucket.org", "https://bitbucket.org/{user}/{repo}"),
+    "azure_dev": ("dev.azure.com", "https://dev.azure.com/{user}/{repo}"),
+    "hc_git": ("git.hackclub.app", "https://git.hackclub.app/{user}/{repo}"),
+    "sourcehut": ("git.sr.ht", "https://git.sr.ht/{user}/{repo}"),
+    "gitea": ("gitea.com", "https://gitea.com/{user}/{repo}"),
+    "framagit": ("framagit.org", "https://framagit.org/{user}/{repo}"),
+    "gitee": ("gitee.com", "https://gitee.com/{user}/{repo}"),
+}
+
+_HOST_TO_SHORT: dict[str, str] = {host: short for short, (host, _) in FORGES.items()}
+
+_REPO_PATTERN = re.compile(
+    r"https?://(?:www\.)?("
+    + "|".join(re.escape(host) for host in _HOST_TO_SHORT)
+    + r")/([^/\"\n ?#]+)/([^/\"\n ?#]+)",
+    re.IGNORECASE,
+)
+
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_repo(repo: str) -> str:
+    """Normalizes a repo URL to `<forge>:<user>/<repo>`. Raises ValueError for unknown forges."""
+    match = _REPO_PATTERN.search(repo)
+    if match is None:
+        raise ValueError(f"Invalid repo: {repo}")
+    host, user, name = match.groups()
+    return f"{_HOST_TO_SHORT[host.lower()]}:{user}/{name.removesuffix('.git')}"
+
+
+def repo_user_from_shorthand(shorthand: str) -> str:
+    return shorthand.split("/", 1)[0]
+
+
+def parse_repo_user(repo: str) -> str:
+    """Normalizes a repo URL to `<forge>:<user>`."""
+    return repo_user_from_shorthand(parse_repo(repo))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def construct_from_short(shorthand: str) -> str:
+    """Builds the forge URL back from a `<forge>:<user>[/<repo>]` shorthand."""
+    init, _, path = shorthand.partition(":")
+    user, _, repo = path.partition("/")
+    return FORGES[init][1].format(user=user, repo=repo)
@@ -0,0 +1,53 @@
+# Throughput of repo URL parsing with and without its caches, run with `python repo_url_bench.py`
+import time
+
+from repo_url import construct_from_short, parse_repo, parse_repo_user
+
+# Real repo URLs taken from Siege project submissions, used by the benchmark
+BENCH_CORPUS: list[str] = [
+    "https://github.com/hackclub/siege",
+    "https://github.com/i-am-unknown-81514525/live-coding-siege",
+    "https://www.github.com/torvalds/linux",
+    "https://github.com/python/cpython.git",
+    "https://github.com/astral-sh/uv/tree/main/crates",
+    "https://gitlab.com/gitlab-org/gitlab",
+    "https://gitlab.com/inkscape/inkscape",
+    "https://codeberg.org/forgejo/forgejo",
+    "https://codeberg.org/Codeberg/Documentation",
+    "https://bitbucket.org/atlassian/python-bitbucket",
+    "https://dev.azure.com/microsoft/vscode",
+    "https://git.hackclub.app/hackclub/nest",
+    "https://git.sr.ht/~sircmpwn/aerc",
+    "https://gitea.com/gitea/tea",
+    "https://framagit.org/framasoft/peertube",
+    "https://gitee.com/openharmony/docs",
+    "http://github.com/hackclub/sprig?tab=readme-ov-file",
+    "https://github.com/hackclub/hackatime#readme",
+]
+
+
+def bench(rounds: int = 20_000) -> None:
+    corpus = BENCH_CORPUS
+    total = rounds * len(corpus)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_repo.cache_clear()
+        construct_from_short.cache_clear()
+        for url in corpus:
+            construct_from_short(parse_repo_user(url))
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url in corpus:
+            construct_from_short(parse_repo_user(url))
+    warm = time.perf_counter() - start
+
+    print(f"{len(corpus)} urls x {rounds} rounds")
+    print(f"uncached: {total / cold:,.0f} urls/s")
+    print(f"cached:   {total / warm:,.0f} urls/s")
+
+
+if __name__ == "__main__":
+    bench()
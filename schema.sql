@@ -37,8 +37,8 @@ CREATE TABLE IF NOT EXISTS "game_turn" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "game_id" INTEGER NOT NULL,
     "user_id" TEXT NOT NULL,
-    "selection_time" DATETIME NOT NULL,
-    "start_time" DATETIME,
+    "selection_time" INTEGER NOT NULL, -- Microseconds since the Unix epoch (UTC)
+    "start_time" INTEGER, -- Microseconds since the Unix epoch (UTC)
     "assigned_duration_seconds" INTEGER NOT NULL,
     "status" TEXT NOT NULL CHECK("status" IN ('PENDING', 'IN_PROGRESS', 'ACCEPTED', 'REJECTED', 'SKIPPED', 'COMPLETED', 'FAILED')),
     "timeout_notified" BOOLEAN NOT NULL DEFAULT FALSE,
@@ -46,6 +46,9 @@ CREATE TABLE IF NOT EXISTS "game_turn" (
     FOREIGN KEY("user_id") REFERENCES "user"("slack_id")
 );
 
+-- A game's turns in order, for the turn lookups and live.export
+CREATE INDEX IF NOT EXISTS "idx_game_turn_game" ON "game_turn" ("game_id", "selection_time");
+
 CREATE TABLE IF NOT EXISTS "game_manager" (
     "game_id" INTEGER NOT NULL,
     "user_id" TEXT NOT NULL,
@@ -64,7 +67,7 @@ CREATE TABLE IF NOT EXISTS "game_participant" (
     "proj_id" INT NULL,
     "h_start" REAL NULL,
     "h_curr" REAL NULL,
-    "h_penalty" REAL DEFAULT 0 NOT REAL, 
+    "h_penalty" REAL DEFAULT 0 NOT NULL,
     "h_lastcheck" DATETIME DEFAULT CURRENT_TIMESTAMP,
     -- Hour penalty from adding additional hackatime project causing spike of change
     -- those annomally time will be discarded as they are not consider as part of the project
@@ -74,9 +77,9 @@ CREATE TABLE IF NOT EXISTS "game_participant" (
 );
 CREATE TABLE IF NOT EXISTS "event_transaction" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,    
-    "transaction_hash" TEXT NOT NULL UNIQUE, -- The hash of the current transaction's data of the game
-    "previous_transaction_hash" TEXT, -- The hash of the parent transaction of the game, forming a chain. NULL for the first event in a game.
-    "timestamp" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "transaction_hash" BLOB NOT NULL UNIQUE, -- The 64-byte SHA3-512 of the current transaction's data of the game
+    "previous_transaction_hash" BLOB, -- The hash of the parent transaction of the game, forming a chain. NULL for the first event in a game.
+    "timestamp" INTEGER NOT NULL, -- Microseconds since the Unix epoch (UTC), hashed as its ISO 8601 form
     "event_type" TEXT NOT NULL, -- e.g., 'HUDDLE_START', 'GAME_START', 'USER_SELECTED', 'COIN_AWARDED', 'MSG_SENT', 'SERVER_SECRET_UPDATE', 'SERVER_SECRET_REVEAL'
     "game_id" INTEGER NOT NULL, -- A transaction chain is scoped to a single game
     "user_id" TEXT,
@@ -87,3 +90,122 @@ CREATE TABLE IF NOT EXISTS "event_transaction" (
     FOREIGN KEY("game_id") REFERENCES "game"("id"),
     FOREIGN KEY("user_id") REFERENCES "user"("slack_id")
 );
+
+-- Per-game chain lookups (latest hash/secrets) and chain verification
+CREATE INDEX IF NOT EXISTS "idx_event_transaction_game" ON "event_transaction" ("game_id", "timestamp");
+
+-- The hex/ISO 8601 text representation the tables used before, for ad-hoc queries and external tools
+CREATE VIEW IF NOT EXISTS "event_transaction_text" AS
+SELECT
+    "id",
+    lower(hex("transaction_hash")) AS "transaction_hash",
+    nullif(lower(hex("previous_transaction_hash")), '') AS "previous_transaction_hash",
+    strftime('%Y-%m-%dT%H:%M:%S', "timestamp" / 1000000, 'unixepoch')
+        || CASE WHEN "timestamp" % 1000000 THEN printf('.%06d', "timestamp" % 1000000) ELSE '' END
+        || '+00:00' AS "timestamp",
+    "event_type", "game_id", "user_id", "details", "client_secret", "server_secret"
+FROM "event_transaction";
+
+CREATE VIEW IF NOT EXISTS "game_turn_text" AS
+SELECT
+    "id", "game_id", "user_id",
+    strftime('%Y-%m-%dT%H:%M:%S', "selection_time" / 1000000, 'unixepoch')
+        || CASE WHEN "selection_time" % 1000000 THEN printf('.%06d', "selection_time" % 1000000) ELSE '' END
+        || '+00:00' AS "selection_time",
+    strftime('%Y-%m-%dT%H:%M:%S', "start_time" / 1000000, 'unixepoch')
+        || CASE WHEN "start_time" % 1000000 THEN printf('.%06d', "start_time" % 1000000) ELSE '' END
+        || '+00:00' AS "start_time",
+    "assigned_duration_seconds", "status", "timeout_notified"
+FROM "game_turn";
+
+-- Periodic projections of a game's event log (see projector.py), a rebuild replays only the events after the latest one
+CREATE TABLE IF NOT EXISTS "game_snapshot" (
+    "game_id" INTEGER NOT NULL,
+    "transaction_id" INTEGER NOT NULL, -- The last event_transaction folded into the state
+    "version" INTEGER NOT NULL, -- projector.PROJECTION_VERSION the state was built with
+    "event_count" INTEGER NOT NULL,
+    "state" TEXT NOT NULL, -- JSON
+    "created_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY ("game_id", "transaction_id"),
+    FOREIGN KEY("game_id") REFERENCES "game"("id"),
+    FOREIGN KEY("transaction_id") REFERENCES "event_transaction"("id")
+);
+
+-- Games moved out of this database by archive.py, their turns, participants and transactions live in data/archive/<archive>
+CREATE TABLE IF NOT EXISTS "game_archive" (
+    "game_id" INTEGER PRIMARY KEY,
+    "archive" TEXT NOT NULL, -- File name of the season's archive database
+    "event_count" INTEGER NOT NULL,
+    "archived_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY("game_id") REFERENCES "game"("id")
+);
+
+-- Full-text index of chat lines (MSG_SENT), kept by the triggers below. It holds its own copy of the
+-- text and filter columns, so games moved out by archive.py stay searchable.
+CREATE VIRTUAL TABLE IF NOT EXISTS "message_search" USING fts5(
+    "text",
+    "game_id" UNINDEXED,
+    "user_id" UNINDEXED,
+    "timestamp" UNINDEXED, -- Microseconds since the Unix epoch (UTC), as event_transaction
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+-- Archive databases store details compressed (a BLOB), their lines are already indexed in the live database
+-- Only lines with their text inline, add_message_transaction indexes lines stored in message_body itself
+DROP TRIGGER IF EXISTS "message_search_insert";
+CREATE TRIGGER "message_search_insert" AFTER INSERT ON "event_transaction"
+WHEN new."event_type" = 'MSG_SENT' AND typeof(new."details") = 'text' AND json_extract(new."details", '$.text') IS NOT NULL
+BEGIN
+    INSERT INTO "message_search" (rowid, "text", "game_id", "user_id", "timestamp")
+    VALUES (new."id", json_extract(new."details", '$.text'), new."game_id", new."user_id", new."timestamp");
+END;
+
+-- Indexes lines written before the index existed, a no-op afterwards
+INSERT INTO "message_search" (rowid, "text", "game_id", "user_id", "timestamp")
+SELECT "id", json_extract("details", '$.text'), "game_id", "user_id", "timestamp"
+FROM "event_transaction"
+WHERE "event_type" = 'MSG_SENT' AND typeof("details") = 'text' AND json_extract("details", '$.text') IS NOT NULL
+  AND "id" > (SELECT COALESCE(MAX(rowid), 0) FROM "message_search");
+
+-- Chat line bodies by content hash. MSG_SENT details only hold {"body": "<hash hex>"}, so the chain
+-- stays verifiable after the retention policy purged the text.
+CREATE TABLE IF NOT EXISTS "message_body" (
+    "hash" BLOB PRIMARY KEY, -- SHA3-256 of the UTF-8 text
+    "text" TEXT, -- NULL once purged
+    "last_seen" INTEGER NOT NULL -- Microseconds since the Unix epoch of the latest message with this body
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS "idx_message_body_retention" ON "message_body" ("last_seen") WHERE "text" IS NOT NULL;
+
+-- Turn counters per game and per player, kept by the db functions that write game_turn in the same
+-- transaction, so summaries are a primary key read. They stay here when archive.py moves a game out.
+-- Filled from game_turn by db.init_db when empty.
+CREATE TABLE IF NOT EXISTS "game_stats" (
+    "game_id" INTEGER PRIMARY KEY,
+    "pending" INTEGER NOT NULL DEFAULT 0,
+    "in_progress" INTEGER NOT NULL DEFAULT 0,
+    "accepted" INTEGER NOT NULL DEFAULT 0,
+    "rejected" INTEGER NOT NULL DEFAULT 0,
+    "skipped" INTEGER NOT NULL DEFAULT 0,
+    "completed" INTEGER NOT NULL DEFAULT 0,
+    "failed" INTEGER NOT NULL DEFAULT 0,
+    "assigned_seconds" INTEGER NOT NULL DEFAULT 0, -- Sum of assigned_duration_seconds over all turns
+    FOREIGN KEY("game_id") REFERENCES "game"("id")
+);
+
+CREATE TABLE IF NOT EXISTS "game_user_stats" (
+    "game_id" INTEGER NOT NULL,
+    "user_id" TEXT NOT NULL,
+    "pending" INTEGER NOT NULL DEFAULT 0,
+    "in_progress" INTEGER NOT NULL DEFAULT 0,
+    "accepted" INTEGER NOT NULL DEFAULT 0,
+    "rejected" INTEGER NOT NULL DEFAULT 0,
+    "skipped" INTEGER NOT NULL DEFAULT 0,
+    "completed" INTEGER NOT NULL DEFAULT 0,
+    "failed" INTEGER NOT NULL DEFAULT 0,
+    "assigned_seconds" INTEGER NOT NULL DEFAULT 0,
+    "consecutive_skips" INTEGER NOT NULL DEFAULT 0, -- Mirrors game_participant
+    PRIMARY KEY ("game_id", "user_id"),
+    FOREIGN KEY("game_id") REFERENCES "game"("id"),
+    FOREIGN KEY("user_id") REFERENCES "user"("slack_id")
+) WITHOUT ROWID;
@@ -0,0 +1,36 @@
+from collections.abc import Sequence
+
+from crypto.core import DeterRnd, randint_for, weighted_choice
+
+BASE_TICKETS = 10
+HOURS_PER_TICKET = 0.1
+
+DURATION_RANGE = (300, 1200)
+RIG_DURATION_RANGE = (180, 180)
+
+
+def ticket_count(hours: float) -> int:
+    """Tickets of a participant in SIEGE_MODE, 10 base tickets plus 1 ticket per 0.1 hours coded in the event."""
+    return BASE_TICKETS + int(round(hours / HOURS_PER_TICKET, 6))
+
+
+def derive_pick(
+    seed: str,
+    eligible: Sequence[str],
+    tickets: Sequence[int] | None,
+    duration_range: tuple[int, int],
+    version: int,
+) -> tuple[int, int]:
+    """
+    Derives (selected_index, duration_seconds) of a pick from its seed and inputs.
+    Shared by `live.pick` and the auditor so a recorded pick can be replayed exactly.
+    """
+    rnd_int = randint_for(version)
+    user_handler = (
+        weighted_choice(tickets) if tickets else rnd_int(0, len(eligible) - 1)
+    )
+    return (
+        DeterRnd(user_handler, rnd_int(*duration_range), version=version)
+        .with_seed(seed)
+        .retrieve()
+    )
@@ -1,11 +1,14 @@
 from collections.abc import Callable
 
 from contextlib import asynccontextmanager
+import html
 import logging
 import os
 import typing
+from datetime import datetime, timezone
 import asyncio
-from fastapi import FastAPI, WebSocket, Request, Depends, HTTPException
+from fastapi import FastAPI, WebSocket, Request, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 import threading
 import sys
 from types import TracebackType
@@ -16,6 +19,7 @@ import jwt
 from ws_mgr import controller, schema, signals
 import uvicorn
 import db
+import metrics
 
 type ExcInfo[E: BaseException] = tuple[type[E], E, TracebackType]
 
@@ -67,6 +71,12 @@ async def lifespan(_: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
+metrics.gauge(
+    "ws_connections",
+    "Open dashboard websocket connections.",
+    lambda: controller.connection_manager.connection_count(),
+)
+
 
 async def check_jwt(req: Request) -> str:
     try:
@@ -104,6 +114,11 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/validate")
 async def validate(user_id: typing.Annotated[str, Depends(check_jwt)]):
     return {"user_id": user_id}
@@ -122,6 +137,53 @@ async def client_secret_curr(user_id: typing.Annotated[str, Depends(check_jwt)])
     return {"client_secret": client_secret}
 
 
+_SNIPPET_MARKS = ("\x02", "\x03")
+
+
+@app.get("/search")
+async def search(
+    user_id: typing.Annotated[str, Depends(check_jwt)],
+    q: str,
+    game_id: int | None = None,
+    user: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: typing.Annotated[int, Query(ge=1, le=db.SEARCH_LIMIT)] = 20,
+):
+    """Ranked chat lines across all games, `since`/`until` are ISO 8601 (UTC when no offset is given)."""
+    since, until = (
+        t.replace(tzinfo=timezone.utc) if t is not None and t.tzinfo is None else t for t in (since, until)
+    )
+    rows = await get_result(
+        db.search_messages,
+        q,
+        game_id=game_id,
+        user_id=user,
+        since=since,
+        until=until,
+        limit=limit,
+        highlight=_SNIPPET_MARKS,
+    )
+    names = db.get_user_names([row["user_id"] for row in rows])
+    return {
+        "results": [
+            {
+                "id": row["id"],
+                "game_id": row["game_id"],
+                "user_id": row["user_id"],
+                "user_name": names.get(row["user_id"], row["user_id"]),
+                "time": db.epoch_seconds(row["timestamp"]),
+                # Chat text is user input, escape it before adding the highlight markup
+                "snippet": html.escape(row["snippet"])
+                .replace(_SNIPPET_MARKS[0], "<mark>")
+                .replace(_SNIPPET_MARKS[1], "</mark>"),
+                "score": row["score"],
+            }
+            for row in rows
+        ]
+    }
+
+
 @app.get("/turn-status")
 async def get_turn_status(user_id: typing.Annotated[str, Depends(check_jwt)]):
     game_id = await get_result(db.get_game_mgr_active_game, user_id)
@@ -133,7 +195,7 @@ async def get_turn_status(user_id: typing.Annotated[str, Depends(check_jwt)]):
         return {"status": "NO_ACTIVE_TURN"}
 
     turn_user_id = active_turn["user_id"]
-    user_names_map = await get_result(db.get_user_names, [turn_user_id])
+    user_names_map = db.get_user_names([turn_user_id])
     user_name = user_names_map.get(turn_user_id, turn_user_id)
 
     response = {
@@ -146,9 +208,8 @@ async def get_turn_status(user_id: typing.Annotated[str, Depends(check_jwt)]):
         active_turn["status"] in ("IN_PROGRESS", "ACCEPTED")
         and active_turn["start_time"]
     ):
-        start_time = db.datetime.fromisoformat(active_turn["start_time"])
         duration = active_turn["assigned_duration_seconds"]
-        response["endTime"] = start_time.timestamp() + duration
+        response["endTime"] = db.epoch_seconds(active_turn["start_time"]) + duration
 
     return response
 
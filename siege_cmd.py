@@ -11,60 +11,22 @@ import time
 import logging
 from schema.siege import ProjectStatus
 from collections import Counter
+from repo_url import parse_repo_user, construct_from_short
 
-ALLOWED = os.environ["ALLOWLIST"].split(",")
 BANNED = []
 
+
+def _allowed() -> list[str]:
+    # Read on use so importing the command module doesn't require the variable
+    return os.environ.get("ALLOWLIST", "").split(",")
+
+
 def _time_to_slack(time: Arrow) -> str:
     t1 = "{date_num}"
     t2 = "{time_secs}"
     utc = Arrow.utcfromtimestamp(time.timestamp())
     return f"<!date^{int(utc.timestamp())}^{t1}|{utc.date().strftime('%Y-%m-%d')}> <!date^{int(utc.timestamp())}^{t2}|{utc.time().strftime('%H:%M:%S')} UTC>"
 
-def _parse_repo(repo: str) -> str:
-    match = re.search(
-        r"https?://(?:(?:(?:www\.?)?(github\.com|gitlab\.com|codeberg\.org|bitbucket\.org))|(git\.hackclub\.app|dev\.azure\.com))/([^/\"\n ]+)/([^/\"\n ]+)", 
-        repo
-    )
-
-    if match is None:
-        raise ValueError(f"Invalid repo: {repo}")
-
-    match match.group(1) or match.group(2):
-        case "github.com":
-            return f"github:{match.group(3)}/{match.group(4)}"
-        case "gitlab.com":
-            return f"gitlab:{match.group(3)}/{match.group(4)}"
-        case "codeberg.org":
-            return f"codeberg:{match.group(3)}/{match.group(4)}"
-        case "bitbucket.org":
-            return f"bitbucket:{match.group(3)}/{match.group(4)}"
-        case "dev.azure.com":
-            return f"azure_dev:{match.group(3)}/{match.group(4)}"
-        case "git.hackclub.app":
-            return f"hc_git:{match.group(3)}/{match.group(4)}"
-        case _:
-            raise ValueError(f"Unknown repo: {repo}")
-
-def _parse_repo_user_from_shorthand(repo_shorthand: str) -> str:
-    return repo_shorthand.split("/")[0]
-
-def _parse_repo_user(repo: str) -> str:
-    return _parse_repo_user_from_shorthand(_parse_repo(repo))
-
-def construct_from_short(shorthand: str) -> str:
-    mapping = {
-        "github": "https://github.com/{user}/{repo}",
-        "gitlab": "https://gitlab.com/{user}/{repo}",
-        "codeberg": "https://codeberg.org/{user}/{repo}",
-        "bitbucket": "https://bitbucket.org/{user}/{repo}",
-        "azure_dev": "https://dev.azure.com/{user}/{repo}",
-        "hc_git": "https://git.hackclub.app/{user}/{repo}",
-    }
-
-    (init, user, repo, *_) = shorthand.split(":")[0], *shorthand.split(":")[1].split("/"), None
-    return mapping[init].format(user=user, repo=repo or "")
-
 @smart_msg_listen("siege.user")
 def get_siege_user_info(ctx: MessageContext):
     if ctx.event.message.user in BANNED:
@@ -80,7 +42,7 @@ def get_siege_user_info(ctx: MessageContext):
     user = get_user(user_id)
     proj_list = [(proj.week, proj.id, proj.name) for proj in user.projects]
     known_repo = [get_project(proj.id).repo_url for proj in user.projects]
-    known_identity = [_parse_repo_user(repo) for repo in known_repo if repo]
+    known_identity = [parse_repo_user(repo) for repo in known_repo if repo]
     id_count = Counter(known_identity)
     id_string = ", ".join(f"<{construct_from_short(id)}|{id}> `{count}/{len(known_identity)}`" for id, count in id_count.most_common())
 
@@ -108,7 +70,7 @@ def get_siege_user_info(ctx: MessageContext):
     if buttons:
         message.add_block(blockkit.Actions(buttons))
 
-    if ctx.event.message.user in ALLOWED:
+    if ctx.event.message.user in _allowed():
         ctx.public_send(**message.build())
     else:
         ctx.private_send(**message.build())
@@ -151,13 +113,13 @@ def get_siege_proj_info(ctx: MessageContext):
                 f"*Coin Value:* {proj.coin_value or 'N/A'}\n"
                 f"*Is Updated:* {proj.is_update}\n"
                 f"*Hours:* {proj.hours} hours\n"
-                f"*Repo user:* <{construct_from_short(_parse_repo_user(proj.repo_url))}|{_parse_repo_user(proj.repo_url)}>" if proj.repo_url else ""
+                f"*Repo user:* <{construct_from_short(parse_repo_user(proj.repo_url))}|{parse_repo_user(proj.repo_url)}>" if proj.repo_url else ""
             )
         )
         .add_block(blockkit.Actions(buttons))
     )
 
-    if ctx.event.message.user in ALLOWED:
+    if ctx.event.message.user in _allowed():
         ctx.public_send(**message.build(), unfurl_links=False)
     else:
         ctx.private_send(**message.build(), unfurl_links=False)
@@ -199,12 +161,12 @@ def handle_siege_proj_view(event: BlockActionEvent, client: WebClient):
                 f"*Coin Value:* {proj.coin_value or 'N/A'}\n"
                 f"*Is Updated:* {proj.is_update}\n"
                 f"*Hours:* {proj.hours} hours\n"
-                f"*Repo user:* <{construct_from_short(_parse_repo_user(proj.repo_url))}|{_parse_repo_user(proj.repo_url)}>" if proj.repo_url else ""
+                f"*Repo user:* <{construct_from_short(parse_repo_user(proj.repo_url))}|{parse_repo_user(proj.repo_url)}>" if proj.repo_url else ""
             )
         )
         .add_block(blockkit.Actions(buttons))
     )
-    # if user_id in ALLOWED:
+    # if user_id in _allowed():
     #     client.chat_postMessage(channel=channel, thread_ts=thread_ts, **message.build())
     # else:
     #     client.chat_postEphemeral(
@@ -231,7 +193,7 @@ def handle_siege_user_view(event: BlockActionEvent, client: WebClient):
 
     proj_list = [(proj.week, proj.id, proj.name) for proj in user.projects]
     known_repo = [get_project(proj.id).repo_url for proj in user.projects]
-    known_identity = [_parse_repo_user(repo) for repo in known_repo if repo]
+    known_identity = [parse_repo_user(repo) for repo in known_repo if repo]
     id_count = Counter(known_identity)
     id_string = ", ".join(f"<{construct_from_short(id)}|{id}> `{count}/{len(known_identity)}`" for id, count in id_count.most_common())
 
@@ -343,7 +305,7 @@ def get_leaderboard(ctx: MessageContext):
         case _:
             message = blockkit.Message("Don't know how to use this? You can do the following options:\n`coin`, `proj_hours`, `week_hours`, `proj_coins`")
     
-    if ctx.event.message.user in ALLOWED and not force_ephemeral:
+    if ctx.event.message.user in _allowed() and not force_ephemeral:
         ctx.public_send(**message.build())
     else:
         ctx.private_send(**message.build())
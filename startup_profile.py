@@ -0,0 +1,69 @@
+# Built-in `-X importtime`-style report for `python main.py --profile-startup`, stdlib only
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+
+_enabled = False
+_t0 = time.perf_counter()
+_original_import = builtins.__import__
+_stack: list[list[float]] = []  # [start, time spent in nested imports] per import in progress
+# (module, self seconds, cumulative seconds, depth) in completion order
+_imports: list[tuple[str, float, float, int]] = []
+_phases: list[tuple[str, float]] = []
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    frame = [time.perf_counter(), 0.0]
+    _stack.append(frame)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _stack.pop()
+        cumulative = time.perf_counter() - frame[0]
+        if _stack:
+            _stack[-1][1] += cumulative
+        _imports.append((name, cumulative - frame[1], cumulative, len(_stack)))
+
+
+def install():
+    """Starts timing first imports, call before anything heavy is imported."""
+    global _enabled, _t0
+    _enabled = True
+    _t0 = time.perf_counter()
+    builtins.__import__ = _timed_import
+
+
+@contextmanager
+def phase(name: str):
+    """Times one startup step, a no-op unless profiling is on."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def mark(name: str):
+    """Records the time since `install()` as a phase, e.g. for module import."""
+    if _enabled:
+        _phases.append((name, time.perf_counter() - _t0))
+
+
+def report(top: int = 25, file=sys.stderr):
+    if not _enabled:
+        return
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - _t0
+    print(f"\nStartup profile ({total * 1000:.1f}ms until ready)", file=file)
+    print(f"{'phase':<32} {'ms':>9}", file=file)
+    for name, seconds in _phases:
+        print(f"{name:<32} {seconds * 1000:>9.1f}", file=file)
+    print(f"\n{'self [us]':>10} | {'cumulative':>10} | imported package (top {top} by cumulative)", file=file)
+    for name, self_time, cumulative, depth in sorted(_imports, key=lambda i: -i[2])[:top]:
+        print(f"{self_time * 1e6:>10.0f} | {cumulative * 1e6:>10.0f} | {'  ' * depth}{name}", file=file)
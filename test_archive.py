@@ -0,0 +1,102 @@
+import sqlite3
+from types import SimpleNamespace
+
+import archive
+import db
+import main
+import projector
+from conftest import play_game
+
+TURNS = [("U1", "COMPLETED"), ("U2", "SKIPPED"), ("U1", "FAILED"), ("U2", "COMPLETED")]
+
+
+class FakeContext:
+    """Stands in for reg.MessageContext, records what a handler sends."""
+
+    def __init__(self, thread_ts: str, user_id: str):
+        self.event = SimpleNamespace(channel="C1", message=SimpleNamespace(thread_ts=thread_ts, user=user_id))
+        self.public: list[dict] = []
+        self.private: list[dict] = []
+
+    def public_send(self, *args, **kwargs):
+        self.public.append(kwargs)
+
+    def private_send(self, *args, **kwargs):
+        self.private.append(kwargs)
+
+
+def _archived_game() -> tuple[int, dict]:
+    game_id = play_game(TURNS, messages=[("U1", "hello"), ("U2", "hi there")])
+    db.update_game_status(game_id, "COMPLETED")
+    with db.get_db_connection() as conn:
+        start_time = conn.execute("SELECT start_time FROM game WHERE id = ?", (game_id,)).fetchone()[0]
+        before = {
+            "summary": db.get_game_summary_stats(game_id),
+            "totals": dict(db.get_game_totals(game_id)),
+            "turns": [tuple(row) for row in db.get_all_turns_for_game(game_id)],
+            "projection": projector.project(conn, game_id),
+        }
+    assert archive.archive_game(game_id, start_time) == before["projection"].event_count
+    return game_id, before
+
+
+def test_archive_moves_the_game(live_db):
+    game_id, _ = _archived_game()
+    with db.get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM event_transaction WHERE game_id = ?", (game_id,)).fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM game_turn WHERE game_id = ?", (game_id,)).fetchone()[0] == 0
+        assert conn.execute("SELECT archive FROM game_archive WHERE game_id = ?", (game_id,)).fetchone()[0] == "2025-Q1.db"
+    archived = sqlite3.connect(db.ARCHIVE_DIR / "2025-Q1.db")
+    try:
+        # Stored compressed
+        assert {row[0] for row in archived.execute("SELECT typeof(details) FROM event_transaction")} <= {"blob", "null"}
+    finally:
+        archived.close()
+
+
+def test_archived_game_reads_the_same(live_db):
+    game_id, before = _archived_game()
+    assert db.get_game_summary_stats(game_id) == before["summary"]
+    assert dict(db.get_game_totals(game_id)) == before["totals"]
+    assert [tuple(row) for row in db.get_all_turns_for_game(game_id)] == before["turns"]
+    with db.get_game_connection(game_id) as conn:
+        assert projector.project(conn, game_id) == before["projection"]
+
+
+def test_archive_is_idempotent(live_db):
+    game_id = play_game(TURNS)
+    db.update_game_status(game_id, "COMPLETED")
+    archive._ensure_archive(db.ARCHIVE_DIR / "2025-Q1.db")
+    # An interrupted run copied the game but never dropped it, the next run starts over
+    archive._copy_game(game_id, db.ARCHIVE_DIR / "2025-Q1.db")
+    with db.get_db_connection() as conn:
+        start_time = conn.execute("SELECT start_time FROM game WHERE id = ?", (game_id,)).fetchone()[0]
+    archive.archive_game(game_id, start_time)
+    assert len(db.get_all_turns_for_game(game_id)) == len(TURNS)
+
+
+def test_summary_of_archived_game(live_db):
+    game_id, _ = _archived_game()
+    thread_ts = "1700000000.000100"
+
+    manager = FakeContext(thread_ts, "M1")
+    main.show_game_summary(manager)
+    assert not manager.private
+    [message] = manager.public
+    assert "*User U1*: 1 successful performance(s), 0 consecutive skip(s) (50% completed)" in str(message["blocks"])
+    assert "_4 turn(s), 2 completed (50%), 8 min of stage time assigned._" in str(message["blocks"])
+
+    # Anyone else gets it privately
+    other = FakeContext(thread_ts, "U2")
+    main.show_game_summary(other)
+    assert len(other.private) == 1 and not other.public
+
+
+def test_summary_of_game_archived_before_the_counters(live_db):
+    game_id, before = _archived_game()
+    with db.get_db_connection() as conn:
+        conn.execute("DELETE FROM game_user_stats WHERE game_id = ?", (game_id,))
+        conn.execute("DELETE FROM game_stats WHERE game_id = ?", (game_id,))
+        conn.commit()
+    assert db.get_game_summary_stats(game_id) == before["summary"]
+    assert dict(db.get_game_totals(game_id)) == before["totals"]
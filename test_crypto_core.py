@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from crypto.core import (
+    BOUNDED_RANDINT_VERSION,
+    LATEST_VERSION,
+    LEGACY_VERSION,
+    XOF_VERSION,
+    DeterRnd,
+    legacy_randint,
+    randint,
+    randint_for,
+    rnd_bool,
+    weighted_choice,
+)
+
+RANGES = [
+    (0, 1),
+    (0, 2),
+    (1, 6),
+    (300, 1200),
+    (-50, 50),
+    (-(2**40), -(2**40) + 7),
+    (0, 2**16),
+    (1, 10**6),
+    (0, 2**32 - 1),
+    (5, 5 + 2**31 + 11),
+]
+
+# Draws made with the range reduction of DeterRnd versions 1 and 2, which historical picks are verified with
+LEGACY_DRAWS = [
+    # (seed, low, high, version 1 draw, version 2 draw), each followed by a rnd_bool
+    ("seed", 300, 1200, (442, False), (498, False)),
+    ("abc", 0, 9, (3, True), (0, False)),
+    ("", 5, 5, (5, True), (5, True)),
+    ("x" * 40, -50, 50, (-34, False), (-3, False)),
+    ("game-17", 1, 2**20, (825587, True), (553970, False)),
+]
+
+
+def _edge_values(bit_count: int, rng: random.Random) -> list[int]:
+    if not bit_count:
+        return [0]
+    return [0, 1, (1 << bit_count) - 1, 1 << (bit_count - 1), *(rng.getrandbits(bit_count) for _ in range(200))]
+
+
+@pytest.mark.parametrize("low, high", RANGES)
+def test_randint_stays_in_range(low: int, high: int):
+    rng = random.Random(f"{low}:{high}")
+    bit_count, fn = randint(low, high)
+    for v in _edge_values(bit_count, rng):
+        assert low <= fn(v) <= high
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_randint_random_ranges_stay_in_range(seed: int):
+    rng = random.Random(seed)
+    for _ in range(100):
+        low = rng.randint(-(2**40), 2**40)
+        high = low + rng.choice([0, rng.randint(0, 16), rng.randint(0, 2**32)])
+        bit_count, fn = randint(low, high)
+        for v in _edge_values(bit_count, rng)[:8]:
+            assert low <= fn(v) <= high
+
+
+@pytest.mark.parametrize("span", [2, 3, 7, 10, 37])
+def test_randint_is_uniform(span: int):
+    rng = random.Random(span)
+    bit_count, fn = randint(0, span - 1)
+    draws = 5000 * span
+    counts = [0] * span
+    for _ in range(draws):
+        counts[fn(rng.getrandbits(bit_count))] += 1
+    expected = draws / span
+    chi2 = sum((c - expected) ** 2 / expected for c in counts)
+    # Far above the 99.9th percentile of the chi-square distribution for these degrees of freedom
+    assert chi2 < 3 * span + 30, counts
+
+
+def test_randint_single_value_and_bad_range():
+    bit_count, fn = randint(4, 4)
+    assert bit_count == 0 and fn(0) == 4
+    with pytest.raises(ValueError):
+        randint(5, 4)
+
+
+def test_randint_is_deterministic():
+    draw = lambda: DeterRnd(randint(300, 1200), version=LATEST_VERSION).with_seed("seed").retrieve()
+    assert draw() == draw()
+
+
+@pytest.mark.parametrize("seed, low, high, v1, v2", LEGACY_DRAWS)
+def test_legacy_randint_reproduces_old_picks(seed: str, low: int, high: int, v1: tuple, v2: tuple):
+    assert DeterRnd(legacy_randint(low, high), rnd_bool()).with_seed(seed).retrieve() == v1
+    assert DeterRnd(legacy_randint(low, high), rnd_bool(), version=XOF_VERSION).with_seed(seed).retrieve() == v2
+
+
+def test_legacy_randint_stream():
+    rnd = DeterRnd(legacy_randint(300, 1200), version=XOF_VERSION).with_seed("seed").stream()
+    assert [next(rnd) for _ in range(4)] == [(399,), (911,), (411,), (528,)]
+
+
+@pytest.mark.parametrize(
+    "version, expected",
+    [(LEGACY_VERSION, legacy_randint), (XOF_VERSION, legacy_randint), (BOUNDED_RANDINT_VERSION, randint)],
+)
+def test_randint_for(version: int, expected):
+    assert randint_for(version) is expected
+
+
+@pytest.mark.parametrize("weights", [[1], [1, 1], [10, 0, 3], [0, 0, 5], [11, 12, 13, 400], [2**40, 1]])
+def test_weighted_choice_bounds(weights: list[int]):
+    rng = random.Random(len(weights))
+    bit_count, fn = weighted_choice(weights)
+    for v in _edge_values(bit_count, rng):
+        index = fn(v)
+        assert 0 <= index < len(weights)
+        assert weights[index] > 0
+
+
+def test_weighted_choice_is_proportional():
+    weights = [1, 3, 6]
+    rng = random.Random(0)
+    bit_count, fn = weighted_choice(weights)
+    draws = 60000
+    counts = [0] * len(weights)
+    for _ in range(draws):
+        counts[fn(rng.getrandbits(bit_count))] += 1
+    for weight, count in zip(weights, counts):
+        assert abs(count / draws - weight / sum(weights)) < 0.01
+
+
+@pytest.mark.parametrize("weights", [[], [1, -1], [0, 0]])
+def test_weighted_choice_rejects(weights: list[int]):
+    with pytest.raises(ValueError):
+        weighted_choice(weights)
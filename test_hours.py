@@ -0,0 +1,43 @@
+import pytest
+
+import db
+import hours
+from conftest import play_game
+
+
+def _participant(game_id: int, user_id: str):
+    return next(row for row in db.get_participants_to_track() if (row["game_id"], row["user_id"]) == (game_id, user_id))
+
+
+@pytest.fixture
+def tracked(live_db) -> int:
+    game_id = play_game([], messages=[("U1", "hi")])
+    db.add_game_participant(game_id, "U1", 10.0, 42)
+    # Last polled an hour ago
+    with db.get_db_connection() as conn:
+        conn.execute("UPDATE game_participant SET h_lastcheck = datetime('now', '-1 hour') WHERE user_id = 'U1'")
+        conn.commit()
+    return game_id
+
+
+def test_rejoin_keeps_the_poll_baseline(tracked, monkeypatch):
+    before = _participant(tracked, "U1")["h_lastcheck"]
+    # Back after an hour of real coding, before enrichment had newer hours
+    db.add_game_participant(tracked, "U1", None, None)
+    assert _participant(tracked, "U1")["h_lastcheck"] == before
+
+    monkeypatch.setattr(hours, "_fetch_hours", lambda proj_id: 10.9)
+    assert hours.check_participant(_participant(tracked, "U1")) == (tracked, "U1", 10.9, 0.0)
+
+
+def test_rejoin_with_newer_hours_moves_the_baseline(tracked):
+    before = _participant(tracked, "U1")["h_lastcheck"]
+    db.add_game_participant(tracked, "U1", 10.9, None)
+    participant = _participant(tracked, "U1")
+    assert participant["h_curr"] == 10.9 and participant["h_lastcheck"] > before
+
+
+def test_spike_goes_to_penalty(tracked, monkeypatch):
+    monkeypatch.setattr(hours, "_fetch_hours", lambda proj_id: 13.0)
+    game_id, user_id, h_curr, penalty = hours.check_participant(_participant(tracked, "U1"))
+    assert h_curr == 13.0 and penalty == pytest.approx(2.0, abs=0.01)
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+
+import archive
+import db
+import maintenance
+from conftest import play_game
+
+
+def _auto_vacuum() -> int:
+    with db.get_db_connection() as conn:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def test_run_never_rebuilds_the_file(live_db):
+    play_game([("U1", "COMPLETED")], messages=[("U1", "hello")])
+    done = maintenance.run_once()
+    assert done["vacuumed_pages"] == 0
+    # Switching to incremental would have taken a full VACUUM on the writer
+    assert _auto_vacuum() == 0
+
+
+def test_offline_vacuum_enables_incremental(live_db):
+    play_game([("U1", "COMPLETED")], messages=[("U1", f"line {i} " * 2000) for i in range(20)])
+    archive._vacuum()
+    assert _auto_vacuum() == maintenance._INCREMENTAL
+    # Purging the long lines leaves their pages free
+    db.purge_message_bodies(datetime.now(timezone.utc) + timedelta(seconds=1))
+    done = maintenance.run_once()
+    assert done["vacuumed_pages"] > 0
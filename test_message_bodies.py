@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import db
+from conftest import play_game
+from verify import verify_games
+
+
+def _details(game_id: int) -> list[str]:
+    with db.get_db_connection() as conn:
+        return [
+            row[0]
+            for row in conn.execute(
+                "SELECT details FROM event_transaction WHERE game_id = ? AND event_type = 'MSG_SENT' ORDER BY id",
+                (game_id,),
+            )
+        ]
+
+
+def _body_count() -> int:
+    with db.get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM message_body").fetchone()[0]
+
+
+def test_bodies_are_stored_once(live_db):
+    game_id = play_game([], messages=[("U1", "encore"), ("U2", "encore"), ("U1", "bravo")])
+    assert _body_count() == 2
+    assert [db.get_message_text(details) for details in _details(game_id)] == ["encore", "encore", "bravo"]
+
+
+def test_purge_keeps_the_chain(live_db):
+    game_id = play_game([("U1", "COMPLETED")], messages=[("U1", "encore"), ("U2", "bravo")])
+    assert db.purge_message_bodies(datetime.now(timezone.utc) - timedelta(days=1)) == 0
+
+    assert db.purge_message_bodies(datetime.now(timezone.utc) + timedelta(seconds=1)) == 2
+    assert [db.get_message_text(details) for details in _details(game_id)] == [None, None]
+    # The hashes stay, the transactions still verify and the text is gone from the search index too
+    assert _body_count() == 2
+    assert all(not report.broken for report in verify_games(db.DB_FILE, workers=1))
+    assert db.search_messages("encore") == []
+    # Purging again finds nothing left
+    assert db.purge_message_bodies(datetime.now(timezone.utc) + timedelta(seconds=1)) == 0
+
+
+def test_sending_a_purged_line_again_restores_it(live_db):
+    game_id = play_game([], messages=[("U1", "encore")])
+    db.purge_message_bodies(datetime.now(timezone.utc) + timedelta(seconds=1))
+    db.add_message_transaction(game_id, "U1", "encore", "msg-again")
+    assert [db.get_message_text(details) for details in _details(game_id)] == ["encore", "encore"]
+    assert _body_count() == 1
+    assert len(db.search_messages("encore")) == 1
+
+
+def test_purge_spares_lines_sent_since(live_db):
+    game_id = play_game([], messages=[("U1", "encore")])
+    cutoff = datetime.now(timezone.utc) + timedelta(seconds=1)
+    # Sent again after the cutoff, so the shared body is still in use
+    with db.get_db_connection() as conn:
+        conn.execute("UPDATE message_body SET last_seen = ?", (db.to_epoch_us(cutoff + timedelta(seconds=1)),))
+        conn.commit()
+    assert db.purge_message_bodies(cutoff) == 0
+    assert [db.get_message_text(details) for details in _details(game_id)] == ["encore"]
+
+
+def test_inline_lines_are_never_purged(live_db):
+    # Lines from before bodies were content-addressed carry their text in the hashed details
+    assert db.get_message_text('{"text": "encore"}') == "encore"
+    assert db.get_message_text('{"body": "' + "00" * 32 + '"}') is None
+    assert db.get_message_text(None) is None
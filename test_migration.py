@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+import db
+from conftest import play_game
+from verify import verify_games
+
+# event_transaction and game_turn as they were before hashes became BLOBs and times epoch microseconds
+LEGACY_TABLES = """
+DROP TABLE "event_transaction";
+DROP TABLE "game_turn";
+CREATE TABLE "event_transaction" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "transaction_hash" TEXT NOT NULL UNIQUE,
+    "previous_transaction_hash" TEXT,
+    "timestamp" DATETIME NOT NULL,
+    "event_type" TEXT NOT NULL,
+    "game_id" INTEGER NOT NULL,
+    "user_id" TEXT,
+    "details" TEXT,
+    "client_secret" TEXT NOT NULL,
+    "server_secret" TEXT NOT NULL,
+    FOREIGN KEY("previous_transaction_hash") REFERENCES "event_transaction"("transaction_hash"),
+    FOREIGN KEY("game_id") REFERENCES "game"("id"),
+    FOREIGN KEY("user_id") REFERENCES "user"("slack_id")
+);
+CREATE TABLE "game_turn" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "game_id" INTEGER NOT NULL,
+    "user_id" TEXT NOT NULL,
+    "selection_time" DATETIME NOT NULL,
+    "start_time" DATETIME,
+    "assigned_duration_seconds" INTEGER NOT NULL,
+    "status" TEXT NOT NULL,
+    "timeout_notified" BOOLEAN NOT NULL DEFAULT FALSE,
+    FOREIGN KEY("game_id") REFERENCES "game"("id"),
+    FOREIGN KEY("user_id") REFERENCES "user"("slack_id")
+);
+"""
+
+
+def _rows(path, table: str) -> list[tuple]:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'SELECT * FROM "{table}" ORDER BY id').fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def legacy_db(live_db, tmp_path, monkeypatch):
+    """A database with two played games in the old TEXT layout, returns the rows it should migrate to."""
+    play_game([("U1", "COMPLETED"), ("U2", "SKIPPED")], messages=[("U1", "hello")])
+    play_game([("U2", "FAILED")], thread_ts="1700000000.000200")
+    expected = {table: _rows(live_db, table) for table in ("event_transaction", "game_turn")}
+
+    legacy = tmp_path / "legacy.db"
+    conn = sqlite3.connect(legacy)
+    # The backup API, not a file copy, as the live database's latest pages may still be in its WAL
+    source = sqlite3.connect(live_db)
+    source.backup(conn)
+    source.close()
+    conn.execute("ATTACH DATABASE ? AS source", (str(live_db),))
+    conn.executescript(
+        f"""
+        PRAGMA foreign_keys = OFF;
+        BEGIN;
+        {LEGACY_TABLES}
+        INSERT INTO event_transaction SELECT * FROM source.event_transaction_text;
+        INSERT INTO game_turn SELECT * FROM source.game_turn_text;
+        COMMIT;
+        PRAGMA user_version = 0;
+        """
+    )
+    conn.execute("DETACH DATABASE source")
+    conn.close()
+    monkeypatch.setattr(db, "DB_FILE", legacy)
+    monkeypatch.setattr(db, "_writer", db._Writer())
+    return expected
+
+
+def test_migration_converts_every_row(legacy_db):
+    assert isinstance(_rows(db.DB_FILE, "event_transaction")[0][1], str)
+    db.init_db()
+    for table, rows in legacy_db.items():
+        assert _rows(db.DB_FILE, table) == rows
+    assert all(not report.broken for report in verify_games(db.DB_FILE, workers=1))
+    # The compat views give back the old text form
+    conn = sqlite3.connect(db.DB_FILE)
+    try:
+        tx_hash, timestamp = conn.execute("SELECT transaction_hash, timestamp FROM event_transaction_text LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    assert len(tx_hash) == 128 and timestamp.endswith("+00:00")
+
+
+def test_migrated_database_keeps_working(legacy_db):
+    db.init_db()
+    game_id = play_game([("U1", "COMPLETED")], thread_ts="1700000000.000300")
+    assert all(not report.broken for report in verify_games(db.DB_FILE, workers=1))
+    assert [stat["completed"] for stat in db.get_game_summary_stats(game_id)] == [1]
+
+
+def test_migration_refuses_timestamps_it_cannot_round_trip(legacy_db):
+    conn = sqlite3.connect(db.DB_FILE)
+    # Valid ISO 8601, but isoformat() would write it as .500000, which breaks the hash
+    conn.execute("UPDATE event_transaction SET timestamp = '2025-02-03T12:00:00.5+00:00' WHERE id = 1")
+    conn.commit()
+    conn.close()
+    before = _rows(db.DB_FILE, "event_transaction")
+    with pytest.raises(RuntimeError, match="Transaction 1"):
+        db.init_db()
+    assert _rows(db.DB_FILE, "event_transaction") == before
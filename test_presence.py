@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+import db
+import enrichment
+import main
+import presence
+
+
+class FakeClient:
+    """Stands in for slack_sdk's WebClient, records every post."""
+
+    def __init__(self):
+        self.posts: list[dict] = []
+
+    def chat_postMessage(self, **kwargs):
+        self.posts.append(kwargs)
+
+    def chat_postEphemeral(self, **kwargs):
+        self.posts.append(kwargs)
+
+
+@pytest.fixture
+def engine(live_db, monkeypatch):
+    for name in ("_user_huddles", "_huddle_members", "_dirty"):
+        monkeypatch.setattr(presence, name, {})
+    monkeypatch.setattr(presence, "_persisted", set())
+    # Long enough that only an explicit flush writes anything during the test
+    monkeypatch.setattr(presence, "DEBOUNCE_SECONDS", 60.0)
+    monkeypatch.setattr(enrichment, "enqueue", lambda user_id, game_id: None)
+    monkeypatch.setenv("RIG", "1")
+    for user_id in ("M1", "U1"):
+        db.upsert_user(user_id, f"User {user_id}")
+    db.upsert_huddle("H1", "C1", db.from_epoch_us(0))
+
+
+def test_start_right_after_joining(engine):
+    presence.join("H1", "M1")
+    presence.join("H1", "U1")
+    client = FakeClient()
+    event = SimpleNamespace(channel="C1", message=SimpleNamespace(user="M1", ts="1700000000.000100", thread_ts=None))
+    main.init_game(event, client)
+
+    game_id = db.get_active_game_by_thread("C1", "1700000000.000100")
+    assert game_id is not None, client.posts
+    assert sorted(db.get_huddle_participants(game_id)) == ["M1", "U1"]
+
+
+def test_flapping_is_never_written(engine):
+    presence.join("H1", "U1")
+    presence.leave("U1")
+    presence.flush()
+    assert db.get_all_huddle_participants() == []
+
+
+def test_failed_flush_is_retried(engine, monkeypatch):
+    presence.join("H1", "U1")
+
+    def unavailable(joins, leaves):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(db, "apply_huddle_presence", unavailable)
+        with pytest.raises(RuntimeError):
+            presence.flush()
+    presence.flush()
+    assert db.get_all_huddle_participants() == [("H1", "U1")]
@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import archive
+import db
+import server
+from conftest import play_game
+
+MESSAGES = [
+    ("U1", "The singers were singing loudly"),
+    ("U2", "Hello from the back row"),
+    ("U1", "hello again, louder this time"),
+]
+
+
+@pytest.fixture
+def games(live_db) -> tuple[int, int]:
+    first = play_game([("U1", "COMPLETED")], messages=MESSAGES)
+    second = play_game([("U2", "COMPLETED")], messages=[("U2", "hello second show")], thread_ts="1700000000.000200")
+    return first, second
+
+
+def _texts(rows) -> set[str]:
+    return {row["snippet"].replace("*", "") for row in rows}
+
+
+def test_matches_every_word(games):
+    assert _texts(db.search_messages("hello row")) == {"Hello from the back row"}
+    # Stemmed, case and order don't matter
+    assert _texts(db.search_messages("SING")) == {"The singers were singing loudly"}
+    assert len(db.search_messages("hello")) == 3
+    assert db.search_messages("goodbye") == []
+
+
+def test_prefix_search(games):
+    assert _texts(db.search_messages("loud*")) == {"The singers were singing loudly", "hello again, louder this time"}
+
+
+@pytest.mark.parametrize("text", ['"hello', "hello AND", "NEAR(hello", "-hello", "hello:", "*", "   "])
+def test_user_text_is_never_a_query_error(games, text):
+    db.search_messages(text)
+
+
+def test_filters(games):
+    first, second = games
+    assert {row["game_id"] for row in db.search_messages("hello", game_id=second)} == {second}
+    assert _texts(db.search_messages("hello", game_id=first, user_id="U1")) == {"hello again, louder this time"}
+
+    rows = sorted(db.search_messages("hello"), key=lambda row: row["id"])
+    middle = db.from_epoch_us(rows[1]["timestamp"])
+    assert {row["id"] for row in db.search_messages("hello", since=middle)} == {row["id"] for row in rows[1:]}
+    assert {row["id"] for row in db.search_messages("hello", until=middle)} == {rows[0]["id"]}
+
+
+def test_highlight_and_limit(games):
+    [row] = db.search_messages("row", highlight=("<b>", "</b>"))
+    assert row["snippet"] == "Hello from the back <b>row</b>"
+    assert row["user_id"] == "U2" and row["score"] < 0  # bm25, lower is better
+    assert len(db.search_messages("hello", limit=2)) == 2
+
+
+@pytest.mark.parametrize("limit", [-1, 0, 1000])
+def test_limit_is_bounded(live_db, limit):
+    play_game([], messages=[("U1", f"hello {i}") for i in range(db.SEARCH_LIMIT + 10)])
+    assert 1 <= len(db.search_messages("hello", limit=limit)) <= db.SEARCH_LIMIT
+
+
+@pytest.mark.parametrize("limit", [-1, 0, 1000])
+def test_search_endpoint_rejects_out_of_range_limits(monkeypatch, limit):
+    monkeypatch.setitem(server.app.dependency_overrides, server.check_jwt, lambda: "M1")
+    response = TestClient(server.app).get("/search", params={"q": "hello", "limit": limit})
+    assert response.status_code == 422
+
+
+def test_archived_games_stay_searchable(games):
+    first, _ = games
+    db.update_game_status(first, "COMPLETED")
+    with db.get_db_connection() as conn:
+        start_time = conn.execute("SELECT start_time FROM game WHERE id = ?", (first,)).fetchone()[0]
+    before = db.search_messages("hello", game_id=first)
+    archive.archive_game(first, start_time)
+    assert db.search_messages("hello", game_id=first) == before
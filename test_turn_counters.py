@@ -0,0 +1,79 @@
+import pytest
+
+import db
+from conftest import play_game
+
+
+def _counters() -> dict[str, list[tuple]]:
+    with db.get_db_connection() as conn:
+        return {
+            "game_stats": [tuple(row) for row in conn.execute("SELECT * FROM game_stats ORDER BY game_id")],
+            "game_user_stats": [
+                tuple(row) for row in conn.execute("SELECT * FROM game_user_stats ORDER BY game_id, user_id")
+            ],
+        }
+
+
+def _aggregated() -> dict[str, list[tuple]]:
+    """The counters computed from scratch from game_turn."""
+    with db.get_db_connection() as conn:
+        return {
+            "game_stats": [
+                tuple(row) for row in conn.execute(db._GAME_COUNTS.format(where="1") + " ORDER BY t.game_id")
+            ],
+            "game_user_stats": [
+                tuple(row)
+                for row in conn.execute(db._USER_COUNTS.format(where="1") + " ORDER BY p.game_id, p.user_id")
+            ],
+        }
+
+
+@pytest.fixture
+def games(live_db) -> tuple[int, int]:
+    first = play_game(
+        [("U1", "COMPLETED"), ("U2", "SKIPPED"), ("U2", "SKIPPED"), ("U1", "FAILED"), ("U2", "COMPLETED")],
+        # U3 joins but never plays
+        messages=[("U3", "hi")],
+    )
+    second = play_game([("U1", "SKIPPED"), ("U2", "REJECTED")], thread_ts="1700000000.000200")
+    # Turns still open: one picked, one on stage
+    db.add_user_selection_transaction(second, "U1", 300)
+    db.add_user_selection_transaction(first, "U1", 60)
+    db.start_turn(first, "U1")
+    return first, second
+
+
+def test_counters_match_game_turn(games):
+    assert _counters() == _aggregated()
+
+
+def test_backfill_rebuilds_the_counters(games):
+    before = _counters()
+    with db.get_db_connection() as conn:
+        conn.execute("DELETE FROM game_user_stats")
+        conn.execute("DELETE FROM game_stats")
+        conn.commit()
+        # As on the first start after the upgrade that added them
+        conn.execute("PRAGMA user_version = 0")
+    db.init_db()
+    assert _counters() == before
+
+
+def test_backfill_leaves_existing_counters_alone(games):
+    before = _counters()
+    with db.get_db_connection() as conn:
+        db._backfill_turn_counters(conn)
+    assert _counters() == before
+
+
+def test_summary_stats(games):
+    first, second = games
+    stats = {stat["user_id"]: stat for stat in db.get_game_summary_stats(first)}
+    assert stats["U1"]["completed"] == 1 and stats["U1"]["failed"] == 1 and stats["U1"]["in_progress"] == 1
+    assert stats["U2"]["skipped"] == 2 and stats["U2"]["consecutive_skips"] == 0
+    assert stats["U2"]["completion_rate"] == pytest.approx(1 / 3)
+    assert stats["U3"]["turns"] == 0 and stats["U3"]["completion_rate"] is None
+
+    totals = db.get_game_totals(second)
+    assert (totals["turns"], totals["pending"], totals["completion_rate"]) == (3, 1, 0)
+    assert totals["assigned_seconds"] == 2 * 120 + 300
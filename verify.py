@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from db import DB_FILE, iso_from_epoch_us, unpack_details
+
+
+@dataclass(frozen=True)
+class BrokenLink:
+    game_id: int
+    transaction_id: int
+    reason: str
+
+
+@dataclass(frozen=True)
+class GameReport:
+    game_id: int
+    rows: int
+    broken: BrokenLink | None
+
+
+def transaction_hash(
+    prev_hash: str | None,
+    event_type: str,
+    game_id: int,
+    user_id: str | None,
+    details_json: str | None,
+    client_secret: str,
+    server_secret: str,
+    timestamp: str,
+) -> str:
+    """Recomputes a transaction hash with the same content recipe as `db._add_transaction`."""
+    content = (
+        f"{prev_hash or ''}{event_type}{game_id}{user_id or ''}"
+        f"{details_json or ''}{client_secret}{server_secret}{timestamp}"
+    )
+    return hashlib.sha3_512(content.encode("utf-8")).hexdigest()
+
+
+def _hex(value: bytes | str | None) -> str | None:
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _connect_readonly(db_path: Path | str) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def verify_chain(conn: sqlite3.Connection, game_id: int) -> GameReport:
+    """Streams one game's transactions in id order and stops at the first broken link."""
+    cursor = conn.execute(
+        """
+        SELECT id, transaction_hash, previous_transaction_hash, timestamp, event_type,
+               user_id, details, client_secret, server_secret
+        FROM event_transaction
+        WHERE game_id = ?
+        ORDER BY id
+        """,
+        (game_id,),
+    )
+    expected_prev: str | None = None
+    rows = 0
+    for (
+        tx_id,
+        tx_hash,
+        prev_hash,
+        timestamp,
+        event_type,
+        user_id,
+        details,
+        client_secret,
+        server_secret,
+    ) in cursor:
+        rows += 1
+        # Stored as BLOB/epoch microseconds, hashed as hex/ISO 8601 text (older databases store the text)
+        tx_hash, prev_hash = _hex(tx_hash), _hex(prev_hash)
+        if isinstance(timestamp, int):
+            timestamp = iso_from_epoch_us(timestamp)
+        if prev_hash != expected_prev:
+            return GameReport(
+                game_id,
+                rows,
+                BrokenLink(
+                    game_id,
+                    tx_id,
+                    f"previous hash {prev_hash} does not match the preceding transaction {expected_prev}",
+                ),
+            )
+        computed = transaction_hash(
+            prev_hash,
+            event_type,
+            game_id,
+            user_id,
+            unpack_details(details),
+            client_secret,
+            server_secret,
+            timestamp,
+        )
+        if computed != tx_hash:
+            return GameReport(
+                game_id,
+                rows,
+                BrokenLink(game_id, tx_id, f"content hashes to {computed}, stored {tx_hash}"),
+            )
+        expected_prev = tx_hash
+    return GameReport(game_id, rows, None)
+
+
+def _verify_games_worker(args: tuple[str, list[int]]) -> list[GameReport]:
+    db_path, game_ids = args
+    conn = _connect_readonly(db_path)
+    try:
+        return [verify_chain(conn, game_id) for game_id in game_ids]
+    finally:
+        conn.close()
+
+
+def list_game_ids(db_path: Path | str) -> list[int]:
+    conn = _connect_readonly(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT DISTINCT game_id FROM event_transaction ORDER BY game_id")]
+    finally:
+        conn.close()
+
+
+def verify_games(
+    db_path: Path | str = DB_FILE,
+    game_ids: list[int] | None = None,
+    workers: int | None = None,
+) -> list[GameReport]:
+    """Verifies the hash chain of every given game (default: all games) across a process pool."""
+    if game_ids is None:
+        game_ids = list_game_ids(db_path)
+    if not game_ids:
+        return []
+    workers = workers or os.cpu_count() or 1
+    # Interleave games so that big and small games spread evenly over the workers
+    chunks = [game_ids[i::workers] for i in range(workers) if game_ids[i::workers]]
+    if len(chunks) == 1:
+        return _verify_games_worker((str(db_path), chunks[0]))
+    reports: list[GameReport] = []
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        for chunk_reports in pool.map(_verify_games_worker, [(str(db_path), chunk) for chunk in chunks]):
+            reports.extend(chunk_reports)
+    reports.sort(key=lambda r: r.game_id)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-verify the event_transaction hash chains.")
+    parser.add_argument("game_ids", nargs="*", type=int, help="Games to verify, all games by default")
+    parser.add_argument("--db", default=str(DB_FILE), help="Database file to verify")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reports = verify_games(args.db, args.game_ids or None, args.workers)
+    elapsed = time.perf_counter() - start
+
+    broken = [r.broken for r in reports if r.broken]
+    for link in broken:
+        print(f"❌ Game {link.game_id}: broken at transaction {link.transaction_id}: {link.reason}")
+    total_rows = sum(r.rows for r in reports)
+    print(
+        f"{'✅' if not broken else '⚠️'} {len(reports) - len(broken)}/{len(reports)} games intact, "
+        f"{total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:,.0f} rows/s)"
+    )
+    raise SystemExit(1 if broken else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,11 @@ class ConnectionManagerCls:
         if conn in self._connection_pool[conn.meta]:
             self._connection_pool[conn.meta].remove(conn)
 
+    def connection_count(self) -> int:
+        return sum(
+            conn.is_connected for conns in self._connection_pool.values() for conn in conns
+        )
+
 
 async def disconnect_handler(conn: UserConnection) -> None:
     if not isinstance(conn, UserConnection):
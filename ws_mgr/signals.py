@@ -6,7 +6,12 @@ import typing
 from collections.abc import Callable, Coroutine
 from typing import Any, Optional, overload, TypeVar
 
-LOOP: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+# Placeholder until the server's lifespan sets the running loop. get_event_loop() raises outside
+# the main thread, so a worker thread importing this module gets a loop of its own
+try:
+    LOOP: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+except RuntimeError:
+    LOOP = asyncio.new_event_loop()
 
 
 class ConnectionInitialError(ConnectionError): ...